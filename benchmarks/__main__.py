@@ -0,0 +1,279 @@
+"""
+Benchmarks for the render pipeline.
+
+Generates a synthetic cluster at each requested scale and times every stage of
+`transpire object build` against it, using fake `helm` and `kubectl` that print
+canned manifests, so no network access is needed:
+
+    python -m benchmarks --scale small --scale medium --save baseline.json
+    python -m benchmarks --scale small --scale medium --compare baseline.json
+
+Run it from the repository root. Every stage is run --repeat times, and the
+median is reported (and compared against the baseline).
+"""
+
+import copy
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import click
+from loguru import logger
+
+# imported up front, so that the first module load doesn't pay for them
+import transpire.helm  # noqa: F401
+import transpire.kustomize  # noqa: F401
+import transpire.resources  # noqa: F401
+from benchmarks.synthetic import SCALES, Scale, make_cluster, with_path
+from transpire.internal import cache, render
+from transpire.internal.config import ClusterConfig
+from transpire.internal.postprocessor import Pipeline
+from transpire.internal.surgery import Selector, edit_manifests
+from transpire.types import Module
+
+# Bumped whenever stages change in a way that makes old baselines incomparable.
+RESULTS_VERSION = 1
+
+STAGES = [
+    "load",
+    "objects",
+    "postprocess",
+    "edit_manifests",
+    "write_manifests",
+    "write_manifests (unchanged)",
+    "object build",
+]
+
+
+@contextmanager
+def synthetic_cluster(scale: Scale) -> Iterator[tuple[Path, Path]]:
+    """build a synthetic cluster and make it the current cluster, yielding its paths"""
+
+    cwd, environ = os.getcwd(), dict(os.environ)
+    with tempfile.TemporaryDirectory(prefix=f"transpire-bench-{scale.name}-") as tmp:
+        root = Path(tmp) / "cluster"
+        bin_dir = make_cluster(root, scale)
+        os.environ.update(with_path(bin_dir))
+        os.environ["TRANSPIRE_CACHE_DIR"] = str(Path(tmp) / "cache")
+        os.chdir(root)
+        cache.set_bypass(True)
+        try:
+            yield root, Path(tmp) / "out"
+        finally:
+            cache.set_bypass(False)
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+
+
+def add_annotation(m: dict) -> dict:
+    m["metadata"].setdefault("annotations", {})["bench.transpire.ocf.io/edited"] = "1"
+    return m
+
+
+def set_replicas(m: dict) -> dict:
+    m["spec"]["replicas"] = 3
+    return m
+
+
+def edits_for(module: str) -> dict[Any, Callable[[dict], dict | None]]:
+    """a mix of (kind, name) and Selector edits, like a typical .transpire.py"""
+    return {
+        ("ConfigMap", f"{module}-0-config"): add_annotation,
+        (("apps/v1", "Deployment"), f"{module}-0"): set_replicas,
+        Selector(kind="ClusterRole", labels={"app.kubernetes.io/name": "bench"}): (
+            add_annotation
+        ),
+        Selector(kind="Service", name="bench-3"): lambda m: None,
+    }
+
+
+def run_once(root: Path, out: Path) -> dict[str, float]:
+    """run every stage once, returning how long each took in seconds"""
+
+    timings: dict[str, float] = {}
+
+    @contextmanager
+    def timed(stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        timings[stage] = time.perf_counter() - start
+
+    config = ClusterConfig.from_cwd(root)
+    with timed("load"):
+        modules: list[Module] = [
+            c.load_module_w_context(name, context=config)
+            for name, c in config.modules.items()
+        ]
+
+    with timed("objects"):
+        objects = {m.name: m.objects for m in modules}
+
+    pipeline = Pipeline(config)
+    with timed("postprocess"):
+        for name, objs in objects.items():
+            for obj in objs:
+                pipeline.process(obj, name)
+
+    edit_inputs = copy.deepcopy(objects)
+    with timed("edit_manifests"):
+        for name, objs in edit_inputs.items():
+            edit_manifests(edits_for(name), objs)
+
+    for stage in ("write_manifests", "write_manifests (unchanged)"):
+        with timed(stage):
+            for name, objs in objects.items():
+                render.write_manifests(
+                    config, objs, name, out / "manifests", pipeline=pipeline
+                )
+
+    with timed("object build"):
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "transpire",
+                "object",
+                "build",
+                "--no-cache",
+                "--force",
+            ]
+            + [str(out / "cli")],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    return timings
+
+
+def run_scale(scale: Scale, repeat: int) -> dict[str, dict[str, float]]:
+    runs = []
+    with synthetic_cluster(scale) as (root, out):
+        for i in range(repeat):
+            # fresh output directories, so that the first write is never a no-op
+            runs.append(run_once(root, out / str(i)))
+    return {
+        stage: {
+            "median": statistics.median(r[stage] for r in runs),
+            "min": min(r[stage] for r in runs),
+        }
+        for stage in STAGES
+    }
+
+
+def compare(
+    results: dict, baseline: dict, max_slowdown: float, min_delta: float
+) -> bool:
+    """print how results compare to baseline, returning False on a regression"""
+
+    if baseline.get("version") != RESULTS_VERSION:
+        raise click.ClickException("baseline was saved by an incompatible version")
+
+    ok = True
+    click.echo(f"{'':32} {'baseline':>10} {'now':>10} {'change':>8}")
+    for scale, stages in results["results"].items():
+        if scale not in baseline["results"]:
+            continue
+        click.echo(scale)
+        for stage, timing in stages.items():
+            before = baseline["results"][scale].get(stage)
+            if before is None:
+                continue
+            ratio = timing["median"] / before["median"]
+            regressed = (
+                ratio > 1 + max_slowdown
+                and timing["median"] - before["median"] > min_delta
+            )
+            ok = ok and not regressed
+            click.echo(
+                f"  {stage:30} {before['median'] * 1000:8.1f}ms "
+                f"{timing['median'] * 1000:8.1f}ms {ratio - 1:+8.0%}"
+                + ("  REGRESSED" if regressed else "")
+            )
+    return ok
+
+
+@click.command()
+@click.option(
+    "-s",
+    "--scale",
+    "scales",
+    type=click.Choice(list(SCALES)),
+    multiple=True,
+    default=["small", "medium"],
+    show_default=True,
+)
+@click.option(
+    "-r", "--repeat", type=click.IntRange(min=1), default=3, show_default=True
+)
+@click.option(
+    "--save", type=click.Path(dir_okay=False), help="save results as a baseline"
+)
+@click.option(
+    "--compare",
+    "baseline_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="compare results against a saved baseline",
+)
+@click.option(
+    "--max-slowdown",
+    type=float,
+    default=0.25,
+    show_default=True,
+    help="with --compare, fail if a stage's median is this much slower",
+)
+@click.option(
+    "--min-delta",
+    type=float,
+    default=0.005,
+    show_default=True,
+    help="with --compare, ignore slowdowns of fewer than this many seconds",
+)
+def main(scales, repeat, save, baseline_path, max_slowdown, min_delta) -> None:
+    """benchmark the render pipeline against synthetic clusters"""
+
+    # per-app write summaries would drown out the results
+    logger.disable("transpire")
+
+    results: dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "transpire": importlib.metadata.version("transpire"),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "results": {},
+    }
+    for name in scales:
+        scale = SCALES[name]
+        click.echo(
+            f"{name}: {scale.modules} modules, {scale.apps_per_module} apps/module, "
+            f"{scale.chart_objects} objects/chart",
+            err=True,
+        )
+        results["results"][name] = run_scale(scale, repeat)
+
+    if save is not None:
+        with open(save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_path is not None:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, max_slowdown, min_delta):
+            sys.exit(1)
+    else:
+        click.echo(json.dumps(results["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Memory benchmark for compact manifests.
+
+Renders a CRD-heavy chart (as YAML, parsed back the way charts are), and
+measures the memory held by its manifests as plain dicts and once compacted:
+
+    python -m benchmarks.memory --crds 50
+"""
+
+import gc
+import time
+import tracemalloc
+
+import click
+
+from benchmarks.synthetic import crd_manifests
+from transpire.internal import yamlio
+from transpire.internal.compact import compact_all
+
+
+def _traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+@click.command()
+@click.option("--crds", type=click.IntRange(min=1), default=50, show_default=True)
+def main(crds: int) -> None:
+    """measure how much memory compacting a CRD-heavy chart saves"""
+
+    chart = yamlio.dump_all(crd_manifests(crds))
+
+    tracemalloc.start()
+    before = _traced()
+    objs = list(yamlio.load_all(chart))
+    plain = _traced() - before
+
+    compacted = compact_all(objs)
+    del objs
+    compact = _traced() - before
+    tracemalloc.stop()
+
+    if yamlio.dump_all(compacted) != chart:
+        raise click.ClickException("compacted manifests serialize differently")
+
+    # timed separately, as tracing allocations slows them down
+    objs = list(yamlio.load_all(chart))
+    start = time.perf_counter()
+    compact_all(objs)
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"{crds} CRDs, {len(chart) / 2**20:.1f} MiB of YAML")
+    click.echo(f"  plain     {plain / 2**20:8.2f} MiB")
+    click.echo(f"  compact   {compact / 2**20:8.2f} MiB  ({elapsed * 1000:.0f}ms)")
+    click.echo(f"  reduction {1 - compact / plain:8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Synthetic clusters for benchmarking.
+
+A synthetic cluster is a cluster repository with N local modules, each of which
+yields a mix of transpire resources, raw manifests, a helm chart and a
+kustomization, along with fake `helm` and `kubectl` executables that print large
+canned manifests instead of talking to the network.
+"""
+
+import json
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+
+from transpire.internal import yamlio
+
+
+@dataclass(frozen=True)
+class Scale:
+    """The size of a synthetic cluster."""
+
+    name: str
+    # number of local modules in cluster.toml
+    modules: int
+    # apps per module, each a Deployment, Service, Ingress, ConfigMap, Secret and
+    # ServiceMonitor
+    apps_per_module: int
+    # documents printed by every `helm template` / `kubectl kustomize`
+    chart_objects: int
+
+
+SCALES = {
+    s.name: s
+    for s in [
+        Scale("tiny", modules=2, apps_per_module=2, chart_objects=10),
+        Scale("small", modules=5, apps_per_module=10, chart_objects=100),
+        Scale("medium", modules=20, apps_per_module=25, chart_objects=400),
+        Scale("large", modules=50, apps_per_module=50, chart_objects=1000),
+    ]
+}
+
+CLUSTER_TOML = """\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+"""
+
+MODULE = """\
+from transpire.helm import build_chart
+from transpire.kustomize import build_kustomization
+from transpire.resources import ConfigMap, Deployment, Ingress, Secret, Service
+
+name = {name!r}
+
+
+def objects():
+    for i in range({apps}):
+        app = f"{{name}}-{{i}}"
+        deployment = Deployment(app, "nginx:1.25", [80], args=["--port", "80"])
+        deployment.pod_spec().with_configmap_env(f"{{app}}-config").with_secret_env(
+            f"{{app}}-secret"
+        )
+        service = Service(app, deployment.get_selector(), 80, 80)
+        yield deployment.build()
+        yield service.build()
+        yield Ingress.from_svc(service, f"{{app}}.example.com").build()
+        yield ConfigMap(f"{{app}}-config", data={{"LISTEN": ":80", "N": str(i)}}).build()
+        yield Secret(f"{{app}}-secret", {{"password": "hunter2"}}).build()
+        yield {{
+            "apiVersion": "monitoring.coreos.com/v1",
+            "kind": "ServiceMonitor",
+            "metadata": {{"name": app, "labels": {{"app": app}}}},
+            "spec": {{"selector": {{"matchLabels": deployment.get_selector()}}}},
+        }}
+
+    yield from build_chart(
+        "https://charts.example.com", "bench", name, "1.0.0", {{"replicas": 2}}
+    )
+    yield from build_kustomization(
+        "https://github.com/example/manifests/", "deploy", "v1.0.0"
+    )
+"""
+
+# Pull a placeholder chart into the store, and print the canned manifests when
+# templating it; everything else succeeds without doing anything.
+FAKE_HELM = """\
+#!/bin/sh
+# transpire puts its global flags before the subcommand
+for arg; do
+  case "$arg" in
+    pull|template) command="$arg"; break ;;
+  esac
+done
+case "$command" in
+  pull)
+    while [ $# -gt 0 ]; do
+      [ "$1" = --destination ] && dest="$2"
+      shift
+    done
+    echo bench > "$dest/bench-1.0.0.tgz" ;;
+  template) exec cat "{manifests}" ;;
+esac
+exit 0
+"""
+
+FAKE_KUBECTL = """\
+#!/bin/sh
+case "$1" in
+  kustomize) exec cat "{manifests}" ;;
+esac
+exit 0
+"""
+
+
+def canned_manifests(count: int) -> str:
+    """count chart-like documents, a mix of workloads, config and RBAC"""
+
+    docs = []
+    for i in range(count):
+        name = f"bench-{i}"
+        labels = {
+            "app.kubernetes.io/name": "bench",
+            "app.kubernetes.io/instance": name,
+            "app.kubernetes.io/managed-by": "Helm",
+        }
+        match i % 4:
+            case 0:
+                docs.append(
+                    {
+                        "apiVersion": "apps/v1",
+                        "kind": "Deployment",
+                        "metadata": {"name": name, "labels": labels},
+                        "spec": {
+                            "replicas": 2,
+                            "selector": {"matchLabels": labels},
+                            "template": {
+                                "metadata": {"labels": labels},
+                                "spec": {
+                                    "containers": [
+                                        {
+                                            "name": "main",
+                                            "image": "example.com/bench:1.0.0",
+                                            "args": [f"--flag-{j}" for j in range(8)],
+                                            "env": [
+                                                {"name": f"VAR_{j}", "value": str(j)}
+                                                for j in range(16)
+                                            ],
+                                            "ports": [{"containerPort": 8080}],
+                                            "resources": {
+                                                "requests": {
+                                                    "cpu": "100m",
+                                                    "memory": "128Mi",
+                                                }
+                                            },
+                                        }
+                                    ]
+                                },
+                            },
+                        },
+                    }
+                )
+            case 1:
+                docs.append(
+                    {
+                        "apiVersion": "v1",
+                        "kind": "ConfigMap",
+                        "metadata": {"name": name, "labels": labels},
+                        "data": {f"key-{j}": "value " * 20 for j in range(10)},
+                    }
+                )
+            case 2:
+                docs.append(
+                    {
+                        "apiVersion": "rbac.authorization.k8s.io/v1",
+                        "kind": "ClusterRole",
+                        "metadata": {"name": name, "labels": labels},
+                        "rules": [
+                            {
+                                "apiGroups": [""],
+                                "resources": ["pods", "services", "configmaps"],
+                                "verbs": ["get", "list", "watch"],
+                            }
+                        ]
+                        * 4,
+                    }
+                )
+            case 3:
+                docs.append(
+                    {
+                        "apiVersion": "v1",
+                        "kind": "Service",
+                        "metadata": {"name": name, "labels": labels},
+                        "spec": {
+                            "selector": labels,
+                            "ports": [{"port": 80, "targetPort": 8080}],
+                        },
+                    }
+                )
+    return yamlio.dump_all(docs)
+
+
+def _write_executable(path: Path, content: str) -> None:
+    path.write_text(content)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def make_cluster(root: Path, scale: Scale) -> Path:
+    """
+    write a synthetic cluster to root, returning the directory holding the fake
+    `helm` and `kubectl` (which must come first on $PATH when building it)
+    """
+
+    root.mkdir(parents=True, exist_ok=True)
+    bin_dir = root / "bin"
+    bin_dir.mkdir(exist_ok=True)
+
+    manifests = root / "manifests.yaml"
+    manifests.write_text(canned_manifests(scale.chart_objects))
+    _write_executable(bin_dir / "helm", FAKE_HELM.format(manifests=manifests))
+    _write_executable(bin_dir / "kubectl", FAKE_KUBECTL.format(manifests=manifests))
+
+    cluster_toml = [CLUSTER_TOML]
+    for i in range(scale.modules):
+        name = f"bench{i}"
+        module_dir = root / "apps" / name
+        module_dir.mkdir(parents=True, exist_ok=True)
+        (module_dir / ".transpire.py").write_text(
+            MODULE.format(name=name, apps=scale.apps_per_module)
+        )
+        cluster_toml.append(f'\n[modules.{name}]\npath = "apps/{name}/.transpire.py"\n')
+    (root / "cluster.toml").write_text("".join(cluster_toml))
+
+    return bin_dir
+
+
+def with_path(bin_dir: Path) -> dict[str, str]:
+    """os.environ, with bin_dir first on $PATH"""
+    return {**os.environ, "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+
+
+def _schema_object(properties: dict) -> dict:
+    return {"type": "object", "properties": properties}
+
+
+def _container_schema() -> dict:
+    """an openAPIV3Schema for a container, as operators' CRDs inline them"""
+    string = {"type": "string"}
+    quantity = {
+        "anyOf": [{"type": "integer"}, {"type": "string"}],
+        "pattern": r"^(\+|-)?(([0-9]+(\.[0-9]*)?)|(\.[0-9]+))$",
+        "x-kubernetes-int-or-string": True,
+    }
+    resources = _schema_object(
+        {
+            "limits": {"type": "object", "additionalProperties": quantity},
+            "requests": {"type": "object", "additionalProperties": quantity},
+        }
+    )
+    env_var = _schema_object(
+        {
+            "name": {**string, "description": "Name of the environment variable."},
+            "value": {**string, "description": "Variable references $(VAR_NAME)."},
+            "valueFrom": _schema_object(
+                {
+                    key: _schema_object({"key": string, "name": string})
+                    for key in ["configMapKeyRef", "secretKeyRef"]
+                }
+            ),
+        }
+    )
+    probe = _schema_object(
+        {
+            "httpGet": _schema_object({"path": string, "port": quantity}),
+            "initialDelaySeconds": {"type": "integer", "format": "int32"},
+            "periodSeconds": {"type": "integer", "format": "int32"},
+        }
+    )
+    return _schema_object(
+        {
+            "name": string,
+            "image": {**string, "description": "Container image name."},
+            "args": {"type": "array", "items": string},
+            "env": {"type": "array", "items": env_var},
+            "resources": resources,
+            "livenessProbe": probe,
+            "readinessProbe": probe,
+            "startupProbe": probe,
+        }
+    )
+
+
+def crd_manifests(count: int) -> list[dict]:
+    """
+    count CRDs shaped like an operator chart's: several served versions of a
+    large schema that inlines the same container and pod schemas many times
+    """
+
+    docs = []
+    for i in range(count):
+        kind = f"Widget{i}"
+        pod = _schema_object(
+            {
+                "containers": {"type": "array", "items": _container_schema()},
+                "initContainers": {"type": "array", "items": _container_schema()},
+                "nodeSelector": {
+                    "type": "object",
+                    "additionalProperties": {"type": "string"},
+                },
+            }
+        )
+        spec = _schema_object(
+            {
+                **{f"component{j}": _schema_object({"pod": pod}) for j in range(4)},
+                **{
+                    f"setting{j}": {
+                        "type": "string",
+                        "description": f"Setting {j} of a {kind}.",
+                    }
+                    for j in range(20)
+                },
+            }
+        )
+        status = _schema_object(
+            {"observedGeneration": {"type": "integer"}, "phase": {"type": "string"}}
+        )
+        docs.append(
+            {
+                "apiVersion": "apiextensions.k8s.io/v1",
+                "kind": "CustomResourceDefinition",
+                "metadata": {
+                    "name": f"widget{i}s.example.com",
+                    "labels": {
+                        "app.kubernetes.io/name": "bench-operator",
+                        "app.kubernetes.io/managed-by": "Helm",
+                    },
+                },
+                "spec": {
+                    "group": "example.com",
+                    "names": {"kind": kind, "plural": f"widget{i}s"},
+                    "scope": "Namespaced",
+                    "versions": [
+                        {
+                            "name": version,
+                            "served": True,
+                            "storage": version == "v1",
+                            "schema": {
+                                "openAPIV3Schema": {
+                                    "description": f"{kind} is the Schema for the "
+                                    f"{version} API.",
+                                    **_schema_object(
+                                        {"spec": spec, "status": status}
+                                        if version == "v1"
+                                        else {"spec": spec}
+                                    ),
+                                }
+                            },
+                        }
+                        for version in ["v1alpha1", "v1beta1", "v1"]
+                    ],
+                },
+            }
+        )
+    # the schemas above share subtrees, which rendered charts never do
+    return json.loads(json.dumps(docs))
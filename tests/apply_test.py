@@ -0,0 +1,260 @@
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from kubernetes import client
+
+from transpire.internal.apply import (
+    FIELD_MANAGER,
+    HASH_ANNOTATION,
+    Client,
+    Discovery,
+    apply_objects,
+)
+
+RESOURCES = {
+    "v1": [
+        {"name": "namespaces", "kind": "Namespace", "namespaced": False},
+        {"name": "configmaps", "kind": "ConfigMap", "namespaced": True},
+        {"name": "pods/status", "kind": "Pod", "namespaced": True},
+    ],
+    "apiextensions.k8s.io/v1": [
+        {
+            "name": "customresourcedefinitions",
+            "kind": "CustomResourceDefinition",
+            "namespaced": False,
+        }
+    ],
+}
+WIDGETS = {"name": "widgets", "kind": "Widget", "namespaced": True}
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """Just enough of the Kubernetes API for server-side apply."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), Handler)
+        # path -> object
+        self.objects: dict[str, dict] = {}
+        # (method, path, query) of every request
+        self.requests: list[tuple[str, str, dict]] = []
+        self.lock = threading.Lock()
+
+    def resources(self, group_version: str) -> list[dict] | None:
+        if group_version == "example.com/v1":
+            served = any(p.endswith("/widgets.example.com") for p in self.objects)
+            return [WIDGETS] if served else None
+        return RESOURCES.get(group_version)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: FakeAPIServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self) -> None:
+        self._send(404, {"kind": "Status", "message": "not found"})
+
+    def _record(self) -> tuple[str, list[str]]:
+        url = urlparse(self.path)
+        with self.server.lock:
+            self.server.requests.append((self.command, url.path, parse_qs(url.query)))
+        return url.path, url.path.strip("/").split("/")
+
+    def do_GET(self) -> None:
+        path, parts = self._record()
+        group_version = "/".join(parts[1:])
+        if parts[0] in ("api", "apis") and len(parts) == (
+            2 if parts[0] == "api" else 3
+        ):
+            resources = self.server.resources(group_version)
+            if resources is None:
+                return self._not_found()
+            return self._send(200, {"resources": resources})
+
+        if path in self.server.objects:
+            obj = self.server.objects[path]
+            if obj["kind"] == "CustomResourceDefinition":
+                obj = {
+                    **obj,
+                    "status": {
+                        "conditions": [{"type": "Established", "status": "True"}]
+                    },
+                }
+            return self._send(200, obj)
+
+        prefix = path + "/"
+        items = [
+            {"metadata": o["metadata"]}
+            for p, o in self.server.objects.items()
+            if p.startswith(prefix) and "/" not in p[len(prefix) :]
+        ]
+        self._send(200, {"kind": "PartialObjectMetadataList", "items": items})
+
+    def do_PATCH(self) -> None:
+        path, _ = self._record()
+        query = parse_qs(urlparse(self.path).query)
+        assert self.headers["Content-Type"] == "application/apply-patch+yaml"
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body["metadata"]["name"] == "invalid":
+            return self._send(422, {"kind": "Status", "message": "invalid object"})
+        if body["metadata"]["name"] == "conflicted" and "force" not in query:
+            return self._send(
+                409, {"kind": "Status", "message": 'conflict with "hpa": .data.value'}
+            )
+        if body["metadata"]["name"] == "dropped":
+            # hang up without replying
+            self.close_connection = True
+            return
+        with self.server.lock:
+            self.server.objects[path] = body
+        self._send(200, body)
+
+
+@pytest.fixture
+def server() -> Iterator[FakeAPIServer]:
+    server = FakeAPIServer()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def api(server: FakeAPIServer) -> Client:
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    return Client(client.ApiClient(client.Configuration(host=host)))
+
+
+def configmap(name: str, value: str = "x") -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name},
+        "data": {"value": value},
+    }
+
+
+OBJECTS = [
+    configmap("a"),
+    {"apiVersion": "example.com/v1", "kind": "Widget", "metadata": {"name": "w"}},
+    {
+        "apiVersion": "apiextensions.k8s.io/v1",
+        "kind": "CustomResourceDefinition",
+        "metadata": {"name": "widgets.example.com"},
+    },
+    {"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": "app"}},
+]
+
+
+def patches(server: FakeAPIServer) -> list[str]:
+    return [path for method, path, _ in server.requests if method == "PATCH"]
+
+
+def test_apply(cli_config, server: FakeAPIServer, api: Client) -> None:
+    result = apply_objects(api, OBJECTS, "app", jobs=4)
+    assert str(result) == "4 applied, 0 unchanged, 0 failed"
+
+    applied = patches(server)
+    # CRDs and namespaces go first, and the CRD's objects can then be applied
+    assert set(applied[:2]) == {
+        "/apis/apiextensions.k8s.io/v1/customresourcedefinitions/widgets.example.com",
+        "/api/v1/namespaces/app",
+    }
+    assert set(applied[2:]) == {
+        "/api/v1/namespaces/app/configmaps/a",
+        "/apis/example.com/v1/namespaces/app/widgets/w",
+    }
+    for method, _, query in server.requests:
+        if method == "PATCH":
+            assert query == {"fieldManager": [FIELD_MANAGER]}
+
+    live = server.objects["/api/v1/namespaces/app/configmaps/a"]
+    assert live["metadata"]["namespace"] == "app"
+    assert HASH_ANNOTATION in live["metadata"]["annotations"]
+
+
+def test_unchanged_objects_are_skipped(
+    cli_config, server: FakeAPIServer, api: Client
+) -> None:
+    apply_objects(api, OBJECTS, "app")
+    server.requests.clear()
+
+    objects = [configmap("a", "y") if o["kind"] == "ConfigMap" else o for o in OBJECTS]
+    result = apply_objects(api, objects, "app")
+    assert str(result) == "1 applied, 3 unchanged, 0 failed"
+    assert patches(server) == ["/api/v1/namespaces/app/configmaps/a"]
+
+    server.requests.clear()
+    result = apply_objects(api, objects, "app", force=True)
+    assert len(patches(server)) == 4
+
+
+def test_discovery_is_cached(cli_config, server: FakeAPIServer, api: Client) -> None:
+    assert Discovery(api).resource("v1", "ConfigMap").path("ns", "a") == (
+        "/api/v1/namespaces/ns/configmaps/a"
+    )
+    server.requests.clear()
+
+    discovery = Discovery(api)
+    assert discovery.resource("v1", "ConfigMap").namespaced
+    assert discovery.resource("v1", "Namespace").path(None) == "/api/v1/namespaces"
+    assert server.requests == []
+
+
+def test_failures_are_reported(cli_config, api: Client) -> None:
+    result = apply_objects(
+        api,
+        [
+            configmap("invalid"),
+            {
+                "apiVersion": "example.com/v2",
+                "kind": "Gadget",
+                "metadata": {"name": "g"},
+            },
+        ],
+        "app",
+    )
+    assert result.failed == {
+        "ConfigMap app/invalid": "invalid object",
+        "Gadget g": "the server doesn't serve Gadget in example.com/v2",
+    }
+
+
+def test_conflicts_are_reported(cli_config, server: FakeAPIServer, api: Client) -> None:
+    objects = [configmap("a"), configmap("conflicted")]
+    result = apply_objects(api, objects, "app")
+    assert str(result) == "1 applied, 0 unchanged, 0 failed, 1 conflicting"
+    assert result.conflicts == {
+        "ConfigMap app/conflicted": 'conflict with "hpa": .data.value'
+    }
+
+    server.requests.clear()
+    result = apply_objects(api, objects, "app", force_conflicts=True)
+    assert str(result) == "1 applied, 1 unchanged, 0 failed"
+    assert [query for method, _, query in server.requests if method == "PATCH"] == [
+        {"fieldManager": [FIELD_MANAGER], "force": ["true"]}
+    ]
+
+
+def test_connection_errors_are_reported(cli_config, api: Client) -> None:
+    result = apply_objects(api, [configmap("dropped"), configmap("a")], "app")
+    assert result.applied == ["ConfigMap app/a"]
+    assert list(result.failed) == ["ConfigMap app/dropped"]
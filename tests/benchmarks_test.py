@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.synthetic import SCALES, make_cluster, with_path
+from transpire.internal.helm import helm_command
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_benchmarks_run(tmp_path: Path) -> None:
+    """the smallest benchmark runs offline, and compares cleanly with itself"""
+    baseline = tmp_path / "baseline.json"
+    command = [sys.executable, "-m", "benchmarks", "--scale", "tiny", "--repeat", "1"]
+    subprocess.run([*command, "--save", str(baseline)], cwd=ROOT, check=True)
+
+    results = json.loads(baseline.read_text())["results"]["tiny"]
+    assert all(timing["median"] > 0 for timing in results.values())
+
+    subprocess.run(
+        [*command, "--compare", str(baseline), "--max-slowdown", "100"],
+        cwd=ROOT,
+        check=True,
+    )
+
+
+def test_memory_benchmark_runs() -> None:
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory", "--crds", "2"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert "reduction" in result.stdout
+
+
+def test_fake_helm_templates(cli_config, tmp_path: Path) -> None:
+    """the fake helm understands the commands transpire runs, global flags and all"""
+    bin_dir = make_cluster(tmp_path / "cluster", SCALES["tiny"])
+    result = subprocess.run(
+        helm_command(["template", "bench", "bench-1.0.0.tgz"]),
+        env=with_path(bin_dir),
+        check=True,
+        capture_output=True,
+    )
+    manifests = (tmp_path / "cluster" / "manifests.yaml").read_bytes()
+    assert result.stdout == manifests
@@ -0,0 +1,63 @@
+from transpire.internal import cache
+from transpire.internal.cache import RenderCache
+
+
+class TestRenderCache:
+    def test_roundtrip(self, cli_config) -> None:
+        rc = RenderCache("test")
+        key = RenderCache.key("repo", "chart", {"a": 1})
+        objs = [{"apiVersion": "v1", "kind": "ConfigMap", "data": {"x": "y"}}]
+
+        assert rc.get(key) is None
+        rc.put(key, objs)
+        assert rc.get(key) == objs
+        assert (rc.stats.hits, rc.stats.misses) == (1, 1)
+
+    def test_key_is_order_independent_for_dicts(self) -> None:
+        assert RenderCache.key({"a": 1, "b": 2}) == RenderCache.key({"b": 2, "a": 1})
+        assert RenderCache.key({"a": 1}) != RenderCache.key({"a": 2})
+
+    def test_bypass(self, cli_config) -> None:
+        rc = RenderCache("test")
+        key = RenderCache.key("bypass")
+        rc.put(key, [{}])
+        cache.set_bypass(True)
+        try:
+            assert rc.get(key) is None
+        finally:
+            cache.set_bypass(False)
+        assert rc.get(key) == [{}]
+
+    def test_corrupt_entry_is_a_miss(self, cli_config) -> None:
+        rc = RenderCache("test")
+        key = RenderCache.key("corrupt")
+        rc.put(key, [{}])
+        rc._path(key).write_bytes(b"garbage")
+        assert rc.get(key) is None
+
+    def test_truncated_entry_is_a_miss(self, cli_config) -> None:
+        rc = RenderCache("test")
+        key = RenderCache.key("truncated")
+        rc.put(key, [{"value": str(i) * 1000} for i in range(100)])
+        path = rc._path(key)
+        path.write_bytes(path.read_bytes()[:-100])
+        assert rc.iter(key) is None
+        assert not path.exists()
+
+    def test_in_memory(self, cli_config) -> None:
+        rc = RenderCache("test")
+        key = RenderCache.key("memory")
+        rc.put(key, [{"a": 1}])
+        cache.keep_in_memory()
+        try:
+            # the first hit reads the entry from disk and remembers it
+            assert rc.get(key) == [{"a": 1}]
+            rc._path(key).unlink()
+            first = rc.get(key)
+            assert first == [{"a": 1}]
+            # every hit gets its own copy
+            first[0]["a"] = 2
+            assert rc.get(key) == [{"a": 1}]
+        finally:
+            cache.keep_in_memory(False)
+        assert rc.get(key) is None
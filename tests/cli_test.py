@@ -0,0 +1,63 @@
+import importlib
+import subprocess
+import sys
+import time
+
+from click.testing import CliRunner
+
+from transpire.internal.cli import cli
+
+# Modules that CLI startup must not import; they are loaded by the subcommands
+# that need them.
+HEAVY_MODULES = ["kubernetes", "hvac", "tomlkit", "requests"]
+
+# Generous enough for a slow CI machine, while still catching a subcommand or
+# heavy dependency being imported eagerly again (which costs ~0.5s here).
+STARTUP_BUDGET = 1.5
+
+
+def imported_modules(*args: str) -> set[str]:
+    """the top-level modules imported by running the CLI with args"""
+    code = (
+        "import sys\n"
+        "from transpire.internal.cli import cli\n"
+        f"try:\n    cli({list(args)!r})\n"
+        "except SystemExit:\n    pass\n"
+        "print(' '.join(sorted({m.split('.')[0] for m in sys.modules})))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return set(result.stdout.splitlines()[-1].split())
+
+
+class TestStartup:
+    def test_help_is_lazy(self) -> None:
+        modules = imported_modules("--help")
+        assert not modules & {*HEAVY_MODULES, "pydantic"}
+
+    def test_schema_skips_clients(self) -> None:
+        modules = imported_modules("dev", "schema")
+        assert "pydantic" in modules
+        assert not modules & set(HEAVY_MODULES)
+
+    def test_help_budget(self) -> None:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "transpire", "--help"],
+            check=True,
+            capture_output=True,
+        )
+        assert time.perf_counter() - start < STARTUP_BUDGET
+
+
+class TestAliasedGroup:
+    def test_lazy_help_matches_docstrings(self) -> None:
+        for import_path, help in cli.lazy_commands.values():
+            module_name, attr = import_path.split(":")
+            assert getattr(importlib.import_module(module_name), attr).help == help
+
+    def test_prefix_resolves_lazy_command(self) -> None:
+        result = CliRunner().invoke(cli, ["dev", "sch"])
+        assert result.exit_code == 0, result.output
+        assert '"title"' in result.output
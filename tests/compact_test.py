@@ -0,0 +1,120 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from transpire.internal import yamlio
+from transpire.internal.compact import (
+    CompactDict,
+    FrozenDict,
+    Interner,
+    compact_all,
+)
+from transpire.internal.surgery import edit_manifests, make_edit_manifest
+
+
+def deployment(name: str, image: str = "nginx:1.25") -> dict:
+    labels = {"app.kubernetes.io/name": "web", "app.kubernetes.io/part-of": "site"}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": name, "labels": dict(labels)},
+        "spec": {
+            "replicas": 1,
+            "selector": {"matchLabels": dict(labels)},
+            "template": {
+                "metadata": {"labels": dict(labels)},
+                "spec": {
+                    "containers": [
+                        {"name": "main", "image": image, "ports": [{"port": 80}]}
+                    ]
+                },
+            },
+        },
+    }
+
+
+@pytest.fixture
+def objs() -> list[dict]:
+    return [deployment("a"), deployment("b"), deployment("c", "nginx:1.26")]
+
+
+def test_equal_and_serialized_identically(objs: list[dict]) -> None:
+    compacted = compact_all(objs)
+    assert compacted == objs
+    assert yamlio.dump_all(compacted) == yamlio.dump_all(objs)
+    assert json.dumps(compacted) == json.dumps(objs)
+
+
+def test_subtrees_are_shared(objs: list[dict]) -> None:
+    a, b, c = compact_all(objs)
+    assert dict.__getitem__(a, "spec") is dict.__getitem__(b, "spec")
+    assert dict.__getitem__(a, "spec") is not dict.__getitem__(c, "spec")
+    # the labels are shared within an object, too
+    labels = dict.__getitem__(a, "metadata")["labels"]
+    assert labels is dict.__getitem__(b, "metadata")["labels"]
+    assert "&id" not in yamlio.dump(a)
+
+
+def test_values_are_told_apart() -> None:
+    interner = Interner()
+    one, true, float_one = (interner.compact({"v": v}) for v in (1, True, 1.0))
+    assert type(one["v"]) is int
+    assert type(true["v"]) is bool
+    assert type(float_one["v"]) is float
+
+
+def test_copy_on_write(objs: list[dict]) -> None:
+    a, b, _ = compact_all(objs)
+    a["spec"]["template"]["spec"]["containers"][0]["image"] = "httpd"
+    for container in b["spec"]["template"]["spec"]["containers"]:
+        container["ports"].append({"port": 443})
+    a["metadata"]["labels"].pop("app.kubernetes.io/part-of")
+
+    assert a["spec"]["template"]["spec"]["containers"][0] == {
+        "name": "main",
+        "image": "httpd",
+        "ports": [{"port": 80}],
+    }
+    assert b["spec"]["template"]["spec"]["containers"][0]["image"] == "nginx:1.25"
+    assert b["spec"]["template"]["spec"]["containers"][0]["ports"] == [
+        {"port": 80},
+        {"port": 443},
+    ]
+    assert len(b["metadata"]["labels"]) == 2
+
+
+def test_shared_subtrees_are_frozen(objs: list[dict]) -> None:
+    a, _, _ = compact_all(objs)
+    spec = dict.__getitem__(a, "spec")
+    assert isinstance(spec, FrozenDict)
+    with pytest.raises(TypeError):
+        spec["replicas"] = 2
+    with pytest.raises(TypeError):
+        spec["template"]["spec"]["containers"].append({})
+
+
+def test_pickle_and_copy(objs: list[dict]) -> None:
+    compacted = compact_all(objs)
+    for copied in [pickle.loads(pickle.dumps(compacted)), copy.deepcopy(compacted)]:
+        assert copied == objs
+        assert type(copied[0]) is CompactDict
+        assert dict.__getitem__(copied[0], "spec") is dict.__getitem__(
+            copied[1], "spec"
+        )
+        copied[0]["spec"]["replicas"] = 3
+        assert copied[1]["spec"]["replicas"] == 1
+
+
+def test_surgery(objs: list[dict]) -> None:
+    edited = edit_manifests(
+        {
+            ("Deployment", "b"): make_edit_manifest(
+                {("spec", "template", "metadata", "labels", "tier"): "web"}
+            )
+        },
+        compact_all(objs),
+    )
+    assert edited[1]["spec"]["template"]["metadata"]["labels"]["tier"] == "web"
+    assert "tier" not in edited[0]["spec"]["template"]["metadata"]["labels"]
@@ -0,0 +1,258 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from transpire.internal import config, trace
+from transpire.internal.config import (
+    GitModuleConfig,
+    LocalModuleConfig,
+    prefetch_modules,
+)
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "transpire",
+    "GIT_AUTHOR_EMAIL": "transpire@example.com",
+    "GIT_COMMITTER_NAME": "transpire",
+    "GIT_COMMITTER_EMAIL": "transpire@example.com",
+}
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, **GIT_ENV},
+    ).stdout.strip()
+
+
+def commit(repo: Path, content: str) -> str:
+    (repo / "app").mkdir(exist_ok=True)
+    (repo / "app" / ".transpire.py").write_text(f"name = {content!r}\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", content)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def remote(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(config, "_fetched_repos", {})
+    monkeypatch.setattr(config, "_loaded_modules", {})
+    repo = tmp_path / "remote"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    return repo
+
+
+def module(remote: Path, branch: str | None = None) -> GitModuleConfig:
+    return GitModuleConfig(git=f"file://{remote}", branch=branch, dir=Path("app"))
+
+
+class TestGitModules:
+    def test_fetches_tip_only(self, cli_config, remote) -> None:
+        commit(remote, "one")
+        tip = commit(remote, "two")
+
+        path, fetched = module(remote).get_cached_repo()
+        assert fetched == tip
+        assert (path / "app" / ".transpire.py").read_text() == "name = 'two'\n"
+        assert git(module(remote).store_dir, "rev-list", "--all", "--count") == "1"
+
+    def test_pinned_commit(self, cli_config, remote) -> None:
+        old = commit(remote, "one")
+        commit(remote, "two")
+
+        path, fetched = module(remote).get_cached_repo(commit=old)
+        assert fetched == old
+        assert (path / "app" / ".transpire.py").read_text() == "name = 'one'\n"
+
+        # a commit that's already in the store is never fetched again
+        shutil.rmtree(remote)
+        config._fetched_repos.clear()
+        assert module(remote).get_cached_repo(commit=old) == (path, old)
+
+    def test_abbreviated_pinned_commit(self, cli_config, remote) -> None:
+        old = commit(remote, "one")
+        commit(remote, "two")
+        module(remote).get_cached_repo()
+
+        # not in the (shallow) store, so found in the branch's history
+        path, fetched = module(remote).get_cached_repo(commit=old[:12])
+        assert fetched == old
+        assert (path / "app" / ".transpire.py").read_text() == "name = 'one'\n"
+
+        with pytest.raises(ValueError, match="isn't a commit"):
+            module(remote).get_cached_repo(commit="0123456789ab")
+
+    def test_unused_checkouts_are_pruned(self, cli_config, remote) -> None:
+        # left over from before modules were fetched into stores
+        (cli_config.cache_dir / "remote_modules" / "repo").mkdir(parents=True)
+        old = commit(remote, "one")
+        stale, _ = module(remote).get_cached_repo(commit=old)
+        os.utime(stale, (0, 0))
+
+        # still in use by this process, so kept
+        commit(remote, "two")
+        recent, _ = module(remote).get_cached_repo()
+        assert stale.exists()
+
+        config._fetched_repos.clear()
+        commit(remote, "three")
+        latest, _ = module(remote).get_cached_repo()
+        assert {p.name for p in stale.parent.iterdir()} == {recent.name, latest.name}
+        assert not (cli_config.cache_dir / "remote_modules").exists()
+
+    def test_branch_moves(self, cli_config, remote, monkeypatch) -> None:
+        first = commit(remote, "one")
+        assert module(remote).load_module("one").revision == first
+
+        second = commit(remote, "two")
+        monkeypatch.setattr(config, "_fetched_repos", {})
+        loaded = module(remote).load_module("two")
+        assert loaded.revision == second
+        assert module(remote).get_cached_repo(commit=first)[1] == first
+
+    def test_prefetch_branches(self, cli_config, remote) -> None:
+        main = commit(remote, "main")
+        git(remote, "checkout", "-q", "-b", "other")
+        other = commit(remote, "other")
+
+        modules = {
+            f"{branch}{i}": module(remote, branch)
+            for branch in ("main", "other")
+            for i in range(3)
+        }
+        prefetch_modules(modules, jobs=6)
+        assert {c[1] for c in config.fetched_repos().values()} == {main, other}
+        for m in modules.values():
+            path, fetched = m.get_cached_repo()
+            assert path.name == fetched
+
+
+class TestModuleLoading:
+    def test_git_bytecode_is_cached(self, cli_config, remote) -> None:
+        first = commit(remote, "one")
+        loaded = module(remote).load_module("one")
+        assert module(remote).load_module("one").pymodule is loaded.pymodule
+
+        path, _ = module(remote).get_cached_repo(commit=first)
+        assert not (path / "app" / "__pycache__").exists()
+        assert len(list((cli_config.cache_dir / "bytecode").iterdir())) == 1
+
+        # a new process loads the module from its cached bytecode
+        config.forget_loaded_modules()
+        (path / "app" / ".transpire.py").write_text("name = 'changed'\n")
+        reloaded = module(remote).load_module("one")
+        assert reloaded.pymodule is not loaded.pymodule
+
+    def test_modules_are_named_apart(self, cli_config, remote, tmp_path) -> None:
+        first = commit(remote, "one")
+        second = commit(remote, "two")
+        (tmp_path / "app").mkdir()
+        (tmp_path / "app" / ".transpire.py").write_text("name = 'local'\n")
+
+        loaded = [
+            module(remote).load_module("one", commit=first).pymodule,
+            module(remote).load_module("two", commit=second).pymodule,
+            LocalModuleConfig(path=tmp_path / "app" / ".transpire.py")
+            .load_module("local")
+            .pymodule,
+        ]
+        assert [m.name for m in loaded] == ["one", "two", "local"]
+        assert len({m.__name__ for m in loaded}) == 3
+        assert all(sys.modules[m.__name__] is m for m in loaded)
+
+    def test_local_modules_reload_when_edited(self, remote, tmp_path) -> None:
+        path = tmp_path / ".transpire.py"
+        path.write_text("name = 'one'\n")
+        local = LocalModuleConfig(path=path)
+        loaded = local.load_module("one").pymodule
+        assert local.load_module("one").pymodule is loaded
+
+        path.write_text("name = 'two'\n")
+        os.utime(path, ns=(0, 0))
+        assert local.load_module("two").pymodule.name == "two"
+
+    def test_local_modules_reload_when_helpers_change(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        app = tmp_path / "app"
+        app.mkdir()
+        (app / ".transpire.py").write_text("from sibling_helpers import NAME as name\n")
+        helper = app / "sibling_helpers.py"
+        helper.write_text("NAME = 'one'\n")
+        monkeypatch.syspath_prepend(str(app))
+        monkeypatch.delitem(sys.modules, "sibling_helpers", raising=False)
+
+        local = LocalModuleConfig(path=app / ".transpire.py")
+        loaded = local.load_module("one").pymodule
+        assert local.load_module("one").pymodule is loaded
+
+        helper.write_text("NAME = 'two'\n")
+        os.utime(helper, ns=(0, 0))
+        assert local.load_module("two").pymodule.name == "two"
+        sys.modules.pop("sibling_helpers", None)
+
+    def test_only_new_imports_are_reloaded(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # like a module at the root of a repository that has other code in it
+        (tmp_path / "preloaded_helpers.py").write_text("VALUE = 1\n")
+        path = tmp_path / ".transpire.py"
+        path.write_text("import preloaded_helpers\n\nname = 'one'\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "preloaded_helpers", raising=False)
+        import preloaded_helpers  # type: ignore
+
+        local = LocalModuleConfig(path=path)
+        local.load_module("one")
+        path.write_text("import preloaded_helpers\n\nname = 'two'\n")
+        os.utime(path, ns=(0, 0))
+        assert local.load_module("two").pymodule.name == "two"
+        assert sys.modules["preloaded_helpers"] is preloaded_helpers
+        sys.modules.pop("preloaded_helpers", None)
+
+    def test_prefetch_fetches_each_branch_once(self, cli_config, remote) -> None:
+        commit(remote, "one")
+        trace.configure(enabled=True)
+        try:
+            trace.drain()
+            prefetch_modules({str(i): module(remote) for i in range(6)}, jobs=6)
+            for i in range(6):
+                module(remote).load_module("one")
+            fetches = [e for e in trace.drain() if e["name"] == "git fetch"]
+        finally:
+            trace.configure(enabled=False)
+        assert len(fetches) == 1
+
+    def test_concurrent_processes_share_a_store(self, cli_config, remote) -> None:
+        main = commit(remote, "main")
+        git(remote, "checkout", "-q", "-b", "other")
+        other = commit(remote, "other")
+
+        # separate processes fetching into one store wait on its lock
+        script = (
+            "import sys; from pathlib import Path;"
+            "from transpire.internal.config import GitModuleConfig;"
+            "m = GitModuleConfig(git=sys.argv[1], branch=sys.argv[2], dir=Path('app'));"
+            "print(m.get_cached_repo()[1])"
+        )
+        env = {**os.environ, "TRANSPIRE_CACHE_DIR": str(cli_config.cache_dir.parent)}
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", script, f"file://{remote}", branch],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for branch in ["main", "other"] * 3
+        ]
+        outputs = [p.communicate()[0].strip() for p in procs]
+        assert [p.returncode for p in procs] == [0] * 6
+        assert outputs == [main, other] * 3
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import pytest
+
+from transpire.internal.config import CLIConfig, ClusterConfig
+
+
+@pytest.fixture
+def cli_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> CLIConfig:
+    """point transpire's cache and config directories at a temporary directory"""
+    config = CLIConfig(cache_dir=tmp_path / "cache", config_dir=tmp_path / "config")
+    monkeypatch.setattr(CLIConfig, "from_env", classmethod(lambda cls: config))
+    return config
+
+
+@pytest.fixture
+def cluster_config() -> ClusterConfig:
+    return ClusterConfig.model_validate(
+        {
+            "apiVersion": "v1",
+            "secrets": {"provider": "vault", "vault": {"kvstore": "kvv2"}},
+            "modules": {},
+            "defaults": {"ingressClass": None, "certManagerIssuer": None},
+        }
+    )
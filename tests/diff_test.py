@@ -0,0 +1,122 @@
+from pathlib import Path
+
+from transpire.internal.diff import (
+    MISSING,
+    FieldChange,
+    canonical_hash,
+    diff_module,
+    field_changes,
+)
+from transpire.internal.postprocessor import Pipeline
+from transpire.internal.render import write_manifests
+
+
+def configmap(name: str, value: str = "x") -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name},
+        "data": {"value": value},
+    }
+
+
+def test_canonical_hash_ignores_key_order() -> None:
+    assert canonical_hash({"a": 1, "b": [1, {"c": 2, "d": 3}]}) == canonical_hash(
+        {"b": [1, {"d": 3, "c": 2}], "a": 1}
+    )
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": "1"})
+
+
+class TestFieldChanges:
+    def test_nested(self) -> None:
+        old = {"spec": {"replicas": 1, "paused": True, "ports": [80, 443]}}
+        new = {"spec": {"replicas": 2, "ports": [80], "strategy": "Recreate"}}
+        assert list(field_changes(old, new)) == [
+            FieldChange("spec.paused", True, MISSING),
+            FieldChange("spec.ports[1]", 443, MISSING),
+            FieldChange("spec.replicas", 1, 2),
+            FieldChange("spec.strategy", MISSING, "Recreate"),
+        ]
+
+    def test_lists_matched_by_name(self) -> None:
+        old = {"env": [{"name": "A", "value": "1"}, {"name": "B", "value": "2"}]}
+        new = {
+            "env": [
+                {"name": "NEW", "value": "0"},
+                {"name": "A", "value": "1"},
+                {"name": "B", "value": "3"},
+            ]
+        }
+        assert list(field_changes(old, new)) == [
+            FieldChange("env[name=B].value", "2", "3"),
+            FieldChange("env[name=NEW]", MISSING, {"name": "NEW", "value": "0"}),
+        ]
+
+
+def test_diff_module(cluster_config, tmp_path: Path) -> None:
+    write_manifests(
+        cluster_config,
+        [configmap("a"), configmap("b"), configmap("c")],
+        "app",
+        tmp_path,
+    )
+    before = {p: p.read_bytes() for p in (tmp_path / "app").iterdir()}
+
+    result = diff_module(
+        [configmap("a"), configmap("b", "y"), configmap("d")],
+        "app",
+        tmp_path,
+        pipeline=Pipeline(cluster_config),
+    )
+    assert str(result) == "1 added, 1 changed, 1 removed, 1 unchanged"
+    assert [o.name for o in result.added] == ["d"]
+    assert [o.name for o in result.removed] == ["c"]
+    assert [(o.name, o.changes) for o in result.changed] == [
+        ("b", [FieldChange("data.value", "x", "y")])
+    ]
+    # nothing is written
+    assert {p: p.read_bytes() for p in (tmp_path / "app").iterdir()} == before
+
+
+def test_diff_module_compares_synced_secrets(cluster_config, tmp_path: Path) -> None:
+    secret = {
+        "apiVersion": "ocf.io/v1",
+        "kind": "SyncedSecret",
+        "metadata": {"name": "s"},
+        "spec": {"key": "a"},
+    }
+    write_manifests(cluster_config, [secret], "app", tmp_path)
+
+    secret["spec"]["key"] = "b"
+    result = diff_module([secret], "app", tmp_path, pipeline=Pipeline(cluster_config))
+    assert str(result) == "0 added, 1 changed, 0 removed, 0 unchanged"
+
+
+def test_diff_module_ignores_formatting(cluster_config, tmp_path: Path) -> None:
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "a_ConfigMap_app.yaml").write_text(
+        "kind: ConfigMap\napiVersion: v1\ndata: {value: x}\nmetadata: {name: a}\n"
+    )
+    result = diff_module(
+        [configmap("a")], "app", tmp_path, pipeline=Pipeline(cluster_config)
+    )
+    assert not result
+    assert result.unchanged == 1
+
+
+def test_diff_module_matches_what_a_build_removes(
+    cluster_config, tmp_path: Path
+) -> None:
+    write_manifests(cluster_config, [configmap("a")], "app", tmp_path)
+    (tmp_path / "app" / ".notes").write_text("scratch\n")
+    (tmp_path / "app" / "old").mkdir()
+    (tmp_path / "app" / "old" / "x.yaml").write_text("kind: ConfigMap\n")
+
+    result = diff_module(
+        [configmap("a")], "app", tmp_path, pipeline=Pipeline(cluster_config)
+    )
+    assert sorted(o.fname for o in result.removed) == [".notes", "old/"]
+
+    stats = write_manifests(cluster_config, [configmap("a")], "app", tmp_path)
+    assert stats is not None and stats.removed == len(result.removed)
+    assert [p.name for p in (tmp_path / "app").iterdir()] == ["a_ConfigMap_app.yaml"]
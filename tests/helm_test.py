@@ -0,0 +1,142 @@
+import contextvars
+import os
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+from transpire.internal import helm
+from transpire.internal.context import set_app_context
+
+
+@pytest.fixture
+def helm_calls(cli_config, monkeypatch: pytest.MonkeyPatch) -> list[tuple]:
+    calls: list[tuple] = []
+    monkeypatch.setattr(helm, "add_repo", lambda *args: calls.append(("add", *args)))
+    monkeypatch.setattr(
+        helm, "update_repo", lambda *args: calls.append(("update", *args))
+    )
+    return calls
+
+
+class TestRepoStateManager:
+    def test_once_per_process(self, helm_calls) -> None:
+        repos = helm.RepoStateManager()
+        for _ in range(3):
+            repos.ensure("foo", "https://example.com/charts")
+        assert helm_calls == [
+            ("add", "foo", "https://example.com/charts"),
+            ("update", "foo"),
+        ]
+
+    def test_fresh_index_skips_update(self, cli_config, helm_calls) -> None:
+        index = cli_config.cache_dir / "helm" / "repository" / "foo-index.yaml"
+        index.parent.mkdir(parents=True)
+        index.touch()
+
+        helm.RepoStateManager().ensure("foo", "https://example.com/charts")
+        assert ("update", "foo") not in helm_calls
+
+        stale = time.time() - cli_config.helm_repo_ttl - 1
+        os.utime(index, (stale, stale))
+        helm.RepoStateManager().ensure("foo", "https://example.com/charts")
+        assert ("update", "foo") in helm_calls
+
+    def test_ensure_all(self, helm_calls) -> None:
+        repos = {f"repo{i}": f"https://example.com/{i}" for i in range(5)}
+        helm.RepoStateManager().ensure_all(repos)
+        assert sorted(c for c in helm_calls if c[0] == "update") == [
+            ("update", name) for name in sorted(repos)
+        ]
+
+
+@pytest.fixture
+def helm_pulls(cli_config, monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """fake `helm pull` (each chart's tarball holds its arguments)"""
+    pulls: list[list[str]] = []
+
+    def exec_helm(args: list[str], check: bool = True) -> tuple[bytes, bytes]:
+        assert args[0] == "pull"
+        pulls.append(args)
+        destination = Path(args[args.index("--destination") + 1])
+        (destination / "chart.tgz").write_text(" ".join(args[1:-4]))
+        return b"", b""
+
+    monkeypatch.setattr(helm, "exec_helm", exec_helm)
+    monkeypatch.setattr(helm, "assert_helm", lambda: None)
+    return pulls
+
+
+class TestChartStore:
+    def test_pull_once(self, cli_config, helm_pulls) -> None:
+        store = helm.ChartStore()
+        assert store.get("https://example.com/charts", "foo", "1.0.0") is None
+
+        path = store.ensure("https://example.com/charts", "foo", "1.0.0")
+        assert store.ensure("https://example.com/charts", "foo", "1.0.0") == path
+        assert helm.ChartStore().get("https://example.com/charts", "foo", "1.0.0") == (
+            path
+        )
+        assert len(helm_pulls) == 1
+        assert path.parent == cli_config.cache_dir / "charts" / "foo" / "1.0.0"
+        assert path.read_text() == "foo --repo https://example.com/charts"
+
+        (entry,) = store.index().values()
+        assert path.name == f"{entry['digest']}.tgz"
+
+    def test_oci(self, helm_pulls) -> None:
+        path = helm.ChartStore().ensure("oci://ghcr.io/example/charts", "foo", "1")
+        assert path.read_text() == "oci://ghcr.io/example/charts/foo"
+
+    def test_template_from_store(
+        self, helm_pulls, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        templated: list[list[str]] = []
+
+        def stream_helm(args: list[str]):
+            templated.append(args)
+            yield {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "a"}}
+
+        monkeypatch.setattr(helm, "stream_helm", stream_helm)
+        monkeypatch.setattr(helm, "chart_store", helm.ChartStore())
+
+        def build():
+            set_app_context(types.SimpleNamespace(namespace="ns"))  # type: ignore
+            return helm.build_chart("https://example.com", "foo", "bar", "1.0.0")
+
+        contextvars.copy_context().run(build)
+        (args,) = templated
+        assert args[-1] == str(
+            helm.chart_store.get("https://example.com", "foo", "1.0.0")
+        )
+        assert "--version" not in args
+
+    def test_truncated_cache_entry_is_rerendered(
+        self, helm_pulls, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        templated: list[list[str]] = []
+
+        def stream_helm(args: list[str]):
+            templated.append(args)
+            for name in "abcdefgh":
+                yield {
+                    "apiVersion": "v1",
+                    "kind": "ConfigMap",
+                    "metadata": {"name": name},
+                    "data": {"value": name * 4096},
+                }
+
+        monkeypatch.setattr(helm, "stream_helm", stream_helm)
+        monkeypatch.setattr(helm, "chart_store", helm.ChartStore())
+
+        def build():
+            set_app_context(types.SimpleNamespace(namespace="ns"))  # type: ignore
+            return helm.build_chart("https://example.com", "foo", "bar", "1.0.0")
+
+        expected = contextvars.copy_context().run(build)
+        (entry,) = (helm._render_cache.root).rglob("*.pickle.gz")
+        entry.write_bytes(entry.read_bytes()[: entry.stat().st_size // 2])
+
+        assert contextvars.copy_context().run(build) == expected
+        assert len(templated) == 2
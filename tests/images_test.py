@@ -0,0 +1,241 @@
+import ast
+import json
+import os
+import subprocess
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from transpire.internal import config
+from transpire.internal.cli import cli
+from transpire.internal.cli.image import image_matrix
+from transpire.internal.config import GitModuleConfig
+from transpire.internal.images import Registry, repository
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "transpire",
+    "GIT_AUTHOR_EMAIL": "transpire@example.com",
+    "GIT_COMMITTER_NAME": "transpire",
+    "GIT_COMMITTER_EMAIL": "transpire@example.com",
+}
+
+MODULE = """\
+from transpire.types import Image
+
+name = {name!r}
+
+
+def images():
+    yield Image(name="web", path="/{dir}/web")
+    yield Image(name="worker", path="/{dir}/worker", target="worker")
+"""
+
+TOKEN = "anonymous-token"
+
+
+class FakeRegistry(ThreadingHTTPServer):
+    """A registry that only knows which tags exist, behind anonymous token auth."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.tags: set[str] = set()
+        self.token_requests: list[str] = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: FakeRegistry
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        # /token?service=...&scope=...
+        self.server.token_requests.append(self.path)
+        body = json.dumps({"token": TOKEN}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        # /v2/<repository>/manifests/<tag>
+        repository, _, tag = self.path.removeprefix("/v2/").partition("/manifests/")
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            self.send_response(401)
+            self.send_header(
+                "WWW-Authenticate",
+                f'Bearer realm="{self.server.url}/token",service="registry",'
+                f'scope="repository:{repository}:pull"',
+            )
+        elif f"{repository}:{tag}" in self.server.tags:
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def registry() -> Iterator[FakeRegistry]:
+    server = FakeRegistry()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, **GIT_ENV},
+    ).stdout.strip()
+
+
+@pytest.fixture
+def remote(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(config, "_fetched_repos", {})
+    repo = tmp_path / "remote"
+    for name in ["one", "two"]:
+        (repo / name).mkdir(parents=True)
+        (repo / name / ".transpire.py").write_text(MODULE.format(name=name, dir=name))
+        for image in ["web", "worker"]:
+            (repo / name / image).mkdir()
+            (repo / name / image / "Dockerfile").write_text("FROM scratch\n")
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "init")
+    return repo
+
+
+def load(remote: Path, name: str = "one") -> tuple[GitModuleConfig, object]:
+    module_config = GitModuleConfig(git=f"file://{remote}", dir=Path(name))
+    config._fetched_repos.clear()
+    return module_config, module_config.load_module(name)
+
+
+def pushed(images: list[dict]) -> set[str]:
+    """the fingerprint tags of built images, without their hosts"""
+    return {tag.split("/", 1)[1] for image in images for tag in image["tags"][2:]}
+
+
+def test_unchanged_images_are_skipped(
+    cli_config, remote: Path, registry: FakeRegistry
+) -> None:
+    client = Registry({"ghcr.io": registry.url})
+    images, retag = image_matrix([load(remote)], client)
+    assert [i["name"] for i in images] == ["web", "worker"]
+    assert retag == []
+    assert all(i["tags"][2].startswith("ghcr.io/ocf/one-") for i in images)
+    registry.tags |= pushed(images)
+
+    (remote / "one" / "worker" / "Dockerfile").write_text("FROM busybox\n")
+    git(remote, "commit", "-q", "-am", "change the worker")
+    module_config, module = load(remote)
+    rebuilt, retag = image_matrix([(module_config, module)], client)
+
+    assert [i["name"] for i in rebuilt] == ["worker"]
+    assert rebuilt[0]["tags"][2] != images[1]["tags"][2]
+    assert retag == [
+        {
+            "module": "one",
+            "name": "web",
+            "source": images[0]["tags"][2],
+            "tags": [
+                f"ghcr.io/ocf/one-web:{module.revision}",
+                "ghcr.io/ocf/one-web:latest",
+            ],
+        }
+    ]
+    # a token is fetched once per repository
+    assert len(registry.token_requests) == 2
+
+    images, retag = image_matrix([(module_config, module)], None)
+    assert len(images) == 2 and retag == []
+
+
+def test_fingerprints_include_target(cli_config, remote: Path) -> None:
+    (remote / "one" / ".transpire.py").write_text(
+        MODULE.format(name="one", dir="one").replace("/one/worker", "/one/web")
+    )
+    git(remote, "commit", "-q", "-am", "share a context")
+
+    images, _ = image_matrix([load(remote)], None)
+    # built from the same tree, with different targets
+    assert images[0]["context"] == images[1]["context"]
+    assert images[0]["tags"][2] != images[1]["tags"][2]
+
+
+def test_all_git_modules(
+    cli_config,
+    remote: Path,
+    registry: FakeRegistry,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cluster = tmp_path / "cluster"
+    cluster.mkdir()
+    (cluster / "cluster.toml").write_text(
+        f"""\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+
+[modules.one]
+git = "file://{remote}"
+dir = "one"
+
+[modules.two]
+git = "file://{remote}"
+dir = "two"
+"""
+    )
+    output = tmp_path / "github_output"
+    monkeypatch.chdir(cluster)
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output))
+    monkeypatch.setattr(
+        "transpire.internal.cli.image.Registry",
+        lambda: Registry({"ghcr.io": registry.url}),
+    )
+
+    result = CliRunner().invoke(
+        cli, ["image", "build", "--all", "-o", "gha"], catch_exceptions=False
+    )
+    assert result.exit_code == 0, result.output
+    lines = dict(line.split("=", 1) for line in output.read_text().splitlines())
+    matrix = ast.literal_eval(lines["image_matrix"])
+    assert [(i["module"], i["name"]) for i in matrix] == [
+        ("one", "web"),
+        ("one", "worker"),
+        ("two", "web"),
+        ("two", "worker"),
+    ]
+    assert ast.literal_eval(lines["image_retag"]) == []
+
+
+def test_repository() -> None:
+    assert repository("ghcr.io/ocf/web:abc123") == "ghcr.io/ocf/web"
+    assert repository("registry:5000/org/img:tag") == "registry:5000/org/img"
+    assert repository("registry:5000/org/img") == "registry:5000/org/img"
+    assert repository("img:tag") == "img"
@@ -0,0 +1,119 @@
+import os
+import stat
+import subprocess
+from pathlib import Path
+
+import pytest
+import yaml
+
+from transpire.internal import kustomize
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "transpire",
+    "GIT_AUTHOR_EMAIL": "transpire@example.com",
+    "GIT_COMMITTER_NAME": "transpire",
+    "GIT_COMMITTER_EMAIL": "transpire@example.com",
+}
+
+
+@pytest.fixture
+def kubectl_log(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """a fake kubectl that logs its arguments, returning the log's path"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "kubectl.log"
+    script = bin_dir / "kubectl"
+    script.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> {log}\n'
+        "printf 'apiVersion: v1\\nkind: ConfigMap\\nmetadata:\\n  name: a\\n'\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(kustomize, "_resolved_refs", {})
+    log.touch()
+    return log
+
+
+@pytest.fixture
+def remote(tmp_path: Path) -> Path:
+    repo = tmp_path / "remote"
+    subprocess.run(["git", "init", "-q", "-b", "main", repo], check=True)
+    commit(repo)
+    return repo
+
+
+def commit(repo: Path) -> None:
+    subprocess.run(
+        ["git", "commit", "-q", "--allow-empty", "-m", "change"],
+        cwd=repo,
+        check=True,
+        env={**os.environ, **GIT_ENV},
+    )
+
+
+def calls(log: Path) -> int:
+    return len(log.read_text().splitlines())
+
+
+class TestKustomizationCache:
+    def test_cached_by_ref(self, cli_config, kubectl_log) -> None:
+        url = "https://github.com/example/manifests/"
+        first = kustomize.build_kustomization(url, "deploy", "v1.0.0")
+        assert kustomize.build_kustomization(url, "deploy", "v1.0.0") == first
+        assert calls(kubectl_log) == 1
+
+        kustomize.build_kustomization(url, "deploy", "v1.1.0")
+        kustomize.build_kustomization(url, "deploy", "v1.1.0", cache=False)
+        assert calls(kubectl_log) == 3
+
+    def test_revalidate(self, cli_config, kubectl_log, remote, monkeypatch) -> None:
+        url = f"file://{remote}/"
+        kustomize.build_kustomization(url, "deploy", "main", revalidate=True)
+        kustomize.build_kustomization(url, "deploy", "main", revalidate=True)
+        assert calls(kubectl_log) == 1
+
+        # a new build (process) sees the branch has moved on
+        commit(remote)
+        monkeypatch.setattr(kustomize, "_resolved_refs", {})
+        kustomize.build_kustomization(url, "deploy", "main", revalidate=True)
+        assert calls(kubectl_log) == 2
+
+    def test_unresolvable_remote(self, cli_config, kubectl_log, tmp_path) -> None:
+        url = f"file://{tmp_path}/missing/"
+        kustomize.build_kustomization(url, "deploy", "main", revalidate=True)
+        kustomize.build_kustomization(url, "deploy", "main", revalidate=True)
+        assert calls(kubectl_log) == 2
+
+
+def test_git_remote() -> None:
+    assert (
+        kustomize.git_remote("https://github.com/example/repo//deploy/base")
+        == "https://github.com/example/repo"
+    )
+    assert (
+        kustomize.git_remote("https://github.com/example/repo/")
+        == "https://github.com/example/repo"
+    )
+
+
+@pytest.mark.parametrize("exit_code, error", [(0, yaml.YAMLError), (1, ValueError)])
+def test_invalid_output_is_drained(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, exit_code: int, error: type
+) -> None:
+    # invalid YAML, then more output than fits in a pipe
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "kubectl"
+    script.write_text(
+        "#!/bin/sh\n"
+        "echo 'a: b: c'\n"
+        "head -c 1000000 /dev/zero | tr '\\0' x\n"
+        "echo 'kustomize exploded' >&2\n"
+        f"exit {exit_code}\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    with pytest.raises(error):
+        list(kustomize.stream_kustomize(["."]))
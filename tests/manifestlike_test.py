@@ -0,0 +1,97 @@
+import contextvars
+import datetime
+import types
+
+import pytest
+from kubernetes import client
+
+from transpire.internal.config import ClusterConfig
+from transpire.internal.context import set_app_context, set_global_context
+from transpire.manifestlike import manifest_to_dict
+from transpire.resources import (
+    ConfigMap,
+    Deployment,
+    Ingress,
+    PersistentVolumeClaim,
+    Secret,
+    Service,
+    models,
+)
+from transpire.resources.statefulset import StatefulSet
+
+
+def build_resources():
+    deployment = Deployment("web", "nginx:1.25", [80, "http"], args=["--verbose"])
+    (
+        deployment.pod_spec()
+        .with_embedded_env({"A": "1", "B": "2"})
+        .with_configmap_env("web-config")
+        .with_secret_env("web-secret", mapping={"PASSWORD": "password"})
+        .with_probes(
+            liveness=models.V1Probe(
+                http_get=models.V1HTTPGetAction(path="/healthz", port=80)
+            )
+        )
+    )
+    service = Service("web", deployment.get_selector(), 80, 8080)
+    statefulset = StatefulSet("db", "postgres:16", [5432], "db")
+    return [
+        deployment.obj,
+        service.obj,
+        statefulset.obj,
+        Ingress.from_svc(service, "web.example.com").obj,
+        ConfigMap("web-config", data={"a.conf": "x = 1\n"}).obj,
+        PersistentVolumeClaim("web-data", "1Gi", ["ReadWriteOnce"]).obj,
+        Secret("web-secret", {"password": "hunter2"}).obj,
+    ]
+
+
+@pytest.fixture
+def resources(cluster_config: ClusterConfig) -> list:
+    app = types.SimpleNamespace(name="web", namespace="web")
+
+    def build():
+        set_global_context(cluster_config)
+        set_app_context(app)  # type: ignore[arg-type]
+        return build_resources()
+
+    return contextvars.copy_context().run(build)
+
+
+class TestManifestToDict:
+    def test_matches_api_client(self, resources: list) -> None:
+        api_client = client.ApiClient()
+        for obj in resources:
+            assert manifest_to_dict(obj) == api_client.sanitize_for_serialization(obj)
+
+    def test_validated_models(self) -> None:
+        obj = client.V1Pod(
+            metadata=client.V1ObjectMeta(
+                name="pod",
+                creation_timestamp=datetime.datetime(2024, 1, 1, 12, 0),
+                labels={"app": "pod"},
+            ),
+            spec=client.V1PodSpec(
+                containers=[client.V1Container(name="main", args=["a", "b"])]
+            ),
+        )
+        assert manifest_to_dict(obj) == client.ApiClient().sanitize_for_serialization(
+            obj
+        )
+
+    def test_dict_passthrough(self) -> None:
+        obj = {"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": "x"}}
+        assert manifest_to_dict(obj) == obj
+
+    def test_unsupported(self) -> None:
+        with pytest.raises(TypeError):
+            manifest_to_dict(object())  # type: ignore[arg-type]
+
+
+class TestModels:
+    def test_models_are_client_classes(self, resources: list) -> None:
+        assert models.V1Deployment is client.V1Deployment
+        assert isinstance(resources[0], models.V1Deployment)
+        shared = models.build(client.V1ObjectMeta).local_vars_configuration
+        assert not shared.client_side_validation
+        assert resources[0].metadata.local_vars_configuration is shared
@@ -0,0 +1,118 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from transpire.internal import helm, parallel, trace
+from transpire.internal.cli import cli
+
+CLUSTER_TOML = """\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+"""
+
+MODULE = """\
+from transpire.internal import helm
+
+name = {name!r}
+
+
+def objects():
+    # a cache lookup, so that the worker has cache stats to send back
+    helm._render_cache.iter(helm._render_cache.key("parallel_test", name))
+    for i in range(3):
+        yield {{
+            "apiVersion": "v1",
+            "kind": "ConfigMap",
+            "metadata": {{"name": f"{{name}}-{{i}}"}},
+            "data": {{"module": name}},
+        }}
+"""
+
+NAMES = ["one", "two", "three"]
+
+
+@pytest.fixture
+def cluster(tmp_path: Path, cli_config, monkeypatch: pytest.MonkeyPatch) -> Path:
+    root = tmp_path / "cluster"
+    root.mkdir()
+    toml = CLUSTER_TOML
+    for name in NAMES:
+        (root / "apps" / name).mkdir(parents=True)
+        (root / "apps" / name / ".transpire.py").write_text(MODULE.format(name=name))
+        toml += f'\n[modules.{name}]\npath = "apps/{name}/.transpire.py"\n'
+    (root / "cluster.toml").write_text(toml)
+    # workers read the cache dir from the environment, not the fixture
+    monkeypatch.setenv("TRANSPIRE_CACHE_DIR", str(cli_config.cache_dir))
+    monkeypatch.chdir(root)
+    return root
+
+
+def build(out: Path, *args: str) -> None:
+    result = CliRunner().invoke(
+        cli, ["object", "build", str(out), *args], catch_exceptions=False
+    )
+    assert result.exit_code == 0, result.output
+
+
+def tree(root: Path) -> dict[str, bytes]:
+    return {
+        str(p.relative_to(root)): p.read_bytes()
+        for p in sorted(root.rglob("*"))
+        if p.is_file() and p.name != ".transpire-state.json"
+    }
+
+
+def test_parallel_build(
+    cluster: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # a worker per module, so the pool replaces its workers
+    monkeypatch.setattr(parallel, "MAX_MODULES_PER_WORKER", 1)
+    monkeypatch.setattr(trace, "_events", [])
+    misses = helm._render_cache.stats.misses
+
+    build(tmp_path / "sequential", "-j", "1")
+    assert helm._render_cache.stats.misses == misses + len(NAMES)
+
+    trace_file = tmp_path / "trace.json"
+    build(tmp_path / "parallel", "-j", "2", "--trace", str(trace_file))
+    assert tree(tmp_path / "parallel") == tree(tmp_path / "sequential")
+    for name in NAMES:
+        assert len(list((tmp_path / "parallel" / name).iterdir())) == 3
+
+    # the workers' cache stats and spans are merged into the parent's
+    assert helm._render_cache.stats.misses == misses + 2 * len(NAMES)
+    events = json.loads(trace_file.read_text())
+    events = events["traceEvents"] if isinstance(events, dict) else events
+    module_spans = [e for e in events if e.get("name", "").startswith("module ")]
+    assert sorted(e["name"] for e in module_spans) == [
+        f"module {n}" for n in sorted(NAMES)
+    ]
+    pids = {e["pid"] for e in module_spans}
+    assert os.getpid() not in pids
+    assert len(pids) == len(NAMES)
+
+
+def test_parallel_build_of_one_module(cluster: Path, tmp_path: Path) -> None:
+    build(tmp_path / "out", "-j", "2", "--module", "two")
+    assert sorted(p.name for p in (tmp_path / "out").iterdir() if p.is_dir()) == [
+        "base",
+        "two",
+    ]
+
+
+def test_compact_build(cluster: Path, tmp_path: Path) -> None:
+    build(tmp_path / "plain", "-j", "1")
+    build(tmp_path / "parallel", "-j", "2", "--compact")
+    assert tree(tmp_path / "parallel") == tree(tmp_path / "plain")
@@ -0,0 +1,47 @@
+import pytest
+
+from transpire.internal import postprocessor
+from transpire.internal.postprocessor import Pipeline
+
+
+def secret(name: str) -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "Secret",
+        "metadata": {"name": name},
+        "stringData": {"password": "hunter2"},
+    }
+
+
+class TestPipeline:
+    def test_secret_conversion(self, cluster_config) -> None:
+        pipeline = Pipeline(cluster_config)
+        converted = pipeline.process(secret("db"), "app")
+        assert converted["kind"] == "VaultSecret"
+        assert converted["spec"]["path"] == "kvv2/app/db"
+        assert converted["spec"]["keys"] == ["password"]
+
+    def test_provider_created_once_per_namespace(self, cluster_config) -> None:
+        pipeline = Pipeline(cluster_config)
+        for i in range(3):
+            pipeline.process(secret(f"s{i}"), "app")
+        assert list(pipeline._providers) == ["app"]
+        assert pipeline.provider("app") is pipeline.provider("app")
+        assert pipeline.provider("app") is not pipeline.provider("other")
+
+    def test_batch_stage(self, cluster_config, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(postprocessor, "_batch_stages", [])
+
+        @postprocessor.register_batch_stage
+        def label(pipeline, objs, appname):
+            for obj in objs:
+                obj["metadata"].setdefault("labels", {})["app"] = appname
+            return objs
+
+        objs = [{"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "a"}}]
+        out = list(Pipeline(cluster_config).process_batch(objs, "app"))
+        assert out[0]["metadata"]["labels"] == {"app": "app"}
+
+    def test_no_batch_stages_stays_lazy(self, cluster_config) -> None:
+        objs = iter([])
+        assert Pipeline(cluster_config).process_batch(objs, "app") is objs
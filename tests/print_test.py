@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from transpire.internal import yamlio
+from transpire.internal.cli import cli
+
+CLUSTER_TOML = """\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+
+[modules.one]
+path = "apps/one/.transpire.py"
+
+[modules.two]
+path = "apps/two/.transpire.py"
+"""
+
+MODULE = """\
+name = {name!r}
+
+
+def objects():
+    yield {{"apiVersion": "v1", "kind": "ConfigMap", "metadata": {{"name": "config"}}}}
+    yield {{"apiVersion": "v1", "kind": "Service", "metadata": {{"name": name}}}}
+"""
+
+
+@pytest.fixture
+def cluster(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    (tmp_path / "cluster.toml").write_text(CLUSTER_TOML)
+    for name in ["one", "two"]:
+        (tmp_path / "apps" / name).mkdir(parents=True)
+        (tmp_path / "apps" / name / ".transpire.py").write_text(
+            MODULE.format(name=name)
+        )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def run(*args: str) -> str:
+    result = CliRunner().invoke(cli, ["object", "print", *args], catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def names(objs: list[dict]) -> list[str]:
+    return [f"{o['kind']}/{o['metadata']['name']}" for o in objs]
+
+
+def test_formats(cluster: Path) -> None:
+    expected = ["ConfigMap/config", "Service/one"]
+    assert names(list(yamlio.load_all(run("one")))) == expected
+    assert names(json.loads(run("one", "--format", "json"))) == expected
+    lines = run("one", "-f", "jsonl").splitlines()
+    assert names([json.loads(line) for line in lines]) == expected
+
+
+def test_empty_json_is_an_array(cluster: Path) -> None:
+    assert json.loads(run("one", "-f", "json", "--kind", "Secret")) == []
+
+
+def test_modules_and_filters(cluster: Path) -> None:
+    def printed(*args: str) -> list[str]:
+        return names(json.loads(line) for line in run("-f", "jsonl", *args).split())
+
+    assert printed("one", "two") == [
+        "ConfigMap/config",
+        "Service/one",
+        "ConfigMap/config",
+        "Service/two",
+    ]
+    assert printed("--all", "--kind", "service") == ["Service/one", "Service/two"]
+    assert printed("--all", "--name", "t*", "--name", "config") == [
+        "ConfigMap/config",
+        "ConfigMap/config",
+        "Service/two",
+    ]
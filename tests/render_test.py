@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from transpire.internal.render import WriteStats, write_manifests
+
+
+def configmap(name: str, value: str = "x") -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name},
+        "data": {"value": value},
+    }
+
+
+class TestWriteManifests:
+    def test_incremental(self, cluster_config, tmp_path: Path) -> None:
+        objs = [configmap("a"), configmap("b"), configmap("c")]
+        assert write_manifests(cluster_config, objs, "app", tmp_path) == WriteStats(
+            added=3
+        )
+
+        unchanged = tmp_path / "app" / "a_ConfigMap_app.yaml"
+        mtime = unchanged.stat().st_mtime_ns
+
+        objs = [configmap("a"), configmap("b", "y"), configmap("d")]
+        assert write_manifests(cluster_config, objs, "app", tmp_path) == WriteStats(
+            added=1, changed=1, removed=1, unchanged=1
+        )
+        assert unchanged.stat().st_mtime_ns == mtime
+        assert sorted(p.name for p in (tmp_path / "app").iterdir()) == [
+            "a_ConfigMap_app.yaml",
+            "b_ConfigMap_app.yaml",
+            "d_ConfigMap_app.yaml",
+        ]
+        assert "value: y" in (tmp_path / "app" / "b_ConfigMap_app.yaml").read_text()
+
+    def test_synced_secrets_are_rewritten(self, cluster_config, tmp_path: Path) -> None:
+        def secret(key: str) -> dict:
+            return {
+                "apiVersion": "ocf.io/v1",
+                "kind": "SyncedSecret",
+                "metadata": {"name": "s"},
+                "spec": {"key": key},
+            }
+
+        write_manifests(cluster_config, [secret("a")], "app", tmp_path)
+        assert write_manifests(
+            cluster_config, [secret("b")], "app", tmp_path
+        ) == WriteStats(changed=1)
+        assert "key: b" in (tmp_path / "app" / "s_SyncedSecret_app.yaml").read_text()
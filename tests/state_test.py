@@ -0,0 +1,174 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import transpire
+from transpire.internal import state
+from transpire.internal.config import ClusterConfig, LocalModuleConfig
+from transpire.internal.state import BuildState, ModuleState, fingerprint
+
+CLUSTER_TOML = """\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+
+[modules.one]
+path = "apps/one/.transpire.py"
+
+[modules.two]
+path = "apps/two/.transpire.py"
+"""
+
+MODULE = """\
+name = {name!r}
+
+
+def objects():
+    yield {{
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {{"name": name}},
+        "data": {{"value": {value!r}}},
+    }}
+"""
+
+
+def write_module(root: Path, name: str, value: str) -> None:
+    module_dir = root / "apps" / name
+    module_dir.mkdir(parents=True, exist_ok=True)
+    (module_dir / ".transpire.py").write_text(MODULE.format(name=name, value=value))
+
+
+@pytest.fixture
+def cluster(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    root = tmp_path / "cluster"
+    root.mkdir()
+    (root / "cluster.toml").write_text(CLUSTER_TOML)
+    write_module(root, "one", "1")
+    write_module(root, "two", "2")
+    monkeypatch.chdir(root)
+    return root
+
+
+def build(cluster: Path, *args: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-m", "transpire", "object", "build", "out", *args],
+        cwd=cluster,
+        env={**os.environ, "TRANSPIRE_CACHE_DIR": str(cluster.parent / "cache")},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stderr
+
+
+class TestFingerprint:
+    def test_stable(self, cluster: Path, cluster_config: ClusterConfig) -> None:
+        module = LocalModuleConfig(path=Path("apps/one/.transpire.py"))
+        assert fingerprint(cluster_config, "one", module) == fingerprint(
+            cluster_config, "one", module
+        )
+
+    def test_changes_with_inputs(
+        self, cluster: Path, cluster_config: ClusterConfig
+    ) -> None:
+        module = LocalModuleConfig(path=Path("apps/one/.transpire.py"))
+        before = fingerprint(cluster_config, "one", module)
+
+        (cluster / "apps" / "one" / "versions.toml").write_text("[a]\nversion = 1\n")
+        after_versions = fingerprint(cluster_config, "one", module)
+        assert after_versions != before
+
+        cluster_config.defaults.ingressClass = "nginx"
+        assert fingerprint(cluster_config, "one", module) != after_versions
+
+    def test_changes_with_transpire_sources(
+        self,
+        cluster: Path,
+        cluster_config: ClusterConfig,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        # what an editable install, or an uninstalled checkout, would look like
+        package = tmp_path / "transpire"
+        (package / "internal").mkdir(parents=True)
+        (package / "__init__.py").write_text("")
+        (package / "internal" / "render.py").write_text("x = 1\n")
+        monkeypatch.setattr(transpire, "__file__", str(package / "__init__.py"))
+        module = LocalModuleConfig(path=Path("apps/one/.transpire.py"))
+        before = fingerprint(cluster_config, "one", module)
+
+        (package / "internal" / "render.py").write_text("x = 2\n")
+        state._sources_digest.cache_clear()
+        assert fingerprint(cluster_config, "one", module) != before
+
+    def test_ignores_bytecode(
+        self, cluster: Path, cluster_config: ClusterConfig
+    ) -> None:
+        module = LocalModuleConfig(path=Path("apps/one/.transpire.py"))
+        before = fingerprint(cluster_config, "one", module)
+        (cluster / "apps" / "one" / "__pycache__").mkdir()
+        (cluster / "apps" / "one" / "__pycache__" / "x.pyc").write_bytes(b"x")
+        assert fingerprint(cluster_config, "one", module) == before
+
+
+def test_state_round_trip(tmp_path: Path) -> None:
+    state = BuildState.load(tmp_path)
+    assert state.modules == {}
+    state.record("one", ModuleState("abc", "one", True))
+    state.save()
+
+    loaded = BuildState.load(tmp_path)
+    assert loaded.modules == {"one": ModuleState("abc", "one", True)}
+    # the module's output is gone, so it must be rebuilt
+    assert not loaded.is_current("one", "abc")
+    (tmp_path / "one").mkdir()
+    assert loaded.is_current("one", "abc")
+    assert not loaded.is_current("one", "def")
+
+
+def test_build_skips_unchanged(cluster: Path) -> None:
+    build(cluster)
+    out = cluster / "out"
+    assert "value: '1'" in (out / "one" / "one_ConfigMap_one.yaml").read_text()
+
+    log = build(cluster)
+    assert "Skipped 2 unchanged modules" in log
+    assert "Building" not in log
+    assert len(list((out / "base").iterdir())) == 2
+
+    write_module(cluster, "one", "changed")
+    log = build(cluster)
+    assert "Skipped 1 unchanged modules" in log
+    assert "Building one" in log
+    assert "value: changed" in (out / "one" / "one_ConfigMap_one.yaml").read_text()
+
+    log = build(cluster, "--force")
+    assert "Skipped" not in log
+    assert "Building one" in log and "Building two" in log
+
+
+def test_build_removes_applications_of_removed_modules(cluster: Path) -> None:
+    build(cluster)
+    base = cluster / "out" / "base"
+    assert sorted(p.name.split("_")[0] for p in base.iterdir()) == ["one", "two"]
+
+    # building one module leaves the others' Applications alone
+    build(cluster, "--module", "one")
+    assert len(list(base.iterdir())) == 2
+
+    toml = CLUSTER_TOML.replace('[modules.two]\npath = "apps/two/.transpire.py"\n', "")
+    (cluster / "cluster.toml").write_text(toml)
+    build(cluster)
+    assert sorted(p.name.split("_")[0] for p in base.iterdir()) == ["one"]
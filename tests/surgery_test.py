@@ -2,7 +2,14 @@ from typing import Any
 
 import pytest
 
-from transpire.surgery import delve, edit_manifests, make_edit_manifest, shelve
+from transpire.surgery import (
+    Selector,
+    delve,
+    edit_manifests,
+    make_edit_manifest,
+    select_manifests,
+    shelve,
+)
 
 
 class TestDelve:
@@ -172,3 +179,79 @@ class TestMakeEditManifest:
             )
             == expected
         )
+
+
+class TestSelector:
+    def make_manifest(self, kind, name, labels=None, namespace=None) -> dict:
+        metadata: dict[str, Any] = {"name": name, "labels": labels or {}}
+        if namespace is not None:
+            metadata["namespace"] = namespace
+        return {"apiVersion": "v1", "kind": kind, "metadata": metadata}
+
+    def manifests(self) -> list[dict]:
+        return [
+            self.make_manifest("Service", "web", {"app": "web", "tier": "frontend"}),
+            self.make_manifest("Service", "api", {"app": "api", "tier": "backend"}),
+            self.make_manifest("ConfigMap", "web-config", {"app": "web"}, "prod"),
+            self.make_manifest(
+                "ConfigMap", "api-config", {"app": "api", "canary": "1"}
+            ),
+            self.make_manifest("Secret", "db", namespace="prod"),
+        ]
+
+    def names(self, selector: Selector) -> list[str]:
+        return [
+            m["metadata"]["name"] for m in select_manifests(selector, self.manifests())
+        ]
+
+    def test_kind_and_name_wildcards(self) -> None:
+        assert self.names(Selector(kind="Service")) == ["web", "api"]
+        assert self.names(Selector(name="*-config")) == ["web-config", "api-config"]
+        assert self.names(Selector(kind="*Map", name="web*")) == ["web-config"]
+        assert self.names(Selector(kind="Ingress")) == []
+
+    def test_labels(self) -> None:
+        assert self.names(Selector(labels={"app": "web"})) == ["web", "web-config"]
+        assert self.names(Selector(labels="tier in (frontend, backend)")) == [
+            "web",
+            "api",
+        ]
+        assert self.names(Selector(labels="app=api,!canary")) == ["api"]
+        assert self.names(Selector(labels="app,tier!=frontend")) == [
+            "api",
+            "web-config",
+            "api-config",
+        ]
+        assert self.names(Selector(labels="app notin (web)")) == [
+            "api",
+            "api-config",
+            "db",
+        ]
+        with pytest.raises(ValueError, match="invalid label selector"):
+            Selector(labels="app in web")
+
+    def test_namespace(self) -> None:
+        assert self.names(Selector(namespace="prod")) == ["web-config", "db"]
+
+    def test_edit_manifests_with_selectors(self) -> None:
+        def label(m: dict) -> dict:
+            m["metadata"]["labels"]["edited"] = "yes"
+            return m
+
+        edited = edit_manifests(
+            {
+                Selector(kind="ConfigMap"): label,
+                Selector(kind="Secret"): lambda m: None,
+                ("Service", "web"): label,
+            },
+            self.manifests(),
+        )
+        assert [
+            (m["metadata"]["name"], "edited" in m["metadata"]["labels"]) for m in edited
+        ] == [("web", True), ("api", False), ("web-config", True), ("api-config", True)]
+
+    def test_unmatched_selector(self) -> None:
+        with pytest.raises(
+            RuntimeError, match=r"Some edits were not applied:.*Ingress"
+        ):
+            edit_manifests({Selector(kind="Ingress"): lambda m: m}, self.manifests())
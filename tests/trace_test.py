@@ -0,0 +1,84 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from transpire.internal import helm, trace
+
+
+@pytest.fixture
+def tracing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(trace, "_events", [])
+    monkeypatch.setattr(trace, "_enabled", True)
+
+
+@pytest.fixture
+def fake_helm(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """a helm that renders one document, complains, and fails"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "helm"
+    script.write_text(
+        "#!/bin/sh\n"
+        "echo 'kind: ConfigMap'\n"
+        "echo 'Error: chart exploded' >&2\n"
+        "exit 3\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+class TestTrace:
+    def test_disabled_records_nothing(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(trace, "_events", [])
+        with trace.span("nothing", "test") as args:
+            args["x"] = 1
+        assert list(trace.busy([1, 2], args)) == [1, 2]
+        assert trace.drain() == []
+
+    def test_span(self, tracing) -> None:
+        with pytest.raises(KeyError):
+            with trace.span("outer", "test", a=1):
+                with trace.span("inner", "test") as args:
+                    args["b"] = 2
+                raise KeyError("boom")
+
+        inner, outer = trace.drain()
+        assert (inner["name"], inner["args"]) == ("inner", {"b": 2})
+        assert outer["args"] == {"a": 1, "error": "KeyError('boom')"}
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+        assert trace.drain() == []
+
+    def test_busy(self, tracing) -> None:
+        args: dict = {}
+        assert list(trace.busy(iter(range(3)), args)) == [0, 1, 2]
+        assert args["busy_ms"] >= 0
+
+    def test_subprocess_failure(self, tracing, cli_config, fake_helm) -> None:
+        with pytest.raises(ValueError):
+            list(helm.stream_helm(["template", "foo/bar"]))
+
+        (event,) = trace.drain()
+        assert event["name"] == "helm template"
+        assert event["args"]["exit_code"] == 3
+        assert event["args"]["stderr"] == "Error: chart exploded\n"
+
+    def test_write(self, tracing, tmp_path: Path) -> None:
+        with trace.span("build", "build"):
+            pass
+        trace.extend([{**trace._events[0], "pid": -1}])
+
+        trace.write(tmp_path / "trace.json")
+        events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+        names = {e["pid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+        assert names == {os.getpid(): "transpire", -1: "worker -1"}
+        assert [e["name"] for e in events if e["ph"] == "X"] == ["build", "build"]
+
+    def test_profiled(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+        monkeypatch.setattr(trace, "_profile_dir", tmp_path)
+        with trace.profiled("app"):
+            sum(range(1000))
+        assert (tmp_path / "app.prof").stat().st_size > 0
@@ -0,0 +1,41 @@
+import types
+
+from transpire.internal.context import get_app_context
+from transpire.types import Module
+
+
+def make_module(name: str) -> Module:
+    pymodule = types.ModuleType(name)
+    pymodule.name = name  # type: ignore[attr-defined]
+
+    def objects():
+        for i in range(3):
+            yield {
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {"name": f"{get_app_context().name}-{i}"},
+            }
+        yield None
+
+    pymodule.objects = objects  # type: ignore[attr-defined]
+    return Module(pymodule)
+
+
+class TestModule:
+    def test_iter_objects_matches_objects(self) -> None:
+        module = make_module("foo")
+        assert list(module.iter_objects()) == module.objects
+        assert [o["metadata"]["name"] for o in module.objects] == [
+            "foo-0",
+            "foo-1",
+            "foo-2",
+        ]
+
+    def test_iter_objects_isolates_context(self) -> None:
+        foo, bar = make_module("foo"), make_module("bar")
+        interleaved = [
+            o["metadata"]["name"]
+            for pair in zip(foo.iter_objects(), bar.iter_objects())
+            for o in pair
+        ]
+        assert interleaved == ["foo-0", "bar-0", "foo-1", "bar-1", "foo-2", "bar-2"]
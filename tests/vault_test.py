@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+from transpire.internal.secrets.vault import (
+    HASH_KEY_PATH,
+    HASH_METADATA_KEY,
+    HashicorpVaultConfig,
+    VaultSecret,
+    hash_secret,
+)
+
+
+class FakeVault(BaseHTTPRequestHandler):
+    """Just enough of the Vault KV v2 API to push secrets to."""
+
+    secrets: dict[str, dict] = {}
+    metadata: dict[str, dict] = {}
+    writes: int = 0
+    metadata_fails: bool = False
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def reply(self, status: int, body: dict | None = None) -> None:
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self) -> dict:
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def do_GET(self) -> None:
+        if self.path == "/v1/auth/token/lookup-self":
+            return self.reply(200, {"data": {"id": "root"}})
+        _, _, mount, kind, path = self.path.split("?")[0].split("/", 4)
+        if kind == "metadata" and path in self.secrets:
+            return self.reply(200, {"data": self.metadata.get(path, {})})
+        if kind == "data" and path in self.secrets:
+            return self.reply(
+                200, {"data": {"data": self.secrets[path], "metadata": {"version": 1}}}
+            )
+        self.reply(404, {"errors": []})
+
+    def do_POST(self) -> None:
+        parts = self.path.split("/", 4)
+        if parts[-1] == "config":
+            return self.reply(204)
+        _, _, mount, kind, path = parts
+        body = self.body()
+        if kind == "data":
+            if body["options"]["cas"] == 0 and path in self.secrets:
+                return self.reply(400, {"errors": ["check-and-set mismatch"]})
+            type(self).writes += 1
+            self.secrets[path] = body["data"]
+            return self.reply(200, {"data": {"version": 1}})
+        if kind == "metadata":
+            if self.metadata_fails:
+                return self.reply(403, {"errors": ["permission denied"]})
+            self.metadata[path] = {"custom_metadata": body["custom_metadata"]}
+            return self.reply(204)
+        self.reply(404, {"errors": []})
+
+
+@pytest.fixture
+def vault(monkeypatch: pytest.MonkeyPatch) -> Iterator[type[FakeVault]]:
+    handler = type("Handler", (FakeVault,), {"secrets": {}, "metadata": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("VAULT_TOKEN", "root")
+    handler.address = f"http://127.0.0.1:{server.server_port}"  # type: ignore
+    yield handler
+    server.shutdown()
+
+
+def secret(name: str, value: str) -> dict:
+    return {
+        "apiVersion": "v1",
+        "kind": "Secret",
+        "metadata": {"name": name},
+        "stringData": {"value": value},
+    }
+
+
+class TestPushSecrets:
+    def test_push_then_skip(self, vault) -> None:
+        config = HashicorpVaultConfig(kvstore="kvv2", address=vault.address)
+        provider = VaultSecret(config, "app")
+        secrets = [secret(f"s{i}", str(i)) for i in range(10)]
+
+        summary = provider.push_secrets(secrets, jobs=4)
+        assert (summary.pushed, summary.skipped, summary.failed) == (10, 0, 0)
+        assert vault.secrets["app/s3"] == {"value": "3"}
+
+        summary = VaultSecret(config, "app").push_secrets(secrets, jobs=4)
+        assert (summary.pushed, summary.skipped, summary.failed) == (0, 10, 0)
+        # the secrets, and the key they're HMACed with
+        assert vault.writes == 11
+
+    def test_hashes_are_keyed(self, vault) -> None:
+        config = HashicorpVaultConfig(kvstore="kvv2", address=vault.address)
+        VaultSecret(config, "app").push_secrets([secret("s", "value")])
+        key = bytes.fromhex(vault.secrets[HASH_KEY_PATH]["key"])
+        recorded = vault.metadata["app/s"]["custom_metadata"][HASH_METADATA_KEY]
+        assert recorded == hash_secret({"value": "value"}, key)
+        assert recorded != hash_secret({"value": "value"}, b"")
+
+    def test_existing_secrets_are_not_overwritten(self, vault) -> None:
+        config = HashicorpVaultConfig(kvstore="kvv2", address=vault.address)
+        VaultSecret(config, "app").push_secrets([secret("s", "old")])
+        summary = VaultSecret(config, "app").push_secrets([secret("s", "new")])
+        assert str(summary) == "0 pushed, 0 skipped, 0 failed, 1 drifted"
+        assert vault.secrets["app/s"] == {"value": "old"}
+
+        # secrets transpire didn't push are skipped, without telling
+        vault.secrets["app/t"] = {"value": "manual"}
+        summary = VaultSecret(config, "app").push_secrets([secret("t", "new")])
+        assert (summary.pushed, summary.skipped, summary.drifted) == (0, 1, 0)
+
+    def test_hash_write_failure_still_counts_as_pushed(self, vault) -> None:
+        vault.metadata_fails = True
+        config = HashicorpVaultConfig(kvstore="kvv2", address=vault.address)
+        summary = VaultSecret(config, "app").push_secrets([secret("s", "value")])
+        assert (summary.pushed, summary.failed) == (1, 0)
+        assert vault.secrets["app/s"] == {"value": "value"}
@@ -0,0 +1,116 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from transpire.internal.config import ClusterConfig
+from transpire.internal.watch import Watcher, recording_reads
+
+CLUSTER_TOML = """\
+apiVersion = "v1"
+
+[secrets]
+provider = "vault"
+
+[secrets.vault]
+kvstore = "kvv2"
+
+[defaults]
+ingressClass = "contour"
+certManagerIssuer = "letsencrypt"
+
+[modules.one]
+path = "apps/one/.transpire.py"
+
+[modules.two]
+path = "apps/two/.transpire.py"
+"""
+
+MODULE = """\
+from pathlib import Path
+
+name = {name!r}
+
+
+def objects():
+    yield {{"value": Path("data/{name}.txt").read_text()}}
+"""
+
+
+@pytest.fixture
+def cluster(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    (tmp_path / "cluster.toml").write_text(CLUSTER_TOML)
+    (tmp_path / "data").mkdir()
+    for name in ["one", "two"]:
+        (tmp_path / "apps" / name).mkdir(parents=True)
+        (tmp_path / "apps" / name / ".transpire.py").write_text(
+            MODULE.format(name=name)
+        )
+        (tmp_path / "data" / f"{name}.txt").write_text("1")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def touch(path: Path, content: str) -> None:
+    # make sure the mtime moves, even on filesystems with coarse timestamps
+    mtime = path.stat().st_mtime_ns
+    path.write_text(content)
+    while path.stat().st_mtime_ns == mtime:
+        time.sleep(0.01)
+        path.write_text(content)
+
+
+def test_recording_reads(tmp_path: Path) -> None:
+    (tmp_path / "a").write_text("a")
+    with recording_reads() as reads:
+        (tmp_path / "a").read_text()
+        (tmp_path / "b").write_text("b")
+    (tmp_path / "c").write_text("c")
+    (tmp_path / "c").read_text()
+    assert reads == {str(tmp_path / "a")}
+
+
+def test_watcher(cluster: Path) -> None:
+    rendered: dict[str, list] = {"one": [], "two": []}
+
+    def render(config: ClusterConfig, name: str) -> None:
+        module = config.modules[name].load_module_w_context(name, context=config)
+        rendered[name].append(module.objects[0]["value"])
+
+    watcher = Watcher(cluster, ["one", "two"], render)
+    assert watcher.poll() == ["one", "two"]
+    assert watcher.poll() == []
+
+    # files read while rendering are watched, as is the module itself
+    touch(cluster / "data" / "one.txt", "2")
+    assert watcher.poll() == ["one"]
+    touch(cluster / "apps" / "two" / ".transpire.py", "raise ValueError()\n")
+    assert watcher.poll() == ["two"]
+    touch(cluster / "apps" / "two" / ".transpire.py", MODULE.format(name="two"))
+    assert watcher.poll() == ["two"]
+
+    assert rendered == {"one": ["1", "2"], "two": ["1", "1"]}
+
+
+def test_watcher_reloads_cluster_toml(cluster: Path) -> None:
+    watcher = Watcher(cluster, ["one", "two"], lambda config, name: None)
+    assert watcher.poll() == ["one", "two"]
+    assert ClusterConfig.from_cwd(cluster).defaults.ingressClass == "contour"
+
+    cluster_toml = cluster / "cluster.toml"
+    touch(cluster_toml, cluster_toml.read_text().replace("contour", "nginx"))
+    assert watcher.poll() == ["one", "two"]
+    assert watcher.config.defaults.ingressClass == "nginx"
+    # code that looks the config up itself sees the change too
+    assert ClusterConfig.from_cwd(cluster).defaults.ingressClass == "nginx"
+
+
+def test_watcher_from_a_subdirectory(cluster: Path) -> None:
+    watcher = Watcher(cluster / "apps" / "one", ["one"], lambda config, name: None)
+    assert watcher.cluster_toml == (cluster / "cluster.toml").resolve()
+    assert watcher.poll() == ["one"]
+
+    cluster_toml = cluster / "cluster.toml"
+    touch(cluster_toml, cluster_toml.read_text().replace("contour", "nginx"))
+    assert watcher.poll() == ["one"]
+    assert watcher.config.defaults.ingressClass == "nginx"
@@ -0,0 +1,15 @@
+import yaml
+
+from transpire.internal import yamlio
+
+
+class TestYamlIO:
+    def test_value_tag(self) -> None:
+        assert yamlio.load("a: =\n") == {"a": "="}
+        assert "tag:yaml.org,2002:value" not in yaml.SafeLoader.yaml_constructors
+
+    def test_roundtrip(self) -> None:
+        docs = [{"b": [1, "two", None], "a": {"c": True}}, {"x": "multi\nline\n"}]
+        out = yamlio.dump_all(docs)
+        assert out == yaml.safe_dump_all(docs)
+        assert list(yamlio.load_all(out)) == docs
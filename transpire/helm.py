@@ -1,3 +1,3 @@
-from transpire.internal.helm import build_chart, build_chart_from_versions
+from transpire.internal.helm import build_chart, build_chart_from_versions, iter_chart
 
-__all__ = ["build_chart", "build_chart_from_versions"]
+__all__ = ["build_chart", "build_chart_from_versions", "iter_chart"]
@@ -0,0 +1,457 @@
+"""
+Server-side apply through the Kubernetes API.
+
+Objects are applied in tiers, CRDs and Namespaces first and admission webhooks
+last, with the objects of each tier applied concurrently. Every applied object
+is annotated with a hash of what was applied; before each tier, the annotations
+of the live objects are listed (one metadata-only request per resource and
+namespace) and objects whose hash matches are skipped.
+
+API discovery is done per group version, only for the group versions actually
+applied, and cached on disk per API server like kubectl's discovery cache.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from transpire.internal import render
+from transpire.internal.config import CLIConfig
+
+if TYPE_CHECKING:
+    from kubernetes.client import ApiClient
+
+__all__ = [
+    "FIELD_MANAGER",
+    "HASH_ANNOTATION",
+    "ApplyError",
+    "Resource",
+    "Client",
+    "Discovery",
+    "ApplyResult",
+    "object_hash",
+    "apply_objects",
+]
+
+FIELD_MANAGER = "transpire"
+HASH_ANNOTATION = "transpire.ocf.io/applied-hash"
+
+# Seconds a cached discovery document is used for before being fetched again.
+DISCOVERY_TTL = 600
+
+# Seconds to wait for applied CRDs to be served, before applying their objects.
+ESTABLISH_TIMEOUT = 30
+
+# (group, kind) of objects applied before everything else, and after it
+FIRST = {("apiextensions.k8s.io", "CustomResourceDefinition"), ("", "Namespace")}
+LAST = {
+    ("admissionregistration.k8s.io", "MutatingWebhookConfiguration"),
+    ("admissionregistration.k8s.io", "ValidatingWebhookConfiguration"),
+}
+
+PARTIAL_METADATA_LIST = (
+    "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,"
+    "application/json"
+)
+
+
+class ApplyError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Resource:
+    """An API resource, as listed by discovery."""
+
+    group_version: str
+    # plural name, as used in URLs
+    name: str
+    kind: str
+    namespaced: bool
+
+    def path(self, namespace: str | None, name: str | None = None) -> str:
+        """the URL path of the resource's collection, or of an object in it"""
+        if "/" in self.group_version:
+            path = f"/apis/{self.group_version}"
+        else:
+            path = f"/api/{self.group_version}"
+        if self.namespaced:
+            path += f"/namespaces/{namespace}"
+        path += f"/{self.name}"
+        return path if name is None else f"{path}/{name}"
+
+
+class Client:
+    """A thin JSON client over the kubernetes package's ApiClient."""
+
+    def __init__(self, api: "ApiClient") -> None:
+        self.api = api
+
+    @classmethod
+    def from_kubeconfig(cls, context: str | None = None) -> "Client":
+        """connect to the kubeconfig's (current) context, or the in-cluster API"""
+        from kubernetes import client, config
+
+        try:
+            return cls(config.new_client_from_config(context=context))
+        except config.ConfigException:
+            if context is not None:
+                raise
+            config.load_incluster_config()
+            return cls(client.ApiClient())
+
+    @property
+    def host(self) -> str:
+        return self.api.configuration.host
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        query: dict[str, str] | None = None,
+        body: Any = None,
+        content_type: str | None = None,
+        accept: str = "application/json",
+    ) -> Any:
+        """make a request, returning the decoded response (ApiException on errors)"""
+        headers = {"Accept": accept}
+        if content_type is not None:
+            headers["Content-Type"] = content_type
+        response = self.api.call_api(
+            path,
+            method,
+            query_params=list((query or {}).items()),
+            header_params=headers,
+            body=body,
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+            _preload_content=False,
+        )
+        return json.loads(response.data)
+
+
+class Discovery:
+    """API resources by apiVersion and kind, discovered as they're needed."""
+
+    def __init__(self, client: Client, *, ttl: float = DISCOVERY_TTL) -> None:
+        self.client = client
+        self.ttl = ttl
+        self._resources: dict[str, dict[str, Resource]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> Path:
+        server = hashlib.sha256(self.client.host.encode()).hexdigest()[:16]
+        return CLIConfig.from_env().cache_dir / "discovery" / server
+
+    def _fetch(self, group_version: str) -> dict[str, Resource]:
+        from kubernetes.client.exceptions import ApiException
+
+        prefix = "/apis" if "/" in group_version else "/api"
+        try:
+            resources = self.client.request("GET", f"{prefix}/{group_version}")[
+                "resources"
+            ]
+        except ApiException as e:
+            if e.status == 404:
+                # e.g. a CRD that hasn't been applied yet
+                return {}
+            raise
+        return {
+            r["kind"]: Resource(group_version, r["name"], r["kind"], r["namespaced"])
+            for r in resources
+            # skip subresources, like pods/status
+            if "/" not in r["name"]
+        }
+
+    def _load(self, group_version: str, refresh: bool) -> dict[str, Resource]:
+        path = self.cache_dir / f"{group_version.replace('/', '_')}.json"
+        if not refresh:
+            try:
+                if time.time() - path.stat().st_mtime < self.ttl:
+                    return {
+                        kind: Resource(**r)
+                        for kind, r in json.loads(path.read_text()).items()
+                    }
+            except (OSError, ValueError, TypeError):
+                pass
+
+        resources = self._fetch(group_version)
+        if resources:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            render.write_atomic(
+                path,
+                json.dumps({k: asdict(r) for k, r in resources.items()}).encode(),
+            )
+        return resources
+
+    def resource(self, api_version: str, kind: str) -> Resource:
+        """the resource objects of this apiVersion and kind are served as"""
+        with self._lock:
+            if api_version not in self._resources:
+                self._resources[api_version] = self._load(api_version, refresh=False)
+            if kind not in self._resources[api_version]:
+                # the cache may predate the resource (e.g. a CRD applied since)
+                self._resources[api_version] = self._load(api_version, refresh=True)
+            try:
+                return self._resources[api_version][kind]
+            except KeyError:
+                raise ApplyError(f"the server doesn't serve {kind} in {api_version}")
+
+
+@dataclass
+class ApplyResult:
+    """What apply_objects did, by object ("Kind namespace/name")."""
+
+    applied: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    # objects with fields owned by another field manager, which weren't applied
+    conflicts: dict[str, str] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        summary = (
+            f"{len(self.applied)} applied, {len(self.unchanged)} unchanged, "
+            f"{len(self.failed)} failed"
+        )
+        if self.conflicts:
+            summary += f", {len(self.conflicts)} conflicting"
+        return summary
+
+
+def object_hash(obj: dict) -> str:
+    """a digest of an object, independent of key order"""
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _tier(obj: dict) -> int:
+    group = obj["apiVersion"].rpartition("/")[0]
+    if (group, obj["kind"]) in FIRST:
+        return 0
+    if (group, obj["kind"]) in LAST:
+        return 2
+    return 1
+
+
+def _describe(obj: dict) -> str:
+    metadata = obj["metadata"]
+    name = metadata.get("name", metadata.get("generateName"))
+    if "namespace" in metadata:
+        return f"{obj['kind']} {metadata['namespace']}/{name}"
+    return f"{obj['kind']} {name}"
+
+
+def _error_message(e: Exception) -> str:
+    body = getattr(e, "body", None)
+    if body:
+        try:
+            return json.loads(body)["message"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    return str(e)
+
+
+class _Applier:
+    def __init__(
+        self,
+        client: Client,
+        discovery: Discovery,
+        *,
+        jobs: int,
+        force: bool,
+        force_conflicts: bool,
+    ) -> None:
+        self.client = client
+        self.discovery = discovery
+        self.jobs = jobs
+        self.force = force
+        self.force_conflicts = force_conflicts
+        self.result = ApplyResult()
+        self._lock = threading.Lock()
+
+    def _prepare(self, obj: dict, namespace: str) -> tuple[Resource, dict]:
+        resource = self.discovery.resource(obj["apiVersion"], obj["kind"])
+        if "name" not in obj["metadata"]:
+            raise ApplyError("objects with only a generateName can't be applied")
+
+        metadata = dict(obj["metadata"])
+        if resource.namespaced:
+            metadata.setdefault("namespace", namespace)
+        else:
+            metadata.pop("namespace", None)
+        annotations = dict(metadata.get("annotations") or {})
+        annotations.pop(HASH_ANNOTATION, None)
+        metadata["annotations"] = annotations
+        obj = {**obj, "metadata": metadata}
+        annotations[HASH_ANNOTATION] = object_hash(obj)
+        return resource, obj
+
+    def _live_hashes(
+        self, objs: list[tuple[Resource, dict]]
+    ) -> dict[tuple[Resource, str | None, str], str]:
+        """the hash annotations of the live objects, listed by resource and namespace"""
+        from kubernetes.client.exceptions import ApiException
+
+        collections = {(r, o["metadata"].get("namespace")) for r, o in objs}
+
+        def list_hashes(collection) -> dict[tuple[Resource, str | None, str], str]:
+            resource, namespace = collection
+            try:
+                items = self.client.request(
+                    "GET", resource.path(namespace), accept=PARTIAL_METADATA_LIST
+                )["items"]
+            except ApiException as e:
+                # e.g. not allowed to list; everything will just be applied
+                logger.debug(f"can't list {resource.name} in {namespace}: {e.status}")
+                return {}
+            except Exception as e:
+                logger.debug(f"can't list {resource.name} in {namespace}: {e}")
+                return {}
+            return {
+                (resource, namespace, item["metadata"]["name"]): annotation
+                for item in items
+                if (
+                    annotation := (item["metadata"].get("annotations") or {}).get(
+                        HASH_ANNOTATION
+                    )
+                )
+            }
+
+        hashes = {}
+        with ThreadPoolExecutor(self.jobs) as pool:
+            for listed in pool.map(list_hashes, collections):
+                hashes.update(listed)
+        return hashes
+
+    def _apply_one(self, resource: Resource, obj: dict) -> None:
+        from kubernetes.client.exceptions import ApiException
+
+        metadata = obj["metadata"]
+        query = {"fieldManager": FIELD_MANAGER}
+        if self.force_conflicts:
+            query["force"] = "true"
+        try:
+            self.client.request(
+                "PATCH",
+                resource.path(metadata.get("namespace"), metadata["name"]),
+                query=query,
+                body=obj,
+                content_type="application/apply-patch+yaml",
+            )
+        except ApiException as e:
+            with self._lock:
+                if e.status == 409:
+                    self.result.conflicts[_describe(obj)] = _error_message(e)
+                else:
+                    self.result.failed[_describe(obj)] = _error_message(e)
+            return
+        except Exception as e:
+            # e.g. a dropped connection, which shouldn't stop the other objects
+            with self._lock:
+                self.result.failed[_describe(obj)] = f"{type(e).__name__}: {e}"
+            return
+        with self._lock:
+            self.result.applied.append(_describe(obj))
+
+    def apply_tier(self, objs: list[dict], namespace: str) -> None:
+        prepared = []
+        for obj in objs:
+            try:
+                prepared.append(self._prepare(obj, namespace))
+            except ApplyError as e:
+                self.result.failed[_describe(obj)] = str(e)
+            except Exception as e:
+                self.result.failed[_describe(obj)] = f"{type(e).__name__}: {e}"
+
+        live = {} if self.force else self._live_hashes(prepared)
+        to_apply = []
+        for resource, obj in prepared:
+            metadata = obj["metadata"]
+            key = (resource, metadata.get("namespace"), metadata["name"])
+            if live.get(key) == metadata["annotations"][HASH_ANNOTATION]:
+                self.result.unchanged.append(_describe(obj))
+            else:
+                to_apply.append((resource, obj))
+
+        with ThreadPoolExecutor(self.jobs) as pool:
+            for _ in pool.map(lambda args: self._apply_one(*args), to_apply):
+                pass
+
+    def wait_established(self, crds: list[dict], timeout: float) -> None:
+        """wait for CRDs to be served, so that their objects can be applied"""
+        from kubernetes.client.exceptions import ApiException
+
+        deadline = time.monotonic() + timeout
+        for crd in crds:
+            path = (
+                "/apis/apiextensions.k8s.io/v1/customresourcedefinitions/"
+                + crd["metadata"]["name"]
+            )
+            while True:
+                try:
+                    conditions = (
+                        self.client.request("GET", path).get("status") or {}
+                    ).get("conditions") or []
+                except ApiException:
+                    conditions = []
+                if any(
+                    c["type"] == "Established" and c["status"] == "True"
+                    for c in conditions
+                ):
+                    break
+                if time.monotonic() > deadline:
+                    logger.warning(f"CRD {crd['metadata']['name']} isn't established")
+                    break
+                time.sleep(0.5)
+
+
+def apply_objects(
+    client: Client,
+    objects: Iterable[dict],
+    namespace: str,
+    *,
+    jobs: int = 8,
+    force: bool = False,
+    force_conflicts: bool = False,
+    discovery: Discovery | None = None,
+) -> ApplyResult:
+    """
+    server-side apply objects, as the "transpire" field manager
+
+    Namespaced objects without a namespace are applied to namespace. Objects
+    whose live copy was last applied from identical input are skipped, unless
+    force is set. Objects that set fields owned by another field manager (say,
+    replicas managed by an autoscaler) are reported as conflicts and left
+    alone, unless force_conflicts is set, which takes those fields over.
+    """
+
+    tiers: dict[int, list[dict]] = defaultdict(list)
+    for obj in objects:
+        tiers[_tier(obj)].append(obj)
+
+    applier = _Applier(
+        client,
+        discovery or Discovery(client),
+        jobs=jobs,
+        force=force,
+        force_conflicts=force_conflicts,
+    )
+    for tier in sorted(tiers):
+        applier.apply_tier(tiers[tier], namespace)
+        if tier == 0:
+            applier.wait_established(
+                [o for o in tiers[0] if o["kind"] == "CustomResourceDefinition"],
+                ESTABLISH_TIMEOUT,
+            )
+    return applier.result
@@ -0,0 +1,238 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+import zlib
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from loguru import logger
+
+from transpire.internal.config import CLIConfig
+
+__all__ = [
+    "RenderCache",
+    "set_bypass",
+    "is_bypassed",
+    "keep_in_memory",
+    "snapshot_stats",
+    "add_stats",
+    "log_stats",
+]
+
+# Bump whenever the on-disk format or the meaning of a key changes, so stale
+# entries written by older versions of transpire are never read back.
+CACHE_VERSION = 2
+
+_bypass = False
+_in_memory = False
+_caches: list["RenderCache"] = []
+
+
+def set_bypass(bypass: bool) -> None:
+    """skip cache lookups (entries are still refreshed) for the rest of this process"""
+
+    global _bypass
+    _bypass = bypass
+
+
+def is_bypassed() -> bool:
+    return _bypass
+
+
+def keep_in_memory(enabled: bool = True) -> None:
+    """
+    also keep entries in memory for the rest of this process
+
+    For long-running processes that render the same charts over and over, this
+    saves reading and decompressing entries from disk on every hit.
+    """
+
+    global _in_memory
+    _in_memory = enabled
+    if not enabled:
+        for c in _caches:
+            c._memory.clear()
+
+
+def snapshot_stats() -> dict[str, "CacheStats"]:
+    """copy the current hit/miss counts of every render cache, by kind"""
+
+    return {c.kind: replace(c.stats) for c in _caches}
+
+
+def add_stats(stats: dict[str, "CacheStats"]) -> None:
+    """fold hit/miss counts recorded by another process into this one's"""
+
+    for c in _caches:
+        if c.kind in stats:
+            c.stats.hits += stats[c.kind].hits
+            c.stats.misses += stats[c.kind].misses
+
+
+def log_stats() -> None:
+    """log hit/miss counts for every render cache that was used"""
+
+    for cache in _caches:
+        stats = cache.stats
+        if stats.hits or stats.misses:
+            logger.info(
+                f"{cache.kind} render cache: {stats.hits} hits, {stats.misses} misses"
+            )
+
+
+class CorruptCacheEntry(Exception):
+    pass
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class RenderCache:
+    """
+    A content-addressed, on-disk cache of rendered manifests.
+
+    Entries are keyed by a hash of every input to a render, and stored under
+    `cache_dir/render/<kind>` as a gzip stream of pickled manifests, one pickle per
+    manifest, so that entries can be written and read back one object at a time.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self.stats = CacheStats()
+        # key -> pickled manifests, while keep_in_memory is enabled; manifests
+        # are kept pickled so that every hit gets its own copies to edit
+        self._memory: dict[str, list[bytes]] = {}
+        _caches.append(self)
+
+    @property
+    def root(self) -> Path:
+        return CLIConfig.from_env().cache_dir / "render" / self.kind
+
+    @staticmethod
+    def key(*inputs: Any) -> str:
+        """hash the inputs of a render into a cache key"""
+
+        blob = json.dumps(
+            [CACHE_VERSION, *inputs],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.pickle.gz"
+
+    def _open(self, path: Path) -> io.BytesIO | None:
+        """
+        the decompressed entry at path, or None (removing it) if it's corrupt
+
+        Entries are decompressed in full, which checks them against their gzip
+        checksum before anything is read from them, so a truncated entry is a
+        miss rather than a render that fails halfway through.
+        """
+        try:
+            return io.BytesIO(gzip.decompress(path.read_bytes()))
+        except (OSError, EOFError, zlib.error) as e:
+            path.unlink(missing_ok=True)
+            logger.warning(
+                f"ignoring corrupt {self.kind} render cache entry {path.name}: {e}"
+            )
+            return None
+
+    def _read(self, path: Path, f: io.BytesIO) -> Iterator[dict]:
+        try:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+        except (pickle.UnpicklingError, ValueError) as e:
+            path.unlink(missing_ok=True)
+            raise CorruptCacheEntry(
+                f"corrupt {self.kind} render cache entry {path.name}: {e}"
+            ) from e
+
+    def iter(self, key: str) -> Iterator[dict] | None:
+        """return an iterator over the cached manifests for key, or None on a miss"""
+
+        if not _bypass and key in self._memory:
+            self.stats.hits += 1
+            return (pickle.loads(blob) for blob in self._memory[key])
+
+        path = self._path(key)
+        f = None if _bypass or not path.exists() else self._open(path)
+        if f is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        if _in_memory:
+            return self._remember(key, self._read(path, f))
+        return self._read(path, f)
+
+    def _remember(self, key: str, objs: Iterable[dict]) -> Iterator[dict]:
+        blobs = []
+        for obj in objs:
+            blobs.append(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+            yield obj
+        self._memory[key] = blobs
+
+    def get(self, key: str) -> list[dict] | None:
+        """return the cached manifests for key, or None on a miss"""
+
+        objs = self.iter(key)
+        if objs is None:
+            return None
+
+        try:
+            return list(objs)
+        except CorruptCacheEntry as e:
+            logger.warning(f"ignoring {e}")
+            self.stats.hits -= 1
+            self.stats.misses += 1
+            return None
+
+    def tee(self, key: str, objs: Iterable[dict]) -> Iterator[dict]:
+        """
+        yield objs unchanged, storing them under key once all have been yielded
+
+        Each manifest is written to the entry before it is yielded, so later
+        in-place edits of the manifest do not leak into the cache. The entry is
+        only stored if objs is exhausted without error.
+        """
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = tempfile.NamedTemporaryFile(dir=path.parent, delete=False)
+        blobs = []
+        try:
+            with gzip.GzipFile(fileobj=tmp, mode="wb", compresslevel=1) as f:
+                for obj in objs:
+                    blob = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+                    f.write(blob)
+                    if _in_memory:
+                        blobs.append(blob)
+                    yield obj
+            tmp.close()
+            os.replace(tmp.name, path)
+            if _in_memory:
+                self._memory[key] = blobs
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+
+    def put(self, key: str, objs: Iterable[dict]) -> None:
+        """store manifests under key, atomically replacing any existing entry"""
+
+        for _ in self.tee(key, objs):
+            pass
@@ -1,6 +1,6 @@
 import click
 
-from . import bootstrap, dev, image, obj, secrets, utils, versions
+from . import utils
 
 
 @click.command(cls=utils.AliasedGroup)
@@ -8,9 +8,38 @@ def cli() -> None:
     pass
 
 
-cli.add_command(bootstrap.commands, "bootstrap")
-cli.add_command(dev.commands, "dev")
-cli.add_command(obj.commands, "object")
-cli.add_command(image.commands, "image")
-cli.add_command(secrets.commands, "secret")
-cli.add_command(versions.commands, "versions")
+# Subcommands are imported on first use, so `transpire --help` and shell
+# completion don't pay for kubernetes, hvac and friends.
+cli.add_lazy_command(
+    "transpire.internal.cli.bootstrap:commands",
+    "bootstrap",
+    help="tools related to bootstrapping (new cluster, new repository, etc)",
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.dev:commands",
+    "dev",
+    help="tools to aid development with transpire",
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.obj:commands",
+    "object",
+    help="tools related to Kubernetes objects",
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.helm:commands",
+    "helm",
+    help="tools related to helm charts",
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.image:commands", "image", help="tools related to images"
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.secrets:commands",
+    "secret",
+    help="secret management commands",
+)
+cli.add_lazy_command(
+    "transpire.internal.cli.versions:commands",
+    "versions",
+    help="version management commands",
+)
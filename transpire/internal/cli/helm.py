@@ -0,0 +1,102 @@
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from transpire.internal import helm
+from transpire.internal.cli.utils import AliasedGroup
+from transpire.internal.config import (
+    ClusterConfig,
+    GitModuleConfig,
+    LocalModuleConfig,
+    prefetch_modules,
+)
+
+
+@click.command(cls=AliasedGroup)
+def commands(**_):
+    """tools related to helm charts"""
+    pass
+
+
+def versions_files(config: ClusterConfig, *, jobs: int) -> list[Path]:
+    """the versions.toml of every module in the cluster that has one"""
+
+    prefetch_modules(config.modules, jobs=jobs)
+    files = []
+    for module in config.modules.values():
+        if isinstance(module, LocalModuleConfig):
+            module_dir = module.path.parent
+        elif isinstance(module, GitModuleConfig):
+            repo, _ = module.get_cached_repo()
+            module_dir = repo / module.resolved_dir
+        else:
+            continue
+        if (module_dir / "versions.toml").exists():
+            files.append(module_dir / "versions.toml")
+    return files
+
+
+def charts_in(path: Path) -> set[tuple[str, str, str]]:
+    """the (repository, chart, version) of every helm chart in a versions.toml"""
+
+    versions = tomllib.loads(path.read_text())
+    return {
+        (v["helm"], v.get("chart", name), v["version"])
+        for name, v in versions.items()
+        if isinstance(v, dict) and "helm" in v
+    }
+
+
+@commands.command()
+@click.argument("files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of charts to pull concurrently",
+)
+def vendor(files, jobs: int, **_) -> None:
+    """
+    pull every chart in versions.toml into the local chart store
+
+    Reads the given versions.toml files, or those of every module in the cluster.
+    Builds then render stored charts without touching the network.
+    """
+    paths = [Path(f) for f in files] or versions_files(
+        ClusterConfig.from_cwd(), jobs=jobs
+    )
+    charts = sorted(set().union(*map(charts_in, paths)))
+    missing = [c for c in charts if helm.chart_store.get(*c) is None]
+
+    def pull(chart: tuple[str, str, str]) -> bool:
+        repo_url, name, version = chart
+        try:
+            helm.chart_store.pull(repo_url, name, version)
+        except ValueError as e:
+            logger.error(f"Failed to pull {name} {version} from {repo_url}: {e}")
+            return False
+        logger.info(f"Pulled {name} {version}")
+        return True
+
+    if missing:
+        helm.assert_helm()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        failed = list(pool.map(pull, missing)).count(False)
+
+    logger.info(
+        f"{len(charts) - len(missing)} charts already stored, "
+        f"{len(missing) - failed} pulled, {failed} failed"
+    )
+    if failed:
+        raise click.ClickException(f"failed to pull {failed} charts")
+
+
+@commands.command("list")
+def list_charts(**_) -> None:
+    """list the charts in the local chart store"""
+    for ref, entry in sorted(helm.chart_store.index().items()):
+        print(f"{ref}\tsha256:{entry['digest']}")
@@ -1,10 +1,15 @@
 import os
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 import click
+import requests
+from loguru import logger
 
 from transpire.internal.cli.utils import AliasedGroup
-from transpire.internal.config import ClusterConfig, GitModuleConfig
+from transpire.internal.config import ClusterConfig, GitModuleConfig, prefetch_modules
+from transpire.internal.images import Registry, context_tree, fingerprint, repository
 from transpire.types import Image, Module
 from transpire.utils import get_image_tag
 
@@ -14,7 +19,7 @@ def image_metadata(config: GitModuleConfig, module: Module, image: Image):
     return {
         "tags": [
             tag,  # default is tagged with module.revision
-            tag.split(":")[0] + ":latest",  # latest tag
+            repository(tag) + ":latest",  # latest tag
         ],
         "labels": {
             "org.opencontainers.image.url": config.clean_git_url,
@@ -25,6 +30,66 @@ def image_metadata(config: GitModuleConfig, module: Module, image: Image):
     }
 
 
+def image_matrix(
+    modules: Iterable[tuple[GitModuleConfig, Module]],
+    registry: Registry | None,
+    *,
+    jobs: int = 8,
+) -> tuple[list[dict], list[dict]]:
+    """
+    the images of modules to build, and those already built (which only need
+    tagging), looked up in their registries unless registry is None
+    """
+
+    def plan(
+        config: GitModuleConfig, module: Module, image: Image
+    ) -> tuple[dict, dict | None]:
+        git_url = f"{config.clean_git_url}#"
+        if config.branch is not None:
+            git_url += config.branch
+
+        assert module.revision is not None
+        tag = fingerprint(context_tree(config, module.revision, image), image.target)
+        metadata = image_metadata(config, module, image)
+        image_repository = repository(metadata["tags"][0])
+        entry = {
+            "module": module.name,
+            "name": image.name,
+            "context": f"{git_url}:{image.resolved_path}",
+            **({"target": image.target} if image.target is not None else {}),
+            **metadata,
+            "tags": [*metadata["tags"], f"{image_repository}:{tag}"],
+        }
+        if registry is None:
+            return entry, None
+        try:
+            if not registry.has_tag(image_repository, tag):
+                return entry, None
+        except requests.RequestException as e:
+            logger.warning(
+                f"Couldn't look up {image_repository}:{tag}, building it: {e}"
+            )
+            return entry, None
+        return entry, {
+            "module": module.name,
+            "name": image.name,
+            "source": f"{image_repository}:{tag}",
+            "tags": metadata["tags"],
+        }
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        planned = list(
+            pool.map(
+                lambda args: plan(*args),
+                [(c, m, image) for c, m in modules for image in m.images],
+            )
+        )
+    return (
+        [entry for entry, existing in planned if existing is None],
+        [existing for _, existing in planned if existing is not None],
+    )
+
+
 @click.command(cls=AliasedGroup)
 def commands(**_) -> None:
     """tools related to images"""
@@ -32,38 +97,71 @@ def commands(**_) -> None:
 
 
 @commands.command()
-@click.argument("module_name", required=True)
+@click.argument("module_names", nargs=-1)
+@click.option("--all", "all_modules", is_flag=True, help="build every git module")
 @click.option("-o", "--output", required=True, type=click.Choice(["gha"]))
-@click.option("--commit")
-def build(module_name: str, output: str, commit: str | None) -> None:
-    """build images"""
+@click.option("--commit", help="the commit to build images from")
+@click.option(
+    "--force",
+    is_flag=True,
+    help="build every image, even those whose build context is unchanged",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of images to look up in their registries concurrently",
+)
+def build(
+    module_names: tuple[str, ...],
+    all_modules: bool,
+    output: str,
+    commit: str | None,
+    force: bool,
+    jobs: int,
+) -> None:
+    """
+    build images
 
+    Images are tagged with a fingerprint of their build context, and those whose
+    fingerprint is already in their registry are left out of the build matrix.
+    They're listed in image_retag instead, to be tagged with the new revision.
+    """
     if output == "gha":
         config = ClusterConfig.from_cwd()
-        module_config = config.modules[module_name]
-
-        if not isinstance(module_config, GitModuleConfig):
-            click.echo("Building images is only supported for git modules", err=True)
-            return
-
-        module = module_config.load_module(module_name, commit=commit)
+        if all_modules:
+            if module_names:
+                raise click.UsageError("--all can't be combined with module names")
+            module_names = tuple(
+                name
+                for name, module_config in config.modules.items()
+                if isinstance(module_config, GitModuleConfig)
+            )
+            prefetch_modules(config.modules)
+        elif not module_names:
+            raise click.UsageError("give the modules to build, or --all")
+        if commit is not None and len(module_names) > 1:
+            raise click.UsageError("--commit can only be given for one module")
 
-        git_url = f"{module_config.clean_git_url}#"
-        if module_config.branch is not None:
-            git_url += module_config.branch
+        modules = []
+        for module_name in module_names:
+            module_config = config.modules[module_name]
+            if not isinstance(module_config, GitModuleConfig):
+                click.echo(
+                    "Building images is only supported for git modules", err=True
+                )
+                return
+            module = module_config.load_module(module_name, commit=commit)
+            modules.append((module_config, module))
 
-        images = [
-            {
-                "name": x.name,
-                "context": f"{git_url}:{x.resolved_path}",
-                **({"target": x.target} if x.target is not None else {}),
-                **image_metadata(module_config, module, x),
-            }
-            for x in module.images
-        ]
+        images, retag = image_matrix(modules, None if force else Registry(), jobs=jobs)
+        logger.info(f"{len(images)} images to build, {len(retag)} unchanged")
 
         print(os.environ["GITHUB_OUTPUT"])
         print(f"image_matrix={images}")
+        print(f"image_retag={retag}")
 
         with open(os.environ["GITHUB_OUTPUT"], "a") as f:
             print(f"image_matrix={images}", file=f)
+            print(f"image_retag={retag}", file=f)
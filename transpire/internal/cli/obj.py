@@ -1,16 +1,33 @@
-import subprocess
+import fnmatch
+import json
+import os
 import sys
+from dataclasses import replace
 from pathlib import Path
-from shutil import rmtree
-from typing import Optional
+from typing import Any, Iterable, Optional, TextIO
 
 import click
-import yaml
 from loguru import logger
 
-from transpire.internal import render
+from transpire.internal import (
+    cache,
+    diff,
+    parallel,
+    render,
+    state,
+    trace,
+    watch,
+    yamlio,
+)
 from transpire.internal.cli.utils import AliasedGroup
-from transpire.internal.config import ClusterConfig, get_config
+from transpire.internal.config import (
+    ClusterConfig,
+    LocalModuleConfig,
+    get_config,
+    prefetch_modules,
+)
+from transpire.internal.postprocessor import Pipeline
+from transpire.types import Module
 
 
 @click.command(cls=AliasedGroup)
@@ -22,54 +39,472 @@ def commands(**_) -> None:
 @commands.command()
 @click.argument("out_path", envvar="TRANSPIRE_OBJECT_OUTPUT", type=click.Path())
 @click.option("--module")
-def build(out_path, module, **_) -> None:
-    """build objects, write them to a folder"""
+@click.option("--no-cache", is_flag=True, help="re-render charts, ignoring the cache")
+@click.option(
+    "--force",
+    is_flag=True,
+    help="rebuild every module, even those whose inputs haven't changed",
+)
+@click.option(
+    "--compact",
+    "compact_objects",
+    is_flag=True,
+    help=(
+        "share repeated strings and subtrees between objects held in memory by "
+        "parallel builds (no effect on sequential ones, which stream objects)"
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="number of modules to render concurrently",
+)
+@click.option(
+    "--fetch-jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of git modules to fetch concurrently",
+)
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="write a Chrome trace of the build to this file (open it in Perfetto)",
+)
+@click.option(
+    "--profile-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="write a cProfile dump for each module to this directory",
+)
+def build(
+    out_path,
+    module,
+    no_cache,
+    force,
+    compact_objects,
+    jobs,
+    fetch_jobs,
+    trace_path,
+    profile_dir,
+    **_,
+) -> None:
+    """
+    build objects, write them to a folder
+
+    Modules whose inputs haven't changed since they were last built into the
+    folder are skipped, unless --force is given.
+    """
+    cache.set_bypass(no_cache)
+    trace.configure(
+        enabled=trace_path is not None,
+        profile_dir=None if profile_dir is None else Path(profile_dir),
+    )
+    try:
+        with trace.span("build", "build", module=module, jobs=jobs):
+            _build(out_path, module, force, compact_objects, jobs, fetch_jobs)
+    finally:
+        if trace_path is not None:
+            trace.write(Path(trace_path))
+            logger.info(f"Wrote trace to {trace_path}")
+
+
+def _build(out_path, module, force, compact_objects, jobs, fetch_jobs) -> None:
     config = ClusterConfig.from_cwd()
 
-    if module is None:
-        modules = [
-            c.load_module_w_context(n, context=config)
-            for n, c in config.modules.items()
-        ]
-    else:
-        modules = [config.modules[module].load_module_w_context(module, context=config)]
+    selected = config.modules if module is None else {module: config.modules[module]}
+    with trace.span("prefetch", "git"):
+        prefetch_modules(selected, jobs=fetch_jobs)
 
     out_path = Path(out_path)
     out_path.mkdir(exist_ok=True, parents=True)
 
-    for module in modules:
-        logger.info(f"Building {module.name}")
-        render.write_manifests(config, module.objects, module.name, out_path)
+    build_state = state.BuildState.load(out_path)
+    with trace.span("fingerprint", "build"):
+        fingerprints = {
+            name: state.fingerprint(config, name, module_config)
+            for name, module_config in selected.items()
+        }
+
+    # modules that are already up to date keep what's needed to write their base
+    modules: list[Module | parallel.RenderedModule] = []
+    to_build = []
+    for name, fingerprint in fingerprints.items():
+        if not force and build_state.is_current(name, fingerprint):
+            previous = build_state.modules[name]
+            modules.append(
+                parallel.RenderedModule(
+                    name, previous.namespace, previous.auto_sync, objects=[]
+                )
+            )
+        else:
+            to_build.append(name)
+    if modules:
+        logger.info(f"Skipped {len(modules)} unchanged modules")
+
+    def record(m: Module | parallel.RenderedModule, stats) -> None:
+        if stats is None:
+            build_state.forget(m.name)
+        else:
+            build_state.record(
+                m.name,
+                state.ModuleState(fingerprints[m.name], m.namespace, m.auto_sync),
+            )
+
+    pipeline = Pipeline(config)
+    try:
+        if len(to_build) > 1 and jobs > 1:
+            for rendered in parallel.render_modules(
+                to_build, jobs=jobs, compact_objects=compact_objects
+            ):
+                logger.info(f"Built {rendered.name}")
+                trace.extend(rendered.trace_events)
+                stats = render.write_manifests(
+                    config, rendered.objects, rendered.name, out_path, pipeline=pipeline
+                )
+                record(rendered, stats)
+                modules.append(replace(rendered, objects=[], trace_events=[]))
+        else:
+            for name in to_build:
+                m = config.modules[name].load_module_w_context(name, context=config)
+                logger.info(f"Building {m.name}")
+                # objects are rendered as they are written, so the module's span
+                # (and profile) covers both
+                with trace.span(f"module {m.name}", "module"), trace.profiled(m.name):
+                    stats = render.write_manifests(
+                        config, m.iter_objects(), m.name, out_path, pipeline=pipeline
+                    )
+                record(m, stats)
+                modules.append(m)
+    finally:
+        build_state.save()
 
     logger.info("Writing bases")
     basedir = Path(out_path) / "base"
-    if basedir.exists() and module is not None:
-        rmtree(basedir)
-    for module in modules:
-        render.write_base(basedir, module)
+    written = {render.write_base(basedir, m) for m in modules}
+    if module is None:
+        # the Applications of modules no longer in cluster.toml
+        render.remove_stale_files(basedir, written)
+
+    cache.log_stats()
+
+
+@commands.command("diff")
+@click.argument("out_path", envvar="TRANSPIRE_OBJECT_OUTPUT", type=click.Path())
+@click.option("--module")
+@click.option("--no-cache", is_flag=True, help="re-render charts, ignoring the cache")
+@click.option("--summary", is_flag=True, help="only print the summary of each module")
+@click.option(
+    "--exit-code",
+    is_flag=True,
+    help="exit with status 1 if anything would change, like `git diff --exit-code`",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="number of modules to render concurrently",
+)
+@click.option(
+    "--fetch-jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of git modules to fetch concurrently",
+)
+def diff_objects(
+    out_path, module, no_cache, summary, exit_code, jobs, fetch_jobs, **_
+) -> None:
+    """build objects, show how they differ from those in a folder"""
+    cache.set_bypass(no_cache)
+    config = ClusterConfig.from_cwd()
+
+    selected = config.modules if module is None else {module: config.modules[module]}
+    prefetch_modules(selected, jobs=fetch_jobs)
+
+    out_path = Path(out_path)
+    pipeline = Pipeline(config)
+    changed = False
+
+    def show(result: diff.ModuleDiff) -> None:
+        nonlocal changed
+        changed = changed or bool(result)
+        _print_diff(result, summary=summary)
+
+    if len(selected) > 1 and jobs > 1:
+        results = []
+        for rendered in parallel.render_modules(selected, jobs=jobs):
+            results.append(
+                diff.diff_module(
+                    rendered.objects, rendered.name, out_path, pipeline=pipeline
+                )
+            )
+        # print in a stable order, whatever order the modules finished in
+        for result in sorted(results, key=lambda r: r.name):
+            show(result)
+    else:
+        for name in sorted(selected):
+            m = config.modules[name].load_module_w_context(name, context=config)
+            show(
+                diff.diff_module(m.iter_objects(), m.name, out_path, pipeline=pipeline)
+            )
+
+    if exit_code and changed:
+        sys.exit(1)
+
+
+def _format_value(value: Any, limit: int = 80) -> str:
+    if value is diff.MISSING:
+        return "(none)"
+    text = json.dumps(value, default=str)
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def _print_diff(result: diff.ModuleDiff, *, summary: bool) -> None:
+    header = f"{result.name}: {result}"
+    if result.errors:
+        header += f", {len(result.errors)} failed postprocessing"
+    click.echo(click.style(header, bold=bool(result)))
+    if summary:
+        return
+
+    for obj in result.added:
+        click.secho(f"  + {obj.kind} {obj.name}", fg="green")
+    for obj in result.removed:
+        click.secho(f"  - {obj.kind} {obj.name}", fg="red")
+    for obj in result.changed:
+        click.secho(f"  ~ {obj.kind} {obj.name}", fg="yellow")
+        for change in obj.changes:
+            click.echo(
+                f"      {change.path}: "
+                f"{_format_value(change.old)} -> {_format_value(change.new)}"
+            )
+
+
+@commands.command("watch")
+@click.argument("modules", nargs=-1)
+@click.option(
+    "-o",
+    "--out",
+    "out_path",
+    type=click.Path(file_okay=False),
+    help="write manifests to this folder, rather than printing them",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.01),
+    default=0.2,
+    help="seconds between checks for changes",
+)
+def watch_modules(modules, out_path, interval, **_) -> None:
+    """
+    build objects, and build them again whenever their files change
+
+    Watches the named local modules (or all of them), keeping charts and other
+    renders cached in memory between builds.
+    """
+    cache.keep_in_memory()
+    config = ClusterConfig.from_cwd()
+
+    local = [n for n, c in config.modules.items() if isinstance(c, LocalModuleConfig)]
+    for name in modules:
+        if name not in local:
+            raise click.BadParameter(
+                f"{name} is not a local module", param_hint="MODULES"
+            )
+    out = None if out_path is None else Path(out_path)
+    pipeline = Pipeline(config)
+
+    def render_module(config: ClusterConfig, name: str) -> None:
+        nonlocal pipeline
+        if pipeline.config is not config:
+            pipeline = Pipeline(config)
+
+        m = config.modules[name].load_module_w_context(name, context=config)
+        if out is None:
+            sys.stdout.write("---\n")
+            yamlio.dump_all(m.objects, sys.stdout)
+            sys.stdout.flush()
+        else:
+            render.write_manifests(
+                config, m.iter_objects(), m.name, out, pipeline=pipeline
+            )
+            render.write_base(out / "base", m)
+
+    watcher = watch.Watcher(
+        Path.cwd(),
+        modules or local,
+        render_module,
+        exclude=[] if out is None else [out],
+    )
+    watcher.run(interval)
+
+
+class _ObjectStream:
+    """Writes objects to a stream one at a time, as YAML, JSON or JSON Lines."""
+
+    def __init__(self, stream: TextIO, format: str) -> None:
+        self.stream = stream
+        self.format = format
+        self.count = 0
+
+    def write(self, obj: dict) -> None:
+        if self.format == "yaml":
+            if self.count:
+                self.stream.write("---\n")
+            yamlio.dump(obj, self.stream)
+        elif self.format == "jsonl":
+            self.stream.write(json.dumps(obj, separators=(",", ":"), default=str))
+            self.stream.write("\n")
+        else:
+            self.stream.write(",\n" if self.count else "[\n")
+            json.dump(obj, self.stream, default=str)
+        self.count += 1
+
+    def close(self) -> None:
+        if self.format == "json":
+            self.stream.write("\n]\n" if self.count else "[]\n")
+        self.stream.flush()
 
 
 @commands.command("print")
-@click.argument("app_name", required=False)
-def list_manifests(app_name: Optional[str] = None, **_) -> None:
-    """build objects, print them to stdout"""
-    module = get_config(app_name)
-    yaml.safe_dump_all(module.objects, sys.stdout)
+@click.argument("app_names", nargs=-1)
+@click.option("--all", "all_modules", is_flag=True, help="print every module")
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    type=click.Choice(["yaml", "json", "jsonl"]),
+    default="yaml",
+    help="yaml documents, a json array, or one json object per line",
+)
+@click.option("--kind", "kinds", multiple=True, help="only print objects of this kind")
+@click.option(
+    "--name",
+    "names",
+    multiple=True,
+    help="only print objects whose name matches this glob",
+)
+@click.option("--no-cache", is_flag=True, help="re-render charts, ignoring the cache")
+def list_manifests(
+    app_names: tuple[str, ...],
+    all_modules: bool,
+    output_format: str,
+    kinds: tuple[str, ...],
+    names: tuple[str, ...],
+    no_cache: bool = False,
+    **_,
+) -> None:
+    """
+    build objects, print them to stdout
+
+    Prints the named modules, every module with --all, or otherwise the module
+    in the current directory. Objects are printed as they are rendered.
+    """
+    cache.set_bypass(no_cache)
+
+    modules: Iterable[Module]
+    if all_modules:
+        if app_names:
+            raise click.UsageError("--all can't be combined with module names")
+        config = ClusterConfig.from_cwd()
+        prefetch_modules(config.modules)
+        modules = (
+            c.load_module_w_context(n, context=config)
+            for n, c in config.modules.items()
+        )
+    elif app_names:
+        modules = (get_config(name) for name in app_names)
+    else:
+        modules = [get_config()]
+
+    wanted_kinds = {k.lower() for k in kinds}
+
+    def wanted(obj: dict) -> bool:
+        if wanted_kinds and obj.get("kind", "").lower() not in wanted_kinds:
+            return False
+        if names:
+            metadata = obj.get("metadata") or {}
+            name = metadata.get("name", metadata.get("generateName", ""))
+            return any(fnmatch.fnmatchcase(name, pattern) for pattern in names)
+        return True
+
+    out = _ObjectStream(sys.stdout, output_format)
+    try:
+        for module in modules:
+            for obj in module.iter_objects():
+                if wanted(obj):
+                    out.write(obj)
+        out.close()
+    except BrokenPipeError:
+        # the reader (e.g. `head`) went away; don't complain about it at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
 
 
 @commands.command()
 @click.argument("app_name", required=True)
-def apply(app_name: str, **_) -> None:
+@click.option("--context", help="the kubeconfig context to apply to")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of objects to apply concurrently",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="apply every object, even those unchanged since transpire last applied them",
+)
+@click.option(
+    "--force-conflicts",
+    is_flag=True,
+    help="take over fields owned by other field managers, instead of failing",
+)
+def apply(
+    app_name: str,
+    context: Optional[str],
+    jobs: int,
+    force: bool,
+    force_conflicts: bool,
+    **_,
+) -> None:
     """build objects, apply them to current kubernetes context"""
-    # TODO: We should probably use the Kubernetes API here instead of shelling out.
-    # That said, we do want this to behave exactly like kubectl apply, and what better
-    # way to do that than to actually use kubectl apply? So maybe we don't want that.
+    from transpire.internal.apply import Client, apply_objects
+
     module = get_config(app_name)
-    subprocess.run(
-        ["kubectl", "create", "ns", module.namespace],
-        check=False,
-    )
-    subprocess.run(
-        ["kubectl", "apply", "-n", module.namespace, "-f", "-"],
-        input=yaml.safe_dump_all(module.objects).encode("utf_8"),
+    objects = module.objects
+    if not any(
+        o["kind"] == "Namespace" and o["metadata"].get("name") == module.namespace
+        for o in objects
+    ):
+        objects = [
+            {
+                "apiVersion": "v1",
+                "kind": "Namespace",
+                "metadata": {"name": module.namespace},
+            },
+            *objects,
+        ]
+
+    result = apply_objects(
+        Client.from_kubeconfig(context),
+        objects,
+        module.namespace,
+        jobs=jobs,
+        force=force,
+        force_conflicts=force_conflicts,
     )
+    for name in result.applied:
+        logger.info(f"Applied {name}")
+    for name, error in result.failed.items():
+        logger.error(f"Failed to apply {name}: {error}")
+    for name, error in result.conflicts.items():
+        logger.error(f"Conflict applying {name}: {error}")
+    if result.conflicts:
+        logger.error("Rerun with --force-conflicts to take over the conflicting fields")
+    logger.info(f"{module.name}: {result}")
+    if result.failed or result.conflicts:
+        sys.exit(1)
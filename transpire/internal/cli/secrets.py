@@ -1,5 +1,5 @@
 import click
-from kubernetes import client, config
+from loguru import logger
 
 from transpire.internal.cli.utils import AliasedGroup
 from transpire.internal.config import get_config, provider_from_context
@@ -13,14 +13,27 @@ def commands(**_):
 
 @commands.command()
 @click.argument("app_name", required=True)
-def push(app_name: str, **_) -> None:
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=8,
+    help="number of secrets to push concurrently",
+)
+def push(app_name: str, jobs: int, **_) -> None:
     """build secrets from this repository -> push to vault"""
     module = get_config(app_name)
     provider = provider_from_context(module.namespace)
 
-    for o in module.objects:
-        if o["apiVersion"] == "v1" and o["kind"] == "Secret":
-            provider.push_secret(o)
+    summary = provider.push_secrets(
+        (
+            o
+            for o in module.iter_objects()
+            if o["apiVersion"] == "v1" and o["kind"] == "Secret"
+        ),
+        jobs=jobs,
+    )
+    logger.info(f"{app_name}: {summary}")
 
 
 @commands.command()
@@ -28,6 +41,8 @@ def push(app_name: str, **_) -> None:
 @click.argument("name", required=True)
 def pull(namespace: str, name: str, **_) -> None:
     """get secret from kubernetes -> push to vault"""
+    from kubernetes import client, config
+
     config.load_kube_config()
     v1 = client.CoreV1Api()
 
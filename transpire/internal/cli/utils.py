@@ -1,19 +1,82 @@
+import importlib
+
 import click
 
 
 class AliasedGroup(click.Group):
+    """
+    A group that accepts unambiguous prefixes of its subcommands' names.
+
+    Subcommands can also be registered lazily with `add_lazy_command`, by import
+    path, so that their modules (and dependencies) are only imported when the
+    subcommand is actually invoked.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # name -> ("module:attribute", short help)
+        self.lazy_commands: dict[str, tuple[str, str | None]] = {}
+
+    def add_lazy_command(
+        self, import_path: str, name: str, help: str | None = None
+    ) -> None:
+        """
+        register the click command at import_path ("package.module:attribute")
+
+        help is shown in this group's `--help` without importing the command.
+        """
+        self.lazy_commands[name] = (import_path, help)
+
+    def _load_command(self, name: str) -> click.Command:
+        import_path, _ = self.lazy_commands.pop(name)
+        module_name, attr = import_path.split(":")
+        cmd = getattr(importlib.import_module(module_name), attr)
+        if not isinstance(cmd, click.Command):
+            raise TypeError(f"{import_path} is not a click command")
+        self.add_command(cmd, name)
+        return cmd
+
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *self.lazy_commands])
+
+    def _get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands:
+            return self._load_command(cmd_name)
+        return click.Group.get_command(self, ctx, cmd_name)
+
     def get_command(self, ctx, cmd_name):
-        rv = click.Group.get_command(self, ctx, cmd_name)
+        rv = self._get_command(ctx, cmd_name)
         if rv is not None:
             return rv
         matches = [x for x in self.list_commands(ctx) if x.startswith(cmd_name)]
         if not matches:
             return None
         elif len(matches) == 1:
-            return click.Group.get_command(self, ctx, matches[0])
+            return self._get_command(ctx, matches[0])
         ctx.fail(f"Too many matches: {', '.join(sorted(matches))}")
 
     def resolve_command(self, ctx, args):
         # always return the full command name
         _, cmd, args = super().resolve_command(ctx, args)
         return cmd.name, cmd, args
+
+    def format_commands(self, ctx, formatter) -> None:
+        # describe lazy commands from their registered help, rather than
+        # importing every subcommand just to print their docstrings
+        rows = []
+        for name in self.list_commands(ctx):
+            limit = formatter.width - 6 - len(name)
+            _, help = self.lazy_commands.get(name, (None, None))
+            if help is not None:
+                rows.append(
+                    (name, click.Command(name, help=help).get_short_help_str(limit))
+                )
+                continue
+            cmd = self.get_command(ctx, name)
+            if cmd is None or cmd.hidden:
+                continue
+            rows.append((name, cmd.get_short_help_str(limit)))
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -1,5 +1,4 @@
 import click
-import tomlkit
 from loguru import logger
 
 from transpire.internal import helm
@@ -15,8 +14,8 @@ def commands(**_):
 
 def get_latest_version(doc, app_name: str):
     if "helm" in doc[app_name]:
-        helm.add_repo(app_name, doc[app_name]["helm"])
-        helm.update_repo(app_name)
+        # always look for new versions against a freshly downloaded index
+        helm.repo_state.ensure(app_name, doc[app_name]["helm"], max_age=0)
         chart_name = doc[app_name]["chart"] if "chart" in doc[app_name] else app_name
         search_results = helm.search_repo(chart_name)
         latest_version_list = list(
@@ -35,6 +34,8 @@ def get_latest_version(doc, app_name: str):
 @click.argument("app_name", required=True)
 def update(app_name: str, file: str, **_) -> None:
     """update to the newest version of a given app"""
+    import tomlkit
+
     doc = tomlkit.parse(open(file).read())
     latest_version = get_latest_version(doc, app_name)
 
@@ -51,9 +52,19 @@ def update(app_name: str, file: str, **_) -> None:
 @click.argument("file", required=True)
 def all_updates(file: str, **_) -> None:
     """list all available updates"""
+    import tomlkit
+
     doc = tomlkit.parse(open(file).read())
 
     config = ClusterConfig.from_cwd()
+    helm.repo_state.ensure_all(
+        {
+            name: doc[name]["helm"]
+            for name in config.modules
+            if name in doc and "helm" in doc[name]
+        },
+        max_age=0,
+    )
     for name, _ in config.modules.items():
         if name not in doc:
             continue
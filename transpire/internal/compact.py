@@ -0,0 +1,202 @@
+"""
+Compact in-memory manifests.
+
+`Interner.compact` turns a manifest into one that shares as much memory as
+possible with every other manifest compacted through the same `Interner`:
+strings are interned, and identical subtrees (label sets, container specs, the
+schemas of a CRD's versions...) are stored once. Compaction is opt-in, for
+manifests that are held in memory in bulk, e.g. the objects of every module of
+a parallel build.
+
+Shared subtrees are frozen, and copied on write: a compact manifest is a
+`CompactDict`, which replaces a frozen child with a private, shallow copy the
+first time the child is looked up (or iterated over), so code that edits
+manifests in place, like `surgery` and postprocessing, works unchanged. Code
+that reaches a frozen subtree without going through its parent (say, through
+`dict.values`) gets a TypeError if it tries to modify it, rather than silently
+modifying every manifest that shares it.
+"""
+
+from collections.abc import Iterable, Iterator
+from sys import intern
+from typing import Any
+
+__all__ = [
+    "FrozenDict",
+    "FrozenList",
+    "CompactDict",
+    "CompactList",
+    "Interner",
+    "compact_all",
+]
+
+# Strings longer than this are rarely repeated (certificates, scripts...), and
+# aren't worth looking up.
+MAX_INTERNED_LENGTH = 256
+
+
+def _frozen(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is shared, and can't be modified")
+
+
+class FrozenDict(dict):
+    """A dict subtree shared between manifests."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+    __ior__ = _frozen
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """A list subtree shared between manifests."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+    append = clear = extend = insert = pop = remove = reverse = sort = _frozen
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def _thaw(value: Any) -> Any:
+    if type(value) is FrozenDict:
+        return CompactDict(value)
+    if type(value) is FrozenList:
+        return CompactList(value)
+    return value
+
+
+class CompactDict(dict):
+    """A dict whose frozen children are copied into it when looked up."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: Any) -> Any:
+        value = dict.__getitem__(self, key)
+        thawed = _thaw(value)
+        if thawed is not value:
+            dict.__setitem__(self, key, thawed)
+        return thawed
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        return _thaw(dict.pop(self, key, *default))
+
+    def values(self):  # type: ignore[override]
+        return [self[key] for key in self]
+
+    def items(self):  # type: ignore[override]
+        return [(key, self[key]) for key in self]
+
+    def copy(self) -> "CompactDict":
+        return CompactDict(dict.items(self))
+
+    def __reduce__(self):
+        return CompactDict, (list(dict.items(self)),)
+
+
+class CompactList(list):
+    """A list whose frozen items are copied into it when looked up."""
+
+    __slots__ = ()
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = list.__getitem__(self, index)
+        thawed = _thaw(value)
+        if thawed is not value:
+            list.__setitem__(self, index, thawed)
+        return thawed
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def pop(self, index: int = -1) -> Any:
+        return _thaw(list.pop(self, index))
+
+    def copy(self) -> "CompactList":
+        return CompactList(list.__iter__(self))
+
+    def __reduce__(self):
+        return CompactList, (list(list.__iter__(self)),)
+
+
+class Interner:
+    """
+    The table of strings and subtrees that manifests compacted with it share.
+
+    Subtrees are looked up by their contents, with children (already interned)
+    compared by identity, so each lookup only hashes one level of the tree.
+    """
+
+    def __init__(self) -> None:
+        self._nodes: dict[tuple, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _intern(self, value: Any) -> tuple[Any, Any]:
+        """(the interned value, the key it's looked up by as a child)"""
+        cls = type(value)
+        if cls is str:
+            if len(value) <= MAX_INTERNED_LENGTH:
+                value = intern(value)
+            return value, value
+        if isinstance(value, dict):
+            items = []
+            keys = []
+            for k, v in dict.items(value):
+                if type(k) is str:
+                    k = intern(k)
+                v, v_key = self._intern(v)
+                items.append((k, v))
+                keys.append((k, v_key))
+            node_key = ("d", *keys)
+            node = self._nodes.get(node_key)
+            if node is None:
+                node = self._nodes[node_key] = FrozenDict(items)
+            return node, id(node)
+        if isinstance(value, list):
+            items = []
+            keys = []
+            for v in list.__iter__(value):
+                v, v_key = self._intern(v)
+                items.append(v)
+                keys.append(v_key)
+            node_key = ("l", *keys)
+            node = self._nodes.get(node_key)
+            if node is None:
+                node = self._nodes[node_key] = FrozenList(items)
+            return node, id(node)
+        # distinguish 1, 1.0 and True, which are equal (and hash the same)
+        return value, (cls, value)
+
+    def compact(self, obj: dict) -> CompactDict:
+        """a compact copy of a manifest"""
+        return CompactDict(self._intern(obj)[0])
+
+
+def compact_all(
+    objs: Iterable[dict], interner: Interner | None = None
+) -> list[CompactDict]:
+    """compact copies of manifests, sharing memory through a fresh interner"""
+    interner = interner or Interner()
+    return [interner.compact(obj) for obj in objs]
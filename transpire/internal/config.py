@@ -1,18 +1,32 @@
+import fcntl
+import hashlib
 import importlib
 import importlib.util
+import marshal
 import os
 import re
 import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
 import tomllib
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import cache
 from pathlib import Path
-from subprocess import CalledProcessError, check_output
-from types import ModuleType
+from subprocess import DEVNULL, PIPE, CalledProcessError, Popen, check_output, run
+from types import CodeType, ModuleType
 from typing import Literal, Optional
 
+from loguru import logger
 from pydantic import AnyUrl, BaseModel, Field
 
+from transpire.internal import trace
 from transpire.internal.secrets import SecretsProvider
 from transpire.internal.secrets.vault import HashicorpVaultConfig, VaultSecret
 from transpire.types import Module
@@ -47,6 +61,14 @@ class CLIConfig(BaseModel):
     config_dir: Path = Field(
         description="The directory where transpire should write its persistent config files"
     )
+    helm_repo_ttl: float = Field(
+        description="Seconds a downloaded Helm repository index is considered fresh",
+        default=3600,
+    )
+    checkout_ttl: float = Field(
+        description="Seconds a git checkout is kept in the cache after it was last used",
+        default=7 * 24 * 3600,
+    )
 
     @classmethod
     @cache
@@ -67,18 +89,131 @@ class CLIConfig(BaseModel):
             )
             / "transpire"
         )
-        return cls(cache_dir=cache_dir.expanduser(), config_dir=config_dir.expanduser())
+        return cls(
+            cache_dir=cache_dir.expanduser(),
+            config_dir=config_dir.expanduser(),
+            helm_repo_ttl=float(first_env("TRANSPIRE_HELM_REPO_TTL", default="3600")),
+            checkout_ttl=float(
+                first_env("TRANSPIRE_CHECKOUT_TTL", default=str(7 * 24 * 3600))
+            ),
+        )
+
+
+# modules loaded so far, by what they were loaded from, with the mtime and size
+# of the files of local modules (see _stamp), which are loaded again when any of
+# them is edited
+_loaded_modules: dict[tuple, tuple[tuple | None, ModuleType]] = {}
+_load_lock = threading.RLock()
+
+
+def _stamp(files: Iterable[Path]) -> tuple:
+    """the (path, mtime, size) of each of a set of files"""
+    stamp = []
+    for file in set(files):
+        try:
+            stat = file.stat()
+            stamp.append((str(file), stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append((str(file), None, None))
+    return tuple(sorted(stamp, key=lambda s: s[0]))
+
+
+def _helper_files(names: Iterable[str], directory: Path) -> list[Path]:
+    """
+    the files of the named Python modules that are helpers from a directory,
+    rather than transpire itself or installed packages (which may well be under
+    the directory of a module at the root of a repository)
+    """
+    excluded = [
+        Path(__file__).resolve().parents[1],
+        Path(os.path.abspath(sys.prefix)),
+        Path(os.path.abspath(sys.base_prefix)),
+    ]
+    files = []
+    for name in names:
+        file = getattr(sys.modules.get(name), "__file__", None)
+        if file is None:
+            continue
+        file = Path(os.path.abspath(file))
+        if file.is_relative_to(directory) and not any(
+            file.is_relative_to(e) for e in excluded
+        ):
+            files.append(file)
+    return files
+
+
+def _cached_code(path: Path, source: tuple[str, str, str]) -> CodeType:
+    """
+    the code of a module in a git repository, compiled once and cached on disk
+
+    A path at a commit never changes, so the bytecode needs no validation, and
+    checkouts (which are shared, and never modified) don't get __pycache__
+    directories written into them.
+    """
+    digest = hashlib.sha256(
+        repr((importlib.util.MAGIC_NUMBER, *source)).encode()
+    ).hexdigest()
+    cached = CLIConfig.from_env().cache_dir / "bytecode" / f"{digest}.bin"
+    try:
+        return marshal.loads(cached.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with trace.span(f"compile {path}", "module"):
+        code = compile(path.read_bytes(), str(path), "exec", dont_inherit=True)
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cached.parent, prefix=f".{digest}.")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(code, f)
+        os.replace(tmp, cached)
+    except OSError as e:
+        logger.debug(f"Couldn't cache the bytecode of {path}: {e}")
+    return code
 
 
 def load_py_module_from_file(
-    py_mod_name: str, path: Path, expected_app_name: str | None = None
+    py_mod_name: str,
+    path: Path,
+    expected_app_name: str | None = None,
+    *,
+    source: tuple[str, str, str] | None = None,
 ) -> ModuleType:
-    spec = importlib.util.spec_from_file_location(py_mod_name, path)
-    if spec is None or spec.loader is None:
-        raise ValueError(f"No Python module was found at {path}")
+    """
+    load a transpire module, once per process
+
+    Loading a module again returns the same Python module, so module-level
+    state is shared by every load in a process (see transpire.types.Module).
+    A local module is executed again once its file, or a helper from its
+    directory that was first imported while it executed, has changed. Helpers
+    that were already imported, or that it only imports later (say, inside
+    objects()), aren't tracked.
+
+    source is the (url, commit, path) of a module in a git repository, which is
+    used to cache its bytecode across runs. Every module is registered in
+    sys.modules under py_mod_name and a suffix of its own, so any number of
+    them can be loaded at once.
+    """
+    key: tuple = ("local", str(path.resolve())) if source is None else ("git", *source)
 
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    with _load_lock:
+        loaded = _loaded_modules.get(key)
+        if loaded is not None and (
+            loaded[0] is None or _stamp(Path(f[0]) for f in loaded[0]) == loaded[0]
+        ):
+            module = loaded[1]
+        else:
+            if loaded is not None:
+                # helpers the module imported are executed again along with it
+                _forget_files({Path(f[0]) for f in loaded[0] or ()})
+            before = set(sys.modules)
+            module = _exec_module(py_mod_name, path, key, source)
+            stamp = None
+            if source is None:
+                file = Path(os.path.abspath(path))
+                helpers = _helper_files(set(sys.modules) - before, file.parent)
+                stamp = _stamp([file, *helpers])
+            _loaded_modules[key] = (stamp, module)
 
     try:
         real_app_name = module.name
@@ -94,6 +229,43 @@ def load_py_module_from_file(
     return module
 
 
+def _exec_module(
+    py_mod_name: str, path: Path, key: tuple, source: tuple[str, str, str] | None
+) -> ModuleType:
+    digest = hashlib.sha256(repr(key).encode())
+    py_mod_name = f"{py_mod_name}_{digest.hexdigest()[:12]}"
+
+    spec = importlib.util.spec_from_file_location(py_mod_name, path)
+    if spec is None or spec.loader is None:
+        raise ValueError(f"No Python module was found at {path}")
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[py_mod_name] = module
+    try:
+        with trace.span(f"exec {path}", "module"):
+            if source is None:
+                spec.loader.exec_module(module)
+            else:
+                exec(_cached_code(path, source), module.__dict__)
+    except BaseException:
+        del sys.modules[py_mod_name]
+        raise
+    return module
+
+
+def _forget_files(files: set[Path]) -> None:
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, "__file__", None)
+        if file is not None and Path(os.path.abspath(file)) in files:
+            del sys.modules[name]
+
+
+def forget_loaded_modules() -> None:
+    """load every module from its file again, the next time it's loaded"""
+    with _load_lock:
+        _loaded_modules.clear()
+
+
 class ModuleConfig(ABC):
     @abstractmethod
     def load_module(self, name: str | None) -> Module:
@@ -146,56 +318,271 @@ class GitModuleConfig(ModuleConfig, BaseModel):
     def clean_git_url(self):
         return str(self.git).removesuffix(".git") + ".git"
 
+    @property
+    def store_dir(self) -> Path:
+        """the bare repository holding everything fetched from this module's remote"""
+        config = CLIConfig.from_env()
+        return (
+            config.cache_dir
+            / "git"
+            / (re.sub("[^A-Za-z0-9]", "_", str(self.git)) + ".git")
+        )
+
     def get_cached_repo(self, *, commit: str | None = None) -> tuple[Path, str]:
+        """
+        fetch the module's repository into the cache, returning (path, commit)
+
+        Each (url, branch, commit) is only fetched once per process, so repositories
+        fetched ahead of time by `prefetch_modules` are not fetched again.
+
+        A pinned commit that isn't in the cache yet is fetched by its hash,
+        which remotes only accept in full. An abbreviated one is looked up in
+        the cache, and then in the full history of the branch.
+        """
+        key = (str(self.git), self.branch, commit)
+        if key not in _fetched_repos:
+            with trace.span(
+                f"fetch {self.git}", "git", branch=self.branch, commit=commit
+            ) as span:
+                _fetched_repos[key] = self._fetch_repo(commit=commit)
+                span["commit"] = _fetched_repos[key][1]
+        return _fetched_repos[key]
+
+    def _fetch_repo(self, *, commit: str | None = None) -> tuple[Path, str]:
+        """
+        fetch a single commit (the tip of the branch, or the given commit) into the
+        remote's object store, and check it out into a directory of its own
+
+        Fetches are shallow, so only the objects of that commit are transferred,
+        and commits already in the store aren't fetched again.
+        """
         config = CLIConfig.from_env()
-        cache_root = config.cache_dir / "remote_modules"
-        cache_dir = cache_root / re.sub("[^A-Za-z0-9]", "_", str(self.git))
-        cache_root.mkdir(exist_ok=True, parents=True)
+        store = self.store_dir
+
+        def call_git(*args, cwd=store):
+            # git's stderr is left on the terminal; spans get its exit code
+            with trace.span(f"git {args[0]}", "subprocess", argv=args) as span:
+                try:
+                    output = check_output([config.git_path, *args], cwd=cwd)
+                except CalledProcessError as e:
+                    span["exit_code"] = e.returncode
+                    raise
+                span["exit_code"] = 0
+                return output
+
+        with _lock_store(store):
+            if not (store / "HEAD").exists():
+                store.parent.mkdir(parents=True, exist_ok=True)
+                call_git("init", "--quiet", "--bare", str(store), cwd=None)
+
+            if commit is not None and not _FULL_HASH.fullmatch(commit):
+                commit = self._resolve_abbreviated(call_git, commit)
+
+            if commit is None:
+                source = self.branch or "HEAD"
+                ref = f"refs/transpire/heads/{source}"
+            elif _has_commit(config.git_path, store, commit):
+                source, ref = None, commit
+            else:
+                source = commit
+                ref = f"refs/transpire/pinned/{commit}"
+
+            if source is not None:
+                # the ref keeps the fetched commit from being garbage collected
+                call_git(
+                    "fetch",
+                    "--quiet",
+                    "--depth",
+                    "1",
+                    "--no-tags",
+                    str(self.git),
+                    f"+{source}:{ref}",
+                )
+            commit = call_git("rev-parse", f"{ref}^{{commit}}").decode().strip()
 
-        def call_cached_git(*args):
-            return check_output([config.git_path, *args], cwd=cache_dir)
+        return _checkout(config.git_path, store, commit), commit
 
-        if commit is None:
-            fetch_args = [self.branch or "HEAD", "--depth", "1"]
-            branch_args = [] if self.branch is None else ["--branch", self.branch]
-            clone_args = ["--depth", "1", "--single-branch", *branch_args]
-        else:
-            # FIXME lol --unshallow is not idempotent
-            fetch_args = ["--depth=10000000"]
-            clone_args = []
+    def _resolve_abbreviated(self, call_git, commit: str) -> str:
+        """the full hash of an abbreviated commit, with the store locked"""
 
-        if cache_dir.exists():
+        def resolve() -> str | None:
             try:
-                call_cached_git("fetch", str(self.git), *fetch_args)
-                call_cached_git("checkout", "--detach")
-                call_cached_git("reset", "--hard", commit or "FETCH_HEAD")
-                call_cached_git("clean", "-dfx")
+                output = call_git(
+                    "rev-parse", "--verify", "--quiet", f"{commit}^{{commit}}"
+                )
             except CalledProcessError:
-                shutil.rmtree(cache_dir)
-            else:
-                return cache_dir, call_cached_git("rev-parse", "HEAD").decode().strip()
-
-        cache_dir.mkdir(exist_ok=True, parents=True)
-        check_output([config.git_path, "clone", *clone_args, str(self.git), cache_dir])
-
-        call_cached_git("checkout", "--detach")
-        if commit is None:
-            commit = call_cached_git("rev-parse", "HEAD").decode().strip()
-        else:
-            call_cached_git("reset", "--hard", commit)
-
-        return cache_dir, commit
+                return None
+            return output.decode().strip()
+
+        resolved = resolve()
+        if resolved is not None:
+            return resolved
+
+        # remotes only serve commits by their full hash, so fetch all of the
+        # branch's history (undoing any shallow fetches of it)
+        source = self.branch or "HEAD"
+        call_git(
+            "fetch",
+            "--quiet",
+            "--depth",
+            "2147483647",
+            "--no-tags",
+            str(self.git),
+            f"+{source}:refs/transpire/heads/{source}",
+        )
+        resolved = resolve()
+        if resolved is None:
+            raise ValueError(f"{commit!r} isn't a commit on {source} of {self.git}")
+        return resolved
 
     def load_module(self, name: str | None, *, commit: str | None = None) -> Module:
         cache_dir, commit = self.get_cached_repo(commit=commit)
+        relative = self.resolved_dir / ".transpire.py"
         py_module = load_py_module_from_file(
-            "_transpire", cache_dir / self.resolved_dir / ".transpire.py", name
+            "_transpire",
+            cache_dir / relative,
+            name,
+            source=(str(self.git), commit, str(relative)),
         )
         module = Module(py_module)
         module.revision = commit
         return module
 
 
+_fetched_repos: dict[tuple[str, str | None, str | None], tuple[Path, str]] = {}
+# a full SHA-1 or SHA-256 commit hash
+_FULL_HASH = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+_store_locks: dict[Path, threading.Lock] = defaultdict(threading.Lock)
+
+
+@contextmanager
+def _lock_store(store: Path) -> Iterator[None]:
+    """
+    hold a store's lock, across threads and processes
+
+    Concurrent shallow fetches into one repository fail on its shallow.lock, so
+    fetches into a store are serialized (fetches from different remotes aren't).
+    """
+    with _store_locks[store]:
+        store.parent.mkdir(parents=True, exist_ok=True)
+        with open(store.with_name(store.name + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+
+def _has_commit(git_path: Path, store: Path, commit: str) -> bool:
+    if not (store / "HEAD").exists():
+        return False
+    return (
+        run(
+            [git_path, "cat-file", "-e", f"{commit}^{{commit}}"],
+            cwd=store,
+            stdout=DEVNULL,
+            stderr=DEVNULL,
+        ).returncode
+        == 0
+    )
+
+
+def _checkout(git_path: Path, store: Path, commit: str) -> Path:
+    """
+    the files of a commit, extracted with `git archive` into
+    `<cache dir>/checkouts/<commit>`, which is shared by every module at that
+    commit and never modified once it exists
+
+    Checkouts are marked as used (by their mtime) whenever they're returned, and
+    those unused for longer than `CLIConfig.checkout_ttl` are pruned whenever a
+    new one is made.
+    """
+    checkout = CLIConfig.from_env().cache_dir / "checkouts" / commit
+    if checkout.exists():
+        os.utime(checkout)
+        return checkout
+
+    checkout.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=checkout.parent, prefix=f".{commit}."))
+    try:
+        with trace.span("git archive", "subprocess", argv=[commit]) as span, Popen(
+            [git_path, "archive", "--format=tar", commit], cwd=store, stdout=PIPE
+        ) as archive:
+            with tarfile.open(fileobj=archive.stdout, mode="r|") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(tmp, filter="data")
+                else:  # pragma: no cover
+                    tar.extractall(tmp)
+            span["exit_code"] = archive.wait()
+        if archive.returncode != 0:
+            raise CalledProcessError(archive.returncode, archive.args)
+        try:
+            tmp.rename(checkout)
+        except OSError:
+            # another process checked out the same commit first
+            if not checkout.exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    prune_checkouts()
+    return checkout
+
+
+def prune_checkouts() -> None:
+    """remove the checkouts that haven't been used within `CLIConfig.checkout_ttl`"""
+    config = CLIConfig.from_env()
+    # full clones, from before modules were fetched into stores
+    shutil.rmtree(config.cache_dir / "remote_modules", ignore_errors=True)
+    root = config.cache_dir / "checkouts"
+    in_use = {path for path, _ in _fetched_repos.values()}
+    cutoff = time.time() - config.checkout_ttl
+    for entry in root.iterdir():
+        try:
+            if entry in in_use or entry.stat().st_mtime >= cutoff:
+                continue
+            # renamed first, so other processes never see a half-removed checkout
+            doomed = root / f".prune-{entry.name.lstrip('.')}-{os.getpid()}"
+            entry.rename(doomed)
+        except OSError:
+            continue
+        logger.debug(f"Pruning unused checkout {entry.name}")
+        shutil.rmtree(doomed, ignore_errors=True)
+
+
+def fetched_repos() -> dict[tuple[str, str | None, str | None], tuple[Path, str]]:
+    """the git repositories fetched by this process so far"""
+    return dict(_fetched_repos)
+
+
+def seed_fetched_repos(
+    fetched: dict[tuple[str, str | None, str | None], tuple[Path, str]]
+) -> None:
+    """mark repositories fetched by another process as already fetched"""
+    _fetched_repos.update(fetched)
+
+
+def prefetch_modules(modules: Mapping[str, "ModuleConfig"], *, jobs: int = 8) -> None:
+    """
+    fetch the repositories of all git modules concurrently, before rendering
+
+    Each remote branch is fetched once, however many modules use it. Fetches from
+    the same remote wait on each other, since they share an object store.
+    """
+    to_fetch = list(
+        {
+            (str(module.git), module.branch): module
+            for module in modules.values()
+            if isinstance(module, GitModuleConfig)
+        }.values()
+    )
+
+    def fetch(module: GitModuleConfig) -> None:
+        start = time.perf_counter()
+        _, commit = module.get_cached_repo()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Fetched {module.git} at {commit[:12]} in {elapsed:.2f}s")
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(fetch, to_fetch))
+
+
 class ClusterDefaults(BaseModel):
     ingressClass: str | None
     certManagerIssuer: str | None
@@ -218,20 +605,31 @@ class ClusterConfig(BaseModel):
     ] = Field(description="list of modules to load")
     defaults: ClusterDefaults
 
+    @classmethod
+    def from_cwd(cls, cwd: Path | None = None) -> "ClusterConfig":
+        return cls._from_dir(Path.cwd() if cwd is None else cwd)
+
     @classmethod
     @cache
-    def from_cwd(cls, cwd: Path = Path.cwd()) -> "ClusterConfig":
+    def _from_dir(cls, cwd: Path) -> "ClusterConfig":
+        return cls.parse_obj(tomllib.loads(cls.find_toml(cwd).read_text()))
+
+    @staticmethod
+    def find_toml(cwd: Path) -> Path:
+        """the cluster.toml in cwd, or the closest of its parents"""
         cluster_toml = cwd / "cluster.toml"
         if cluster_toml.exists():
-            return cls.parse_obj(tomllib.loads(cluster_toml.read_text()))
+            return cluster_toml
         if cwd.is_mount() or (cwd / ".git").exists():
             raise FileNotFoundError(
                 "cluster.toml not found up to current git or fs boundary"
             )
-        return cls.from_cwd(cwd.parent)
+        return ClusterConfig.find_toml(cwd.parent)
 
 
-def get_config(module_name: str | None = None, cwd: Path = Path.cwd()) -> Module:
+def get_config(module_name: str | None = None, cwd: Path | None = None) -> Module:
+    if cwd is None:
+        cwd = Path.cwd()
     if module_name:
         cluster_config = ClusterConfig.from_cwd(cwd)
         module = cluster_config.modules.get(module_name)
@@ -246,7 +644,7 @@ def get_config(module_name: str | None = None, cwd: Path = Path.cwd()) -> Module
 
     transpire_py = cwd / ".transpire.py"
     if transpire_py.exists():
-        return Module(load_py_module_from_file("_transpire", transpire_py, None))
+        return Module(load_py_module_from_file("_transpire", transpire_py))
     if cwd.is_mount() or (cwd / ".git").exists():
         raise FileNotFoundError(
             ".transpire.py not found up to current git or fs boundary"
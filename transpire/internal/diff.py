@@ -0,0 +1,195 @@
+"""
+Structural diffs between rendered objects and an existing output tree.
+
+Objects are first compared in their serialized form, which is exactly what
+`write_manifests` would write, so unchanged objects (nearly all of them,
+usually) cost one serialization and one read of the file on disk. Only files
+whose bytes differ are parsed, compared by canonical hash (so files that only
+differ in formatting count as unchanged) and walked for field-level changes.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+from transpire.internal import render, yamlio
+from transpire.internal.postprocessor import Pipeline
+
+__all__ = [
+    "MISSING",
+    "FieldChange",
+    "ObjectDiff",
+    "ModuleDiff",
+    "canonical_hash",
+    "field_changes",
+    "diff_module",
+]
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+# The value of a field that doesn't exist on one side of a change.
+MISSING: Any = _Missing()
+
+
+@dataclass
+class FieldChange:
+    """A field whose value differs, at a path like spec.containers[name=app].image."""
+
+    path: str
+    old: Any
+    new: Any
+
+
+@dataclass
+class ObjectDiff:
+    """An object that was added, removed or changed."""
+
+    fname: str
+    kind: str
+    name: str
+    changes: list[FieldChange] = field(default_factory=list)
+
+
+@dataclass
+class ModuleDiff:
+    """How a module's rendered objects differ from its output directory."""
+
+    name: str
+    added: list[ObjectDiff] = field(default_factory=list)
+    changed: list[ObjectDiff] = field(default_factory=list)
+    removed: list[ObjectDiff] = field(default_factory=list)
+    unchanged: int = 0
+    # names of objects that failed postprocessing
+    errors: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.errors)
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed, {self.unchanged} unchanged"
+        )
+
+
+def canonical_hash(obj: Any) -> bytes:
+    """a digest of obj that doesn't depend on key order or formatting"""
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).digest()
+
+
+def _keyed_by_name(items: list) -> dict[str, Any] | None:
+    """items by their "name", if they all have distinct names (e.g. containers)"""
+    if not all(isinstance(item, dict) and "name" in item for item in items):
+        return None
+    keyed = {str(item["name"]): item for item in items}
+    return keyed if len(keyed) == len(items) else None
+
+
+def field_changes(old: Any, new: Any, path: str = "") -> Iterator[FieldChange]:
+    """the leaf fields that differ between old and new"""
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(old.keys() | new.keys(), key=str):
+            sub = f"{path}.{key}" if path else str(key)
+            yield from field_changes(old.get(key, MISSING), new.get(key, MISSING), sub)
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        old_named, new_named = _keyed_by_name(old), _keyed_by_name(new)
+        if old_named is not None and new_named is not None and old and new:
+            # match up list items by name, so inserting a container or env var
+            # doesn't show as a change to every item after it
+            names = [*old_named, *(n for n in new_named if n not in old_named)]
+            for name in names:
+                yield from field_changes(
+                    old_named.get(name, MISSING),
+                    new_named.get(name, MISSING),
+                    f"{path}[name={name}]",
+                )
+            return
+        for i in range(max(len(old), len(new))):
+            yield from field_changes(
+                old[i] if i < len(old) else MISSING,
+                new[i] if i < len(new) else MISSING,
+                f"{path}[{i}]",
+            )
+        return
+
+    if old != new or type(old) is not type(new):
+        yield FieldChange(path, old, new)
+
+
+def _describe(obj: Any, fname: str) -> tuple[str, str]:
+    if not isinstance(obj, dict):
+        return "?", fname
+    metadata = obj.get("metadata") or {}
+    return obj.get("kind", "?"), metadata.get(
+        "name", metadata.get("generateName", fname)
+    )
+
+
+def diff_module(
+    objects: Iterable[dict],
+    appname: str,
+    manifest_dir: Path,
+    *,
+    pipeline: Pipeline,
+) -> ModuleDiff:
+    """
+    compare a module's objects with what's in manifest_dir, without writing to it
+
+    Objects are postprocessed and named exactly as `write_manifests` would.
+    """
+
+    appdir = manifest_dir / appname
+    result = ModuleDiff(appname)
+    seen = set()
+
+    for obj in render.postprocess(objects, appname, pipeline, result.errors):
+        fname = render.manifest_filename(obj, appname)
+        path = appdir / fname
+        seen.add(fname)
+        kind, name = _describe(obj, fname)
+
+        try:
+            existing = path.read_bytes()
+        except FileNotFoundError:
+            result.added.append(ObjectDiff(fname, kind, name))
+            continue
+
+        if existing == yamlio.dump(obj).encode("utf-8"):
+            result.unchanged += 1
+            continue
+
+        try:
+            old = yamlio.load(existing)
+        except yaml.YAMLError:
+            old = None
+        if canonical_hash(old) == canonical_hash(obj):
+            result.unchanged += 1
+            continue
+        result.changed.append(
+            ObjectDiff(fname, kind, name, list(field_changes(old, obj)))
+        )
+
+    for path in render.stale_files(appdir, seen):
+        if path.is_dir():
+            result.removed.append(ObjectDiff(f"{path.name}/", "?", f"{path.name}/"))
+            continue
+        try:
+            kind, name = _describe(yamlio.load(path.read_bytes()), path.name)
+        except (yaml.YAMLError, UnicodeDecodeError):
+            kind, name = "?", path.name
+        result.removed.append(ObjectDiff(path.name, kind, name))
+
+    return result
@@ -1,14 +1,26 @@
+import fcntl
+import hashlib
+import json
+import os
 import shutil
 import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from subprocess import PIPE, run
-from typing import Any
-
-import yaml
+from typing import Any, Iterator
 
+from transpire.internal import trace, yamlio
+from transpire.internal.cache import RenderCache
 from transpire.internal.config import CLIConfig
 from transpire.internal.context import get_app_context
+from transpire.internal.process import stream_yaml
+
+__all__ = ["build_chart_from_versions", "build_chart", "iter_chart"]
 
-__all__ = ["build_chart_from_versions", "build_chart"]
+_render_cache = RenderCache("helm")
 
 
 def assert_helm() -> None:
@@ -18,25 +30,28 @@ def assert_helm() -> None:
         raise RuntimeError("`helm` must be installed and in your $PATH")
 
 
+def helm_command(args: list[str]) -> list[str]:
+    """prefixes helm arguments with the helm binary and transpire's helm paths"""
+
+    config = CLIConfig.from_env()
+    return [
+        "helm",
+        "--registry-config",
+        str(config.cache_dir / "helm" / "registry.json"),
+        "--repository-cache",
+        str(config.cache_dir / "helm" / "repository"),
+        "--repository-config",
+        str(config.cache_dir / "helm" / "repositories.yaml"),
+        *args,
+    ]
+
+
 def exec_helm(args: list[str], check: bool = True) -> tuple[bytes, bytes]:
     """executes a helm command and returns (stdout, stderr)"""
 
-    config = CLIConfig.from_env()
-    process = run(
-        [
-            "helm",
-            "--registry-config",
-            str(config.cache_dir / "helm" / "registry.json"),
-            "--repository-cache",
-            str(config.cache_dir / "helm" / "repository"),
-            "--repository-config",
-            str(config.cache_dir / "helm" / "repositories.yaml"),
-            *args,
-        ],
-        check=False,
-        stdout=PIPE,
-        stderr=PIPE,
-    )
+    with trace.span(f"helm {args[0]}", "subprocess", argv=args) as span:
+        process = run(helm_command(args), check=False, stdout=PIPE, stderr=PIPE)
+        trace.record_process(span, process.returncode, process.stderr)
 
     if check and process.returncode != 0:
         raise ValueError(process.stderr)
@@ -44,6 +59,12 @@ def exec_helm(args: list[str], check: bool = True) -> tuple[bytes, bytes]:
     return (process.stdout, process.stderr)
 
 
+def stream_helm(args: list[str]) -> Iterator[Any]:
+    """executes a helm command, yielding YAML documents from stdout as they arrive"""
+
+    yield from stream_yaml(f"helm {args[0]}", helm_command(args), args)
+
+
 def add_repo(name: str, url: str) -> None:
     """add a repository to transpire's Helm repository list"""
 
@@ -60,67 +81,260 @@ def update_repo(name: str) -> None:
     exec_helm(["repo", "update", name], check=False)
 
 
+class RepoStateManager:
+    """
+    Tracks the Helm repositories used by this process, so that each repository is
+    added and updated at most once per run, and not updated at all while its
+    cached index is younger than `CLIConfig.helm_repo_ttl`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._added: dict[str, str] = {}
+        self._updated: set[str] = set()
+        self._update_locks: dict[str, threading.Lock] = {}
+
+    def _configured_repos(self) -> dict[str, str]:
+        config = CLIConfig.from_env()
+        try:
+            with open(config.cache_dir / "helm" / "repositories.yaml") as f:
+                repositories = yamlio.load(f) or {}
+        except FileNotFoundError:
+            return {}
+        return {r["name"]: r["url"] for r in repositories.get("repositories") or []}
+
+    def _add(self, name: str, url: str) -> None:
+        # `helm repo add` rewrites repositories.yaml, so adds are serialized.
+        with self._lock:
+            if self._added.get(name) == url:
+                return
+            if self._configured_repos().get(name) != url:
+                add_repo(name, url)
+            self._added[name] = url
+            self._update_locks.setdefault(name, threading.Lock())
+
+    def is_stale(self, name: str, max_age: float | None = None) -> bool:
+        """whether the cached index for a repository is older than max_age seconds"""
+
+        config = CLIConfig.from_env()
+        if max_age is None:
+            max_age = config.helm_repo_ttl
+        index = config.cache_dir / "helm" / "repository" / f"{name}-index.yaml"
+        try:
+            return time.time() - index.stat().st_mtime > max_age
+        except FileNotFoundError:
+            return True
+
+    def _refresh(self, name: str, max_age: float | None) -> None:
+        with self._update_locks[name]:
+            if name in self._updated:
+                return
+            if self.is_stale(name, max_age):
+                update_repo(name)
+            self._updated.add(name)
+
+    def ensure(self, name: str, url: str, *, max_age: float | None = None) -> None:
+        """add a repository and refresh its index if it is stale"""
+
+        self._add(name, url)
+        self._refresh(name, max_age)
+
+    def ensure_all(
+        self, repos: Mapping[str, str], *, max_age: float | None = None, jobs: int = 8
+    ) -> None:
+        """add several repositories, then refresh all stale indexes concurrently"""
+
+        for name, url in repos.items():
+            self._add(name, url)
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(lambda name: self._refresh(name, max_age), repos))
+
+
+repo_state = RepoStateManager()
+
+
+class ChartStore:
+    """
+    Chart tarballs pulled from Helm repositories, kept under
+    `<cache dir>/charts/<chart>/<version>/<sha256>.tgz`.
+
+    index.json maps each (repository, chart, version) to the digest of its
+    tarball, so once a chart is in the store, rendering it needs neither the
+    network nor the repository's index.
+    """
+
+    def __init__(self) -> None:
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def root(self) -> Path:
+        return CLIConfig.from_env().cache_dir / "charts"
+
+    @staticmethod
+    def ref(repo_url: str, chart: str, version: str) -> str:
+        """how a chart is named in the index"""
+        return f"{repo_url.rstrip('/')}/{chart}:{version}"
+
+    def index(self) -> dict[str, dict[str, str]]:
+        """every chart in the store, by `ref`"""
+        try:
+            with open(self.root / "index.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _path(self, entry: dict[str, str]) -> Path:
+        return self.root / entry["chart"] / entry["version"] / f"{entry['digest']}.tgz"
+
+    def get(self, repo_url: str, chart: str, version: str) -> Path | None:
+        """the stored tarball for a chart, if there is one"""
+        entry = self.index().get(self.ref(repo_url, chart, version))
+        if entry is None:
+            return None
+        path = self._path(entry)
+        return path if path.exists() else None
+
+    def _record(self, ref: str, entry: dict[str, str]) -> None:
+        # other transpire processes may be pulling into the same store
+        with open(self.root / "index.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self.index()
+            index[ref] = entry
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.root, prefix=".index.json.", delete=False
+            ) as f:
+                json.dump(index, f, indent=2, sort_keys=True)
+            os.replace(f.name, self.root / "index.json")
+
+    def pull(self, repo_url: str, chart: str, version: str) -> Path:
+        """download a chart into the store, returning the path to its tarball"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if repo_url.startswith("oci://"):
+            source = [f"{repo_url.rstrip('/')}/{chart}"]
+        else:
+            source = [chart, "--repo", repo_url]
+
+        with tempfile.TemporaryDirectory(dir=self.root, prefix=".pull-") as tmp:
+            exec_helm(["pull", *source, "--version", version, "--destination", tmp])
+            (tarball,) = Path(tmp).glob("*.tgz")
+            digest = hashlib.sha256(tarball.read_bytes()).hexdigest()
+            entry = {
+                "repo": repo_url,
+                "chart": chart,
+                "version": version,
+                "digest": digest,
+            }
+            path = self._path(entry)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tarball, path)
+
+        self._record(self.ref(repo_url, chart, version), entry)
+        return path
+
+    def ensure(self, repo_url: str, chart: str, version: str) -> Path:
+        """the stored tarball for a chart, pulling it first if needed"""
+        ref = self.ref(repo_url, chart, version)
+        with self._locks_lock:
+            lock = self._locks.setdefault(ref, threading.Lock())
+        with lock:
+            path = self.get(repo_url, chart, version)
+            if path is None:
+                assert_helm()
+                path = self.pull(repo_url, chart, version)
+            return path
+
+
+chart_store = ChartStore()
+
+
 def search_repo(query: str) -> list[dict]:
     """search a repository for a chart"""
 
     assert_helm()
     stdout, _ = exec_helm(["search", "repo", query, "--output", "yaml"], check=True)
-    return yaml.safe_load(stdout)
+    return yamlio.load(stdout)
 
 
-def build_chart(
+def iter_chart(
     repo_url: str,
     chart_name: str,
     name: str,
     version: str,
     values: dict | None = None,
     capabilities: list[str] | None = None,
-) -> list[dict]:
-    """build a helm chart and return a list of manifests"""
+    cache: bool = True,
+) -> Iterator[dict]:
+    """build a helm chart, yielding manifests as helm renders them"""
 
     # TODO: avoid needing to setting capabilities for "normal" things
     # - maybe have a config file at cluster level?
 
-    add_repo(name, repo_url)
-    update_repo(name)
-
-    with tempfile.NamedTemporaryFile(suffix=".yml") as values_file:
-        values_file.write(yaml.dump(values).encode("utf-8"))
-        values_file.flush()
-
-        capabilities_flag = []
-        if capabilities is not None and len(capabilities) > 0:
-            capabilities_flag = ["--api-versions", ", ".join(capabilities)]
-
-        # TODO: Capture `stderr` output and make available to tracing.
-        stdout, _ = exec_helm(
-            [
-                "template",
-                "-n",
-                get_app_context().namespace,
-                "--values",
-                values_file.name,
-                "--include-crds",
-                "--version",
-                version,
-                "--name-template",
-                name,
-                *capabilities_flag,
-                f"{name}/{chart_name}",
-            ],
-            check=True,
-        )
-
-    # save our souls
-    # <https://github.com/prometheus-community/helm-charts/pull/2238>
-    # <https://github.com/prometheus-operator/prometheus-operator/pull/4897>
-    # <https://github.com/yaml/pyyaml/issues/89>
-    # <https://github.com/allenporter/k8s-gitops/commit/304c64c57926d2747328c0803c246be7dd827fdd>
-    yaml.constructor.SafeConstructor.add_constructor(
-        "tag:yaml.org,2002:value", yaml.constructor.SafeConstructor.construct_yaml_str  # type: ignore
+    namespace = get_app_context().namespace
+    cache_key = RenderCache.key(
+        repo_url, chart_name, name, version, values, namespace, capabilities
     )
+    with trace.span(
+        f"chart {name}", "helm", chart=f"{name}/{chart_name}", version=version
+    ) as span:
+        if cache:
+            cached = _render_cache.iter(cache_key)
+            span["cache"] = "miss" if cached is None else "hit"
+            if cached is not None:
+                yield from trace.busy(cached, span)
+                return
+
+        chart = chart_store.ensure(repo_url, chart_name, version)
+
+        with tempfile.NamedTemporaryFile(suffix=".yml") as values_file:
+            values_file.write(yamlio.dump(values).encode("utf-8"))
+            values_file.flush()
+
+            capabilities_flag = []
+            if capabilities is not None and len(capabilities) > 0:
+                capabilities_flag = ["--api-versions", ", ".join(capabilities)]
+
+            objs = stream_helm(
+                [
+                    "template",
+                    "-n",
+                    namespace,
+                    "--values",
+                    values_file.name,
+                    "--include-crds",
+                    "--name-template",
+                    name,
+                    *capabilities_flag,
+                    str(chart),
+                ]
+            )
+            if cache:
+                objs = _render_cache.tee(cache_key, objs)
+            yield from trace.busy(objs, span)
 
-    return list(yaml.safe_load_all(stdout))
+
+def build_chart(
+    repo_url: str,
+    chart_name: str,
+    name: str,
+    version: str,
+    values: dict | None = None,
+    capabilities: list[str] | None = None,
+    cache: bool = True,
+) -> list[dict]:
+    """build a helm chart and return a list of manifests"""
+
+    return list(
+        iter_chart(
+            repo_url=repo_url,
+            chart_name=chart_name,
+            name=name,
+            version=version,
+            values=values,
+            capabilities=capabilities,
+            cache=cache,
+        )
+    )
 
 
 def build_chart_from_versions(
@@ -0,0 +1,126 @@
+"""
+Image fingerprints, to skip building images whose build context hasn't changed.
+
+An image's fingerprint hashes the git tree of its build context along with its
+build target, so it only changes when something the build could see changes.
+CI tags each image it builds with its fingerprint, and an image whose
+fingerprint tag is already in its registry only needs the new revision's tags.
+"""
+
+import hashlib
+import re
+import threading
+from collections.abc import Mapping
+from subprocess import check_output
+
+import requests
+
+from transpire.internal.config import CLIConfig, GitModuleConfig
+from transpire.types import Image
+
+__all__ = [
+    "FINGERPRINT_PREFIX",
+    "repository",
+    "context_tree",
+    "fingerprint",
+    "Registry",
+]
+
+FINGERPRINT_PREFIX = "tree-"
+
+# the manifest types a tag can point to, so the registry doesn't try to
+# convert what it has into something else
+MANIFEST_TYPES = [
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+]
+
+
+def repository(reference: str) -> str:
+    """an image reference without its tag, e.g. registry:5000/org/img:tag -> registry:5000/org/img"""
+    name, _, last = reference.rpartition("/")
+    if ":" in last:
+        last = last.rsplit(":", 1)[0]
+    return f"{name}/{last}" if name else last
+
+
+def context_tree(config: GitModuleConfig, commit: str, image: Image) -> str:
+    """the hash of the git tree an image is built from, at a commit"""
+    path = image.resolved_path.as_posix()
+    rev = f"{commit}:{'' if path == '.' else path}"
+    # prints "<hash> <type> <size>", or "<rev> missing"
+    found = check_output(
+        [CLIConfig.from_env().git_path, "cat-file", "--batch-check"],
+        cwd=config.store_dir,
+        input=f"{rev}\n".encode(),
+    ).split()
+    if found[1] != b"tree":
+        raise ValueError(
+            f"image {image.name} is built from {path}, which isn't a directory at {commit}"
+        )
+    return found[0].decode()
+
+
+def fingerprint(tree: str, target: str | None) -> str:
+    """the tag an image built from a tree (and target) is known by"""
+    digest = hashlib.sha256(f"{tree}\0{target or ''}".encode()).hexdigest()
+    return FINGERPRINT_PREFIX + digest[:32]
+
+
+class Registry:
+    """
+    Looks up tags in OCI registries, anonymously.
+
+    endpoints maps registry hosts to the base URLs they're reached at, which are
+    otherwise https://<host>.
+    """
+
+    def __init__(
+        self, endpoints: Mapping[str, str] | None = None, *, timeout: float = 10
+    ) -> None:
+        self.endpoints = dict(endpoints or {})
+        self.timeout = timeout
+        self.session = requests.Session()
+        # (host, repository) -> bearer token
+        self._tokens: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def _token(self, challenge: str) -> str | None:
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        if "realm" not in fields:
+            return None
+        response = self.session.get(
+            fields.pop("realm"), params=fields, timeout=self.timeout
+        )
+        response.raise_for_status()
+        body = response.json()
+        return body.get("token") or body.get("access_token")
+
+    def has_tag(self, image: str, tag: str) -> bool:
+        """whether an image (host/repository, with no tag) has a tag"""
+        host, _, repository = image.partition("/")
+        url = f"{self.endpoints.get(host, f'https://{host}')}/v2/{repository}/manifests/{tag}"
+        headers = {"Accept": ", ".join(MANIFEST_TYPES)}
+
+        token = self._tokens.get((host, repository))
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        response = self.session.head(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 401:
+            token = self._token(response.headers.get("WWW-Authenticate", ""))
+            if token is not None:
+                with self._lock:
+                    self._tokens[(host, repository)] = token
+                headers["Authorization"] = f"Bearer {token}"
+                response = self.session.head(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
@@ -1,11 +1,27 @@
 import shutil
+import threading
 import urllib.parse
 from subprocess import PIPE, run
-from typing import Any
+from typing import Any, Iterator
 
-import yaml
+from loguru import logger
 
-__all__ = ["build_kustomization_from_versions", "build_kustomization"]
+from transpire.internal import trace
+from transpire.internal.cache import RenderCache
+from transpire.internal.config import CLIConfig
+from transpire.internal.process import stream_yaml
+
+__all__ = [
+    "build_kustomization_from_versions",
+    "build_kustomization",
+    "iter_kustomization",
+]
+
+_render_cache = RenderCache("kustomize")
+
+# (git remote, ref) -> commit, so each ref is resolved at most once per process
+_resolved_refs: dict[tuple[str, str], str | None] = {}
+_resolved_refs_lock = threading.Lock()
 
 
 def assert_kubectl() -> None:
@@ -17,16 +33,18 @@ def assert_kubectl() -> None:
 
 def exec_kustomize(args: list[str], check: bool = True) -> tuple[bytes, bytes]:
     """executes a kustomize command and returns (stdout, stderr)"""
-    process = run(
-        [
-            "kubectl",
-            "kustomize",
-            *args,
-        ],
-        check=False,
-        stdout=PIPE,
-        stderr=PIPE,
-    )
+    with trace.span("kubectl kustomize", "subprocess", argv=args) as span:
+        process = run(
+            [
+                "kubectl",
+                "kustomize",
+                *args,
+            ],
+            check=False,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        trace.record_process(span, process.returncode, process.stderr)
 
     if check and process.returncode != 0:
         raise ValueError(process.stderr)
@@ -34,34 +52,122 @@ def exec_kustomize(args: list[str], check: bool = True) -> tuple[bytes, bytes]:
     return (process.stdout, process.stderr)
 
 
-def build_kustomization(
+def stream_kustomize(args: list[str]) -> Iterator[Any]:
+    """executes a kustomize command, yielding YAML documents from stdout as they arrive"""
+
+    yield from stream_yaml("kubectl kustomize", ["kubectl", "kustomize", *args], args)
+
+
+def git_remote(repo_url: str) -> str:
+    """the git repository of a kustomize URL, i.e. everything before a `//` path"""
+
+    url = urllib.parse.urlparse(repo_url)
+    repo_path = url.path.split("//", 1)[0].rstrip("/")
+    return url._replace(path=repo_path, query="", fragment="").geturl()
+
+
+def resolve_ref(repo_url: str, ref: str) -> str | None:
+    """
+    the commit a branch or tag of repo_url currently points to, according to
+    `git ls-remote`, or None if ref isn't a branch or tag (e.g. it's a commit)
+    """
+
+    remote = git_remote(repo_url)
+    with _resolved_refs_lock:
+        if (remote, ref) in _resolved_refs:
+            return _resolved_refs[(remote, ref)]
+
+    config = CLIConfig.from_env()
+    with trace.span("git ls-remote", "subprocess", argv=[remote, ref]) as span:
+        process = run(
+            [str(config.git_path), "ls-remote", remote, ref, f"{ref}^{{}}"],
+            check=False,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        trace.record_process(span, process.returncode, process.stderr)
+    if process.returncode != 0:
+        raise ValueError(process.stderr)
+
+    refs = {}
+    for line in process.stdout.decode().splitlines():
+        commit, name = line.split("\t", 1)
+        refs[name] = commit
+    # prefer the commit an annotated tag points to over the tag object itself
+    candidates = [f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}", f"refs/heads/{ref}", ref]
+    resolved = next((refs[name] for name in candidates if name in refs), None)
+    with _resolved_refs_lock:
+        _resolved_refs[(remote, ref)] = resolved
+    return resolved
+
+
+def iter_kustomization(
     repo_url: str,
     path: str,
     version: str,
-) -> list[dict]:
-    """build a kustomization and return a list of manifests"""
+    cache: bool = True,
+    revalidate: bool = False,
+) -> Iterator[dict]:
+    """
+    build a kustomization, yielding manifests as kustomize renders them
+
+    Renders are cached by (repo_url, path, version), which assumes version is an
+    immutable ref (a tag or a commit). For branches, pass revalidate=True: the
+    commit the ref points to is looked up with `git ls-remote` on every build and
+    becomes part of the cache key.
+    """
 
     kustomize_url = urllib.parse.urljoin(repo_url, path)
     full_url = urllib.parse.urlparse(f"{kustomize_url}")._replace(
         query=f"ref={version}"
     )
 
-    # TODO: Capture `stderr` output and make available to tracing.
-    stdout, _ = exec_kustomize(
-        [full_url.geturl()],
-        check=True,
-    )
+    with trace.span(
+        f"kustomization {path}", "kustomize", url=repo_url, version=version
+    ) as span:
+        if cache:
+            commit = None
+            if revalidate:
+                try:
+                    commit = resolve_ref(repo_url, version)
+                except ValueError as e:
+                    logger.warning(
+                        f"Couldn't resolve {version} in {repo_url}, not caching: {e}"
+                    )
+                    cache = False
+            cache_key = RenderCache.key(repo_url, path, version, commit)
+
+        if cache:
+            cached = _render_cache.iter(cache_key)
+            span["cache"] = "miss" if cached is None else "hit"
+            if cached is not None:
+                yield from trace.busy(cached, span)
+                return
+
+        objs = stream_kustomize([full_url.geturl()])
+        if cache:
+            objs = _render_cache.tee(cache_key, objs)
+        yield from trace.busy(objs, span)
 
-    # save our souls
-    # <https://github.com/prometheus-community/helm-charts/pull/2238>
-    # <https://github.com/prometheus-operator/prometheus-operator/pull/4897>
-    # <https://github.com/yaml/pyyaml/issues/89>
-    # <https://github.com/allenporter/k8s-gitops/commit/304c64c57926d2747328c0803c246be7dd827fdd>
-    yaml.constructor.SafeConstructor.add_constructor(
-        "tag:yaml.org,2002:value", yaml.constructor.SafeConstructor.construct_yaml_str  # type: ignore
-    )
 
-    return list(yaml.safe_load_all(stdout))
+def build_kustomization(
+    repo_url: str,
+    path: str,
+    version: str,
+    cache: bool = True,
+    revalidate: bool = False,
+) -> list[dict]:
+    """build a kustomization and return a list of manifests"""
+
+    return list(
+        iter_kustomization(
+            repo_url=repo_url,
+            path=path,
+            version=version,
+            cache=cache,
+            revalidate=revalidate,
+        )
+    )
 
 
 def build_kustomization_from_versions(
@@ -74,4 +180,5 @@ def build_kustomization_from_versions(
         repo_url=versions[name]["repo_url"],
         path=versions[name]["path"],
         version=versions[name]["version"],
+        revalidate=versions[name].get("revalidate", False),
     )
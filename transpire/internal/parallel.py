@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from transpire.internal import cache, compact, config, trace
+from transpire.internal.config import ClusterConfig
+
+__all__ = ["RenderedModule", "render_modules"]
+
+# Imported once by the forkserver, so that each forked worker starts with the
+# kubernetes client and pydantic models already loaded.
+PRELOAD = [
+    "transpire.internal.config",
+    "transpire.internal.helm",
+    "transpire.internal.kustomize",
+    "transpire.resources",
+]
+
+# Workers are replaced after rendering this many modules, which bounds the
+# memory held onto by large charts and by module code that leaks.
+MAX_MODULES_PER_WORKER = 8
+
+
+@dataclass
+class RenderedModule:
+    """The parts of a rendered Module needed to write it out."""
+
+    name: str
+    namespace: str
+    auto_sync: bool
+    objects: list[dict]
+    cache_stats: dict[str, cache.CacheStats] = field(default_factory=dict)
+    trace_events: list[dict] = field(default_factory=list)
+
+
+def _init_worker(
+    cwd: Path,
+    bypass_cache: bool,
+    fetched: dict,
+    trace_settings: tuple[bool, Path | None],
+) -> None:
+    os.chdir(cwd)
+    cache.set_bypass(bypass_cache)
+    config.seed_fetched_repos(fetched)
+    enabled, profile_dir = trace_settings
+    trace.configure(enabled=enabled, profile_dir=profile_dir)
+
+
+def _render(name: str, compact_objects: bool) -> RenderedModule:
+    before = cache.snapshot_stats()
+    cluster_config = ClusterConfig.from_cwd(Path.cwd())
+    # Module._render_fn runs each module in a fresh contextvars.Context, so
+    # modules sharing a worker can't see each other's context.
+    with trace.span(f"module {name}", "module"), trace.profiled(name):
+        module = cluster_config.modules[name].load_module_w_context(
+            name, context=cluster_config
+        )
+        objects = module.objects
+        if compact_objects:
+            # also shrinks the pickle sent back, as shared subtrees are
+            # pickled once
+            objects = compact.compact_all(objects)
+
+    stats = cache.snapshot_stats()
+    for kind, prev in before.items():
+        stats[kind].hits -= prev.hits
+        stats[kind].misses -= prev.misses
+
+    return RenderedModule(
+        name=module.name,
+        namespace=module.namespace,
+        auto_sync=module.auto_sync,
+        objects=objects,
+        cache_stats=stats,
+        trace_events=trace.drain(),
+    )
+
+
+def render_modules(
+    names: Iterable[str], *, jobs: int, compact_objects: bool = False
+) -> Iterator[RenderedModule]:
+    """
+    render the named cluster modules in worker processes, yielding each as it finishes
+
+    With compact_objects, each module's objects are compacted (see
+    transpire.internal.compact) before being sent back.
+    """
+
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD)
+
+    pool = ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(
+            Path.cwd(),
+            cache.is_bypassed(),
+            config.fetched_repos(),
+            trace.settings(),
+        ),
+        max_tasks_per_child=MAX_MODULES_PER_WORKER,
+    )
+    try:
+        futures: list[Future[RenderedModule]] = [
+            pool.submit(_render, name, compact_objects) for name in names
+        ]
+        for future in as_completed(futures):
+            rendered = future.result()
+            cache.add_stats(rendered.cache_stats)
+            yield rendered
+    finally:
+        pool.shutdown(cancel_futures=True)
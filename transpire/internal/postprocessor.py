@@ -1,6 +1,18 @@
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+
 from transpire.internal.config import ClusterConfig, provider_from_context
+from transpire.internal.secrets import SecretsProvider
 from transpire.manifestlike import ManifestLike
 
+__all__ = [
+    "ManifestError",
+    "Pipeline",
+    "postprocess",
+    "register_stage",
+    "register_batch_stage",
+]
+
 
 class ManifestError(Exception):
     def __init__(self, message: str, *, suggestion: ManifestLike | None) -> None:
@@ -8,13 +20,92 @@ class ManifestError(Exception):
         self.suggestion = suggestion
 
 
+# A stage transforms a single object of the (apiVersion, kind) it is registered for.
+Stage = Callable[["Pipeline", dict, str], dict]
+# A batch stage transforms every object of an app at once.
+BatchStage = Callable[["Pipeline", list[dict], str], list[dict]]
+
+_stages: dict[tuple[str, str], list[Stage]] = defaultdict(list)
+_batch_stages: list[BatchStage] = []
+
+
+def register_stage(api_version: str, kind: str) -> Callable[[Stage], Stage]:
+    """register a postprocessing stage for objects of the given apiVersion and kind"""
+
+    def decorator(fn: Stage) -> Stage:
+        _stages[(api_version, kind)].append(fn)
+        return fn
+
+    return decorator
+
+
+def register_batch_stage(fn: BatchStage) -> BatchStage:
+    """register a postprocessing stage that runs over all of an app's objects"""
+
+    _batch_stages.append(fn)
+    return fn
+
+
+class Pipeline:
+    """
+    Postprocessing for a single build.
+
+    The (apiVersion, kind) dispatch table is frozen when the pipeline is created,
+    and secrets providers are created once per namespace rather than per object.
+    """
+
+    def __init__(self, config: ClusterConfig, dev: bool = False) -> None:
+        self.config = config
+        self.dev = dev
+        self._dispatch = {key: tuple(stages) for key, stages in _stages.items()}
+        self._batch = tuple(_batch_stages)
+        self._providers: dict[str, SecretsProvider] = {}
+
+    def provider(self, namespace: str) -> SecretsProvider:
+        """the secrets provider for a namespace"""
+
+        if namespace not in self._providers:
+            self._providers[namespace] = provider_from_context(
+                namespace, dev=self.dev, config=self.config
+            )
+        return self._providers[namespace]
+
+    def process(self, obj: dict, appname: str) -> dict:
+        """run the stages registered for obj's apiVersion and kind"""
+
+        for stage in self._dispatch.get((obj["apiVersion"], obj["kind"]), ()):
+            obj = stage(self, obj, appname)
+        return obj
+
+    def process_batch(self, objs: Iterable[dict], appname: str) -> Iterable[dict]:
+        """
+        run batch stages over already processed objects
+
+        Objects are only collected into a list if a batch stage is registered.
+        """
+
+        if not self._batch:
+            return objs
+        batch = list(objs)
+        for stage in self._batch:
+            batch = stage(self, batch, appname)
+        return batch
+
+
+@register_stage("v1", "Secret")
+def convert_secret(pipeline: Pipeline, obj: dict, appname: str) -> dict:
+    return pipeline.provider(appname).convert_secret(obj)
+
+
+_pipeline: Pipeline | None = None
+
+
 def postprocess(
     config: ClusterConfig, obj: dict, appname: str, dev: bool = False
 ) -> dict:
-    """run all postprocessing steps (right now just secret processing)"""
-
-    provider = provider_from_context(appname, dev=dev, config=config)
-    if obj["apiVersion"] == "v1" and obj["kind"] == "Secret":
-        return provider.convert_secret(obj)
+    """run all per-object postprocessing steps (right now just secret processing)"""
 
-    return obj
+    global _pipeline
+    if _pipeline is None or _pipeline.config is not config or _pipeline.dev != dev:
+        _pipeline = Pipeline(config, dev=dev)
+    return _pipeline.process(obj, appname)
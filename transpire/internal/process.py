@@ -0,0 +1,56 @@
+"""
+Running the commands (helm, kubectl kustomize) that objects are rendered with.
+"""
+
+import tempfile
+from subprocess import PIPE, Popen
+from typing import Any, Iterator
+
+import yaml
+
+from transpire.internal import trace, yamlio
+
+__all__ = ["stream_yaml"]
+
+# how much of a command's remaining output is read at a time, after it's no
+# longer wanted
+_DRAIN_CHUNK = 1 << 16
+
+
+def stream_yaml(name: str, argv: list[str], args: list[str]) -> Iterator[Any]:
+    """
+    run a command, yielding YAML documents from its stdout as they arrive
+
+    name and args describe the command in traces. If the command fails, a
+    ValueError with its stderr is raised, even if its output was cut off
+    partway through a document.
+    """
+
+    # stderr goes to a file rather than a pipe, so a chatty command can't block
+    # on a full stderr pipe while we are still reading stdout
+    with trace.span(
+        name, "subprocess", argv=args
+    ) as span, tempfile.TemporaryFile() as stderr, Popen(
+        argv, stdout=PIPE, stderr=stderr
+    ) as process:
+        assert process.stdout is not None
+        try:
+            try:
+                yield from trace.busy(yamlio.load_all(process.stdout), span)
+            except yaml.YAMLError:
+                # the rest of the output is read, so the command can exit
+                # rather than block on a full pipe, and its exit code tells
+                # whether the output or the command is at fault
+                while process.stdout.read(_DRAIN_CHUNK):
+                    pass
+                if process.wait() == 0:
+                    raise
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            trace.record_process(span, process.wait(), stderr)
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise ValueError(stderr.read())
@@ -1,63 +1,227 @@
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from shutil import rmtree
-from typing import Iterable
+from typing import Container, Iterable, Iterator
 
-import yaml
 from loguru import logger
 
-from transpire.internal import argocd
+from transpire.internal import argocd, trace, yamlio
 from transpire.internal.config import ClusterConfig
-from transpire.internal.postprocessor import ManifestError, postprocess
+from transpire.internal.parallel import RenderedModule
+from transpire.internal.postprocessor import ManifestError, Pipeline
 from transpire.types import Module
 
 
+@dataclass
+class WriteStats:
+    """How write_manifests changed an app directory."""
+
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.added} added, {self.changed} changed, "
+            f"{self.removed} removed, {self.unchanged} unchanged"
+        )
+
+
+def stage_file(path: Path, data: bytes) -> Path:
+    """Write data to a hidden temporary file next to path, returning its path."""
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        f.write(data)
+    return Path(f.name)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace the file at path with data, without ever leaving it half-written."""
+    os.replace(stage_file(path, data), path)
+
+
+def manifest_filename(obj: dict, appname: str) -> str:
+    """The name of the file an app's object is written to."""
+    name = obj["metadata"].get("name", obj["metadata"].get("generateName", None))
+    namespace = obj["metadata"].get("namespace", appname)
+    return f"{name}_{obj['kind']}_{namespace}.yaml"
+
+
+def stale_files(appdir: Path, written: Container[str]) -> list[Path]:
+    """
+    The entries of an app directory that a build which wrote the files named in
+    written removes: everything else, dotfiles and subdirectories included.
+    """
+    if not appdir.is_dir():
+        return []
+    return sorted(p for p in appdir.iterdir() if p.name not in written)
+
+
+def remove_stale_files(appdir: Path, written: Container[str]) -> int:
+    """remove the stale_files of an app directory, returning how many there were"""
+    stale = stale_files(appdir, written)
+    for path in stale:
+        if path.is_dir():
+            rmtree(path)
+        else:
+            path.unlink()
+    return len(stale)
+
+
+def postprocess(
+    objects: Iterable[dict],
+    appname: str,
+    pipeline: Pipeline,
+    errors: list[str],
+    timings: dict[str, float] | None = None,
+) -> Iterator[dict]:
+    """
+    Run objects through pipeline, one at a time.
+
+    Objects that fail postprocessing are logged and skipped, and their names
+    added to errors. Time spent is added to timings["postprocess"], if given.
+    """
+
+    def postprocessed() -> Iterator[dict]:
+        for obj in objects:
+            start = time.perf_counter()
+            try:
+                obj = pipeline.process(obj, appname)
+            except ManifestError as err:
+                name = obj["metadata"].get("name", obj["metadata"].get("generateName"))
+                logger.exception(f"Error processing object: {name}")
+                if err.suggestion:
+                    logger.info("Suggested replacement:")
+                    logger.info(err.suggestion)
+                errors.append(name)
+                continue
+            finally:
+                if timings is not None:
+                    timings["postprocess"] += time.perf_counter() - start
+            yield obj
+
+    return pipeline.process_batch(postprocessed(), appname)
+
+
 def write_manifests(
-    config: ClusterConfig, objects: Iterable[dict], appname: str, manifest_dir: Path
-) -> None:
-    """Write objects to manifest_dir as YAML files."""
+    config: ClusterConfig,
+    objects: Iterable[dict],
+    appname: str,
+    manifest_dir: Path,
+    *,
+    pipeline: Pipeline | None = None,
+) -> WriteStats | None:
+    """
+    Write objects to manifest_dir as YAML files.
+
+    Objects are consumed one at a time: each is postprocessed, serialized and
+    compared with the file already on disk, and only changed objects are staged
+    into temporary files, so memory use does not grow with the number of objects.
+    Once every object has been processed, staged files are moved into place and
+    files for objects that no longer exist are removed.
+
+    Returns None (and leaves the directory untouched) if any object failed
+    postprocessing. Pass a pipeline to share postprocessing state across apps.
+    """
+    with trace.span(f"write {appname}", "write") as span:
+        stats = _write_manifests(config, objects, appname, manifest_dir, pipeline, span)
+        span["stats"] = str(stats)
+    return stats
+
+
+def _write_manifests(
+    config: ClusterConfig,
+    objects: Iterable[dict],
+    appname: str,
+    manifest_dir: Path,
+    pipeline: Pipeline | None,
+    span: dict,
+) -> WriteStats | None:
     appdir = manifest_dir / appname
-    if appdir.exists():
-        rmtree(appdir)
-    appdir.mkdir(exist_ok=True)
-
-    failed = False
-    processed_objs = {}
-
-    for obj in objects:
-        try:
-            obj = postprocess(config, obj, appname, dev=False)
-        except ManifestError as err:
-            name = obj["metadata"].get("name", obj["metadata"].get("generateName"))
-            logger.exception(f"Error processing object: {name}")
-            if err.suggestion:
-                logger.info("Suggested replacement:")
-                logger.info(err.suggestion)
-            failed = True
-            continue
-
-        name = obj["metadata"].get("name", obj["metadata"].get("generateName", None))
-        kind = obj["kind"]
-        namespace = obj["metadata"].get("namespace", appname)
-        if (
-            obj["kind"] == "SyncedSecret"
-            and (appdir / f"{name}_{kind}_{namespace}.yaml").exists()
-        ):
-            continue
-        processed_objs[f"{name}_{kind}_{namespace}.yaml"] = obj
-
-    if failed:
-        logger.error("Exceptions encountered, manifests will not be written.")
-    else:
-        for fname, obj in processed_objs.items():
-            with open(appdir / fname, "w") as f:
-                yaml.safe_dump(obj, f)
-
-
-def write_base(basedir: Path, module: Module):
+    appdir.mkdir(exist_ok=True, parents=True)
+
+    if pipeline is None:
+        pipeline = Pipeline(config)
+
+    # names of objects that failed postprocessing
+    errors: list[str] = []
+    # time spent in each stage, summed over objects (rendering the objects
+    # themselves happens in between, and is traced by the renderers)
+    timings = {"postprocess": 0.0, "serialize": 0.0, "compare": 0.0}
+
+    # file name -> staged new content, or None if the file on disk is up to date
+    staged: dict[str, Path | None] = {}
+
+    try:
+        for obj in postprocess(objects, appname, pipeline, errors, timings):
+            fname = manifest_filename(obj, appname)
+            if errors:
+                continue
+
+            previous = staged.pop(fname, None)
+            if previous is not None:
+                previous.unlink()
+
+            path = appdir / fname
+            start = time.perf_counter()
+            data = yamlio.dump(obj).encode("utf-8")
+            timings["serialize"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            try:
+                existing = hashlib.sha256(path.read_bytes()).digest()
+            except FileNotFoundError:
+                existing = None
+            if existing == hashlib.sha256(data).digest():
+                staged[fname] = None
+            else:
+                staged[fname] = stage_file(path, data)
+            timings["compare"] += time.perf_counter() - start
+
+        if errors:
+            logger.error("Exceptions encountered, manifests will not be written.")
+            return None
+
+        stats = WriteStats()
+        for fname in list(staged):
+            tmp = staged[fname]
+            if tmp is None:
+                stats.unchanged += 1
+                continue
+            path = appdir / fname
+            if path.exists():
+                stats.changed += 1
+            else:
+                stats.added += 1
+            os.replace(tmp, path)
+            staged[fname] = None
+    finally:
+        for tmp in staged.values():
+            if tmp is not None:
+                tmp.unlink(missing_ok=True)
+        span["objects"] = len(staged)
+        span.update({f"{k}_ms": v * 1000 for k, v in timings.items()})
+
+    stats.removed += remove_stale_files(appdir, staged.keys())
+
+    logger.info(f"{appname}: {stats}")
+    return stats
+
+
+def write_base(basedir: Path, module: Module | RenderedModule) -> str:
+    """write a module's Argo Application into basedir, returning its file name"""
     basedir.mkdir(exist_ok=True)
     obj = argocd.make_app(module.name, module.namespace, auto_sync=module.auto_sync)
     argo_namespace = obj["metadata"].get("namespace")
     if not argo_namespace:
         raise ValueError("Argo Application has unset namespace.")
-    with open(basedir / f"{module.name}_Application_{argo_namespace}.yaml", "w") as f:
-        yaml.safe_dump(obj, f)
+    name = f"{module.name}_Application_{argo_namespace}.yaml"
+    with open(basedir / name, "w") as f:
+        yamlio.dump(obj, f)
+    return name
@@ -1,8 +1,27 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable
 
 from transpire.manifestlike import ManifestLike
 
 
+@dataclass
+class PushSummary:
+    """The outcome of pushing a batch of secrets."""
+
+    pushed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    # skipped secrets that differ from what was pushed to the secrets store
+    drifted: int = 0
+
+    def __str__(self) -> str:
+        summary = f"{self.pushed} pushed, {self.skipped} skipped, {self.failed} failed"
+        if self.drifted:
+            summary += f", {self.drifted} drifted"
+        return summary
+
+
 class SecretsProvider(ABC):
     @abstractmethod
     def convert_secret(self, secret: ManifestLike) -> dict:
@@ -11,3 +30,13 @@ class SecretsProvider(ABC):
     @abstractmethod
     def push_secret(self, secret: ManifestLike) -> None:
         ...
+
+    def push_secrets(
+        self, secrets: Iterable[ManifestLike], *, jobs: int = 8
+    ) -> PushSummary:
+        """push several secrets, one at a time"""
+        summary = PushSummary()
+        for secret in secrets:
+            self.push_secret(secret)
+            summary.pushed += 1
+        return summary
@@ -1,16 +1,40 @@
 import base64
+import hashlib
+import hmac
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import cached_property
+from secrets import token_hex
+from typing import TYPE_CHECKING, Iterable
 
-import hvac  # type: ignore
-import hvac.exceptions  # type: ignore
+from loguru import logger
 from pydantic import BaseModel
 
-from transpire.internal.secrets import SecretsProvider
+from transpire.internal.secrets import PushSummary, SecretsProvider
 from transpire.manifestlike import ManifestLike, manifest_to_dict
 
+if TYPE_CHECKING:
+    import hvac  # type: ignore
+
+# Custom metadata key holding an HMAC of the keys and values transpire last pushed.
+# It's keyed, since metadata may be readable by those who can't read the secrets.
+HASH_METADATA_KEY = "transpire-hmac"
+# Path, in the KV store, of the secret holding the key for those HMACs.
+HASH_KEY_PATH = "transpire/hmac-key"
+
 
 class HashicorpVaultConfig(BaseModel):
     kvstore: str
+    address: str = "https://vault.ocf.berkeley.edu"
+
+
+class PushResult(str, Enum):
+    pushed = "pushed"
+    unchanged = "unchanged"
+    exists = "exists"
+    drifted = "drifted"
 
 
 def fix_base64(pairs: dict) -> dict:
@@ -37,21 +61,30 @@ def safe_get(manifest: dict, key: str) -> dict:
     return out if out else {}
 
 
+def hash_secret(pairs: dict, key: bytes) -> str:
+    """HMACs the keys and values of a secret, independent of key order."""
+    blob = json.dumps(pairs, sort_keys=True, separators=(",", ":"))
+    return hmac.new(key, blob.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
 class VaultSecret(SecretsProvider):
     def __init__(
         self, config: HashicorpVaultConfig, ns: str, dev: bool = False
     ) -> None:
         self.kvstore = config.kvstore
+        self.address = config.address
         self.dev = dev
         self.ns = ns
         # TODO: Make this toggle-offable.
         self.push = dev
 
-    def push_secret(self, secret: ManifestLike) -> None:
-        """v1/Secret -> Hashicorp Vault"""
-        secret = manifest_to_dict(secret)
-        path = f"{self.ns}/{secret['metadata']['name']}"
-        client = hvac.Client("https://vault.ocf.berkeley.edu")
+    @cached_property
+    def client(self) -> "hvac.Client":
+        """An authenticated Vault client, shared by every push through this provider."""
+        # hvac (and requests) are only imported once something talks to Vault
+        import hvac  # type: ignore
+
+        client = hvac.Client(self.address)
         client.token = os.getenv("VAULT_TOKEN")
         if not client.token:
             print(
@@ -59,17 +92,120 @@ class VaultSecret(SecretsProvider):
             )
         assert client.is_authenticated()
         client.secrets.kv.v2.configure(mount_point=self.kvstore)
+        return client
+
+    @cached_property
+    def hash_key(self) -> bytes:
+        """The key secrets are HMACed with, created the first time it's needed."""
+        import hvac.exceptions  # type: ignore
+
+        kv = self.client.secrets.kv.v2
+        for _ in range(2):
+            try:
+                response = kv.read_secret_version(
+                    path=HASH_KEY_PATH,
+                    mount_point=self.kvstore,
+                    raise_on_deleted_version=True,
+                )
+                return bytes.fromhex(response["data"]["data"]["key"])
+            except hvac.exceptions.InvalidPath:
+                pass
+            try:
+                kv.create_or_update_secret(
+                    path=HASH_KEY_PATH,
+                    secret={"key": token_hex(32)},
+                    cas=0,
+                    mount_point=self.kvstore,
+                )
+            except hvac.exceptions.InvalidRequest:
+                pass  # created by someone else in the meantime
+        raise RuntimeError(f"Couldn't read or create {HASH_KEY_PATH} in Vault")
+
+    def _push(self, secret: dict) -> PushResult:
+        import hvac.exceptions  # type: ignore
 
+        path = f"{self.ns}/{secret['metadata']['name']}"
         pairs = extract_secret(secret)
+        digest = hash_secret(pairs, self.hash_key)
+        kv = self.client.secrets.kv.v2
+
+        try:
+            metadata = kv.read_secret_metadata(path=path, mount_point=self.kvstore)
+        except hvac.exceptions.InvalidPath:
+            pass
+        else:
+            custom = metadata["data"].get("custom_metadata") or {}
+            recorded = custom.get(HASH_METADATA_KEY)
+            if recorded is None:
+                logger.info(f"'{path}' already exists in Vault, not re-creating")
+                return PushResult.exists
+            if hmac.compare_digest(recorded, digest):
+                return PushResult.unchanged
+            logger.warning(
+                f"'{path}' differs from what transpire pushed to Vault, not overwriting"
+            )
+            return PushResult.drifted
+
         try:
-            client.secrets.kv.v2.create_or_update_secret(
+            kv.create_or_update_secret(
                 path=path,
                 secret=pairs,
                 cas=0,
                 mount_point=self.kvstore,
             )
         except hvac.exceptions.InvalidRequest as e:
-            print(f"{e} -- Probably '{path}' already created, not re-creating")
+            logger.info(f"{e} -- Probably '{path}' already created, not re-creating")
+            return PushResult.exists
+        try:
+            kv.update_metadata(
+                path=path,
+                mount_point=self.kvstore,
+                custom_metadata={HASH_METADATA_KEY: digest},
+            )
+        except hvac.exceptions.VaultError as e:
+            # the secret itself was written, it just won't be recognized as
+            # unchanged next time
+            logger.warning(f"Pushed '{path}', but couldn't record its hash: {e}")
+        return PushResult.pushed
+
+    def push_secret(self, secret: ManifestLike) -> None:
+        """v1/Secret -> Hashicorp Vault"""
+        self._push(manifest_to_dict(secret))
+
+    def push_secrets(
+        self, secrets: Iterable[ManifestLike], *, jobs: int = 8
+    ) -> PushSummary:
+        """
+        v1/Secret -> Hashicorp Vault, for many secrets at once
+
+        Secrets are pushed concurrently over one client. Secrets that already
+        exist in Vault are never overwritten, and are skipped without a write;
+        those that differ from what transpire pushed are counted as drifted.
+        """
+        import hvac.exceptions  # type: ignore
+
+        self.hash_key  # authenticate once, before fanning out to threads
+
+        def push(secret: ManifestLike) -> PushResult | None:
+            secret = manifest_to_dict(secret)
+            try:
+                return self._push(secret)
+            except hvac.exceptions.VaultError as e:
+                logger.error(f"Failed to push {secret['metadata']['name']}: {e}")
+                return None
+
+        summary = PushSummary()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for result in pool.map(push, secrets):
+                if result is PushResult.pushed:
+                    summary.pushed += 1
+                elif result is PushResult.drifted:
+                    summary.drifted += 1
+                elif result is None:
+                    summary.failed += 1
+                else:
+                    summary.skipped += 1
+        return summary
 
     def convert_secret(self, secret: ManifestLike) -> dict:
         """v1/Secret -> ricoberger.de/v1alpha1/SealedSecret"""
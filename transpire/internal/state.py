@@ -0,0 +1,188 @@
+"""
+Build state: a fingerprint of each module's inputs as of its last successful
+build, kept in the output directory so that unchanged modules can be skipped.
+"""
+
+import hashlib
+import json
+import os
+import tomllib
+from dataclasses import asdict, dataclass
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+import transpire
+from transpire.internal import kustomize
+from transpire.internal.config import (
+    ClusterConfig,
+    GitModuleConfig,
+    LocalModuleConfig,
+    ModuleConfig,
+)
+
+__all__ = ["STATE_FILE", "ModuleState", "BuildState", "fingerprint"]
+
+STATE_FILE = ".transpire-state.json"
+
+# Bump whenever what goes into a fingerprint changes.
+STATE_VERSION = 2
+
+
+@dataclass
+class ModuleState:
+    """What a skipped module still needs to have its Argo Application written."""
+
+    fingerprint: str
+    namespace: str
+    auto_sync: bool
+
+
+class BuildState:
+    """The state file of an output directory."""
+
+    def __init__(self, path: Path, modules: dict[str, ModuleState]) -> None:
+        self.path = path
+        self.modules = modules
+
+    @classmethod
+    def load(cls, out_path: Path) -> "BuildState":
+        path = out_path / STATE_FILE
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return cls(path, {})
+        except ValueError:
+            logger.warning(f"Ignoring unreadable build state in {path}")
+            return cls(path, {})
+        if state.get("version") != STATE_VERSION:
+            return cls(path, {})
+        return cls(
+            path,
+            {name: ModuleState(**m) for name, m in state.get("modules", {}).items()},
+        )
+
+    def is_current(self, name: str, fingerprint: str) -> bool:
+        """whether the module was last built from exactly these inputs"""
+        state = self.modules.get(name)
+        return (
+            state is not None
+            and state.fingerprint == fingerprint
+            and (self.path.parent / name).is_dir()
+        )
+
+    def record(self, name: str, state: ModuleState) -> None:
+        self.modules[name] = state
+
+    def forget(self, name: str) -> None:
+        self.modules.pop(name, None)
+
+    def save(self) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "version": STATE_VERSION,
+                    "modules": {
+                        name: asdict(m) for name, m in sorted(self.modules.items())
+                    },
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp, self.path)
+
+
+def _hash_tree(h: "hashlib._Hash", root: Path, files: list[Path] | None = None) -> None:
+    if files is None:
+        files = sorted(
+            Path(dirpath, filename).relative_to(root)
+            for dirpath, dirnames, filenames in os.walk(root)
+            for filename in filenames
+            if not any(
+                part.startswith(".git") or part == "__pycache__"
+                for part in Path(dirpath).relative_to(root).parts
+            )
+        )
+    for rel in files:
+        path = root / rel
+        if path.is_file():
+            h.update(f"{rel}\0{path.stat().st_size}\0".encode())
+            h.update(path.read_bytes())
+
+
+@cache
+def _sources_digest(root: Path) -> str:
+    """
+    a digest of the Python sources of a package, so that builds are redone when
+    transpire changes, even in an editable install or an uninstalled checkout
+    (where the package version doesn't change, or isn't there at all)
+    """
+    h = hashlib.sha256()
+    _hash_tree(
+        h,
+        root,
+        sorted(p.relative_to(root) for p in root.rglob("*.py")),
+    )
+    return h.hexdigest()
+
+
+def _module_dir(module: ModuleConfig) -> Path:
+    if isinstance(module, GitModuleConfig):
+        checkout, _ = module.get_cached_repo()
+        return checkout / module.resolved_dir
+    assert isinstance(module, LocalModuleConfig)
+    return module.path.parent
+
+
+def _remote_inputs(module_dir: Path) -> list[Any]:
+    """
+    the inputs named in a module's versions.toml that can change without it
+
+    Charts are pinned by version, and the chart store never replaces a chart it
+    already has, so only kustomizations that are revalidated against their
+    remote can move underneath an unchanged versions.toml.
+    """
+
+    try:
+        versions = tomllib.loads((module_dir / "versions.toml").read_text())
+    except FileNotFoundError:
+        return []
+
+    return [
+        [name, kustomize.resolve_ref(v["repo_url"], v["version"])]
+        for name, v in sorted(versions.items())
+        if isinstance(v, dict) and "repo_url" in v and v.get("revalidate")
+    ]
+
+
+def fingerprint(config: ClusterConfig, name: str, module: ModuleConfig) -> str:
+    """
+    a digest of everything a module's build depends on
+
+    That is the module's source (its git commit, or the contents of its
+    directory, including versions.toml), the remote kustomizations it tracks,
+    the cluster configuration and transpire's own source. Anything else a module
+    reads (e.g. files elsewhere in the cluster repository) is not covered.
+    """
+
+    h = hashlib.sha256()
+    h.update(f"{STATE_VERSION}\0{name}\0".encode())
+    h.update(_sources_digest(Path(transpire.__file__).parent).encode() + b"\0")
+    h.update(config.model_dump_json().encode() + b"\0")
+
+    module_dir = _module_dir(module)
+    if isinstance(module, GitModuleConfig):
+        _, commit = module.get_cached_repo()
+        h.update(f"{module.git}\0{commit}\0{module.resolved_dir}\0".encode())
+    elif module_dir.resolve() == Path.cwd().resolve():
+        # a module at the root of the cluster repository
+        _hash_tree(h, module_dir, [Path(module.path.name), Path("versions.toml")])
+    else:
+        _hash_tree(h, module_dir)
+
+    h.update(json.dumps(_remote_inputs(module_dir)).encode())
+    return h.hexdigest()
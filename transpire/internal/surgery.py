@@ -1,6 +1,18 @@
-from typing import Any, Callable, Iterable, Optional, cast
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Iterable, Mapping, Optional, cast
 
-__all__ = ["delve", "shelve", "edit_manifests", "make_edit_manifest"]
+__all__ = [
+    "delve",
+    "shelve",
+    "edit_manifests",
+    "make_edit_manifest",
+    "Selector",
+    "ManifestIndex",
+    "select_manifests",
+]
 
 RESOURCE_APIS = {
     "Deployment": "apps/v1",
@@ -54,12 +66,228 @@ def shelve(
     return obj
 
 
+_WILDCARD = re.compile(r"[*?[]")
+_LABEL_KEY = r"[A-Za-z0-9][-A-Za-z0-9_./]*"
+_LABEL_VALUE = r"[-A-Za-z0-9_.]*"
+_SET_REQUIREMENT = re.compile(rf"^({_LABEL_KEY})\s+(in|notin)\s+\((.*)\)$")
+_EQ_REQUIREMENT = re.compile(rf"^({_LABEL_KEY})\s*(==|=|!=)\s*({_LABEL_VALUE})$")
+_EXISTS_REQUIREMENT = re.compile(rf"^(!?)\s*({_LABEL_KEY})$")
+
+
+def parse_label_selector(selector: str) -> list[tuple[str, str, frozenset[str]]]:
+    """
+    Parse a Kubernetes label selector (e.g. "app=foo,tier in (web,api),!canary")
+    into (key, operator, values) requirements, where operator is one of "in",
+    "notin", "exists" or "!exists".
+    """
+    requirements = []
+    for part in re.split(r",(?![^(]*\))", selector):
+        part = part.strip()
+        if not part:
+            continue
+        if match := _SET_REQUIREMENT.match(part):
+            key, op, values = match.groups()
+            requirements.append(
+                (key, op, frozenset(v.strip() for v in values.split(",")))
+            )
+        elif match := _EQ_REQUIREMENT.match(part):
+            key, op, value = match.groups()
+            requirements.append(
+                (key, "notin" if op == "!=" else "in", frozenset([value]))
+            )
+        elif match := _EXISTS_REQUIREMENT.match(part):
+            negated, key = match.groups()
+            requirements.append((key, "!exists" if negated else "exists", frozenset()))
+        else:
+            raise ValueError(f"invalid label selector requirement: {part!r}")
+    return requirements
+
+
+@dataclass(frozen=True, kw_only=True)
+class Selector:
+    """
+    Matches manifests by any combination of apiVersion, kind, name, namespace and
+    labels. kind and name may be shell-style wildcards (e.g. "*-config"), and
+    labels may be a dict of exact matches or a label selector string.
+    """
+
+    api_version: str | None = None
+    kind: str | None = None
+    name: str | None = None
+    namespace: str | None = None
+    labels: str | Mapping[str, str] | None = None
+    _requirements: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.labels, Mapping):
+            labels = ",".join(f"{k}={v}" for k, v in sorted(self.labels.items()))
+            object.__setattr__(self, "labels", labels)
+        requirements = parse_label_selector(self.labels) if self.labels else []
+        object.__setattr__(self, "_requirements", tuple(requirements))
+
+    def matches(self, m: dict) -> bool:
+        """whether a single manifest matches this selector, without an index"""
+        metadata = m.get("metadata") or {}
+        labels = metadata.get("labels") or {}
+        return (
+            (self.api_version is None or m.get("apiVersion") == self.api_version)
+            and (self.kind is None or fnmatchcase(m.get("kind", ""), self.kind))
+            and (self.name is None or fnmatchcase(metadata.get("name", ""), self.name))
+            and (self.namespace is None or metadata.get("namespace") == self.namespace)
+            and all(_label_matches(labels, *r) for r in self._requirements)
+        )
+
+
+def _label_matches(labels: dict, key: str, op: str, values: frozenset[str]) -> bool:
+    match op:
+        case "in":
+            return key in labels and labels[key] in values
+        case "notin":
+            return key not in labels or labels[key] not in values
+        case "exists":
+            return key in labels
+        case _:
+            return key not in labels
+
+
+class ManifestIndex:
+    """
+    Manifests indexed by apiVersion/kind, namespace, name and labels, so that the
+    manifests matching a Selector can be found without scanning all of them.
+    """
+
+    def __init__(self, manifests: Iterable[dict]) -> None:
+        self.manifests = list(manifests)
+        self._by_kind: dict[str, set[int]] = defaultdict(set)
+        self._by_api_version: dict[str, set[int]] = defaultdict(set)
+        self._by_name: dict[str, set[int]] = defaultdict(set)
+        self._by_namespace: dict[str, set[int]] = defaultdict(set)
+        self._by_label: dict[tuple[str, str], set[int]] = defaultdict(set)
+        self._by_label_key: dict[str, set[int]] = defaultdict(set)
+
+        for i, m in enumerate(self.manifests):
+            metadata = m.get("metadata") or {}
+            self._by_kind[m.get("kind", "")].add(i)
+            self._by_api_version[m.get("apiVersion", "")].add(i)
+            self._by_name[metadata.get("name", "")].add(i)
+            if "namespace" in metadata:
+                self._by_namespace[metadata["namespace"]].add(i)
+            for k, v in (metadata.get("labels") or {}).items():
+                self._by_label[(k, v)].add(i)
+                self._by_label_key[k].add(i)
+
+    def _candidates(self, selector: Selector) -> set[int] | None:
+        """positions narrowed down by the exact parts of a selector, or None"""
+        sets = []
+        if selector.api_version is not None:
+            sets.append(self._by_api_version.get(selector.api_version, set()))
+        if selector.kind is not None and not _WILDCARD.search(selector.kind):
+            sets.append(self._by_kind.get(selector.kind, set()))
+        if selector.name is not None and not _WILDCARD.search(selector.name):
+            sets.append(self._by_name.get(selector.name, set()))
+        if selector.namespace is not None:
+            sets.append(self._by_namespace.get(selector.namespace, set()))
+        for key, op, values in selector._requirements:
+            if op == "in":
+                sets.append(
+                    set().union(*(self._by_label.get((key, v), ()) for v in values))
+                )
+            elif op == "exists":
+                sets.append(self._by_label_key.get(key, set()))
+
+        if selector.kind is not None and _WILDCARD.search(selector.kind):
+            sets.append(
+                set().union(
+                    *(
+                        p
+                        for k, p in self._by_kind.items()
+                        if fnmatchcase(k, selector.kind)
+                    )
+                )
+            )
+
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def select(self, selector: Selector) -> list[int]:
+        """the positions of all manifests matching selector, in order"""
+        candidates = self._candidates(selector)
+        positions = (
+            range(len(self.manifests)) if candidates is None else sorted(candidates)
+        )
+        return [i for i in positions if selector.matches(self.manifests[i])]
+
+
+def select_manifests(selector: Selector, manifests: Iterable[dict]) -> list[dict]:
+    """return the manifests matching selector"""
+    index = ManifestIndex(manifests)
+    return [index.manifests[i] for i in index.select(selector)]
+
+
+def _edit_selected(
+    edits: Mapping[Selector, Callable[[dict], dict | None]],
+    manifests: Iterable[dict],
+) -> list[dict]:
+    index = ManifestIndex(manifests)
+    funcs: dict[int, list[Callable[[dict], dict | None]]] = defaultdict(list)
+    unseen = []
+    for selector, func in edits.items():
+        matched = index.select(selector)
+        if not matched:
+            unseen.append(selector)
+        for i in matched:
+            funcs[i].append(func)
+    if unseen:
+        raise RuntimeError(f"Some edits were not applied: {repr(unseen)}")
+
+    result = []
+    for i, m in enumerate(index.manifests):
+        edited: dict | None = m
+        for func in funcs.get(i, ()):
+            edited = func(edited)
+            if edited is None:
+                break
+        if edited is not None:
+            result.append(edited)
+    return result
+
+
 def edit_manifests(
-    edits: dict[
-        tuple[str, str] | tuple[tuple[str, str], str], Callable[[dict], dict | None]
+    edits: Mapping[
+        tuple[str, str] | tuple[tuple[str, str], str] | Selector,
+        Callable[[dict], dict | None],
     ],
     manifests: Iterable[dict],
 ) -> list[dict]:
+    """
+    Apply each edit to the manifests it targets, dropping manifests for which an
+    edit returns None. Edits are keyed by (kind, name), ((apiVersion, kind), name),
+    or a Selector, which can target many manifests at once. Raises RuntimeError if
+    an edit matched no manifest.
+    """
+    if any(isinstance(k, Selector) for k in edits):
+        return _edit_selected(
+            {
+                (
+                    k
+                    if isinstance(k, Selector)
+                    else Selector(
+                        api_version=(
+                            k[0][0]
+                            if isinstance(k[0], tuple)
+                            else RESOURCE_APIS.get(k[0])
+                        ),
+                        kind=k[0] if isinstance(k[0], str) else k[0][1],
+                        name=k[1],
+                    )
+                ): v
+                for k, v in edits.items()
+            },
+            manifests,
+        )
+
     resolved_edits: dict[tuple[str | None, str, str], Callable[[dict], dict | None]] = {
         (
             k[0][0]
@@ -69,6 +297,7 @@ def edit_manifests(
             k[1],
         ): v
         for k, v in edits.items()
+        if not isinstance(k, Selector)
     }
     unseen = set(resolved_edits.keys())
 
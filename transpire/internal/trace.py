@@ -0,0 +1,185 @@
+"""
+Build tracing.
+
+Spans are recorded in memory while tracing is enabled and written out as Chrome
+trace-event JSON, which can be opened in Perfetto (ui.perfetto.dev) or
+chrome://tracing. Worker processes record their own spans and hand them back to
+the parent with `drain`, to be merged in with `extend`.
+
+Tracing is off by default, and `span` costs next to nothing while it is.
+"""
+
+import cProfile
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, TypeVar
+
+__all__ = [
+    "configure",
+    "settings",
+    "is_enabled",
+    "span",
+    "busy",
+    "record_process",
+    "profiled",
+    "drain",
+    "extend",
+    "write",
+]
+
+T = TypeVar("T")
+
+# How much of a subprocess's stderr is kept on its span.
+MAX_STDERR = 8192
+
+_enabled = False
+_profile_dir: Path | None = None
+_events: list[dict] = []
+
+
+def configure(*, enabled: bool, profile_dir: Path | None = None) -> None:
+    """turn span recording and per-module profiling on or off"""
+    global _enabled, _profile_dir
+    _enabled = enabled
+    _profile_dir = profile_dir
+    if profile_dir is not None:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+
+def settings() -> tuple[bool, Path | None]:
+    """the arguments to `configure` that reproduce this process's settings"""
+    return _enabled, _profile_dir
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _now_us() -> float:
+    # monotonic_ns is system-wide, so timestamps from workers line up
+    return time.monotonic_ns() / 1000
+
+
+@contextmanager
+def span(name: str, cat: str, **args: Any) -> Iterator[dict[str, Any]]:
+    """
+    record the enclosed block as a span
+
+    Yields the span's args, which the block can add to. If the block raises, the
+    exception is recorded in the args as "error".
+    """
+    if not _enabled:
+        yield {}
+        return
+
+    start = _now_us()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = repr(e)
+        raise
+    finally:
+        _events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": _now_us() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": args,
+            }
+        )
+
+
+def busy(it: Iterable[T], args: dict[str, Any]) -> Iterator[T]:
+    """
+    iterate over it, adding the time spent producing items to args["busy_ms"]
+
+    Spans around a streamed render also cover the time its consumer spends on
+    each item; busy_ms is the part spent in the render itself.
+    """
+    if not _enabled:
+        yield from it
+        return
+
+    args.setdefault("busy_ms", 0.0)
+    iterator = iter(it)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            args["busy_ms"] += (time.perf_counter() - start) * 1000
+        yield item
+
+
+def record_process(
+    args: dict[str, Any], returncode: int, stderr: bytes | IO[bytes]
+) -> None:
+    """add a finished subprocess's exit code and (the end of) its stderr to args"""
+    if not _enabled:
+        return
+
+    if not isinstance(stderr, bytes):
+        stderr.seek(0)
+        stderr = stderr.read()
+    args["exit_code"] = returncode
+    if stderr:
+        args["stderr"] = stderr[-MAX_STDERR:].decode("utf-8", errors="replace")
+
+
+@contextmanager
+def profiled(name: str) -> Iterator[None]:
+    """profile the enclosed block into <profile dir>/<name>.prof, if profiling"""
+    if _profile_dir is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(_profile_dir / f"{name}.prof")
+
+
+def drain() -> list[dict]:
+    """remove and return the spans recorded so far"""
+    events = _events[:]
+    del _events[: len(events)]
+    return events
+
+
+def extend(events: Iterable[dict]) -> None:
+    """add spans recorded by another process"""
+    _events.extend(events)
+
+
+def write(path: Path) -> None:
+    """write the recorded spans to path as Chrome trace-event JSON"""
+    main = os.getpid()
+    metadata = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "transpire" if pid == main else f"worker {pid}"},
+        }
+        for pid in sorted({e["pid"] for e in _events})
+    ]
+    with open(path, "w") as f:
+        json.dump(
+            {"traceEvents": [*metadata, *_events], "displayTimeUnit": "ms"},
+            f,
+            default=str,
+        )
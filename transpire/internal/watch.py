@@ -0,0 +1,195 @@
+"""
+Watch mode: re-render modules whenever their files change.
+
+A module's files are its `.transpire.py` and `versions.toml`, plus every file
+under the cluster repository that was opened for reading while it rendered
+(found with an audit hook, so helpers imported by the module and data files it
+reads are picked up without having to be declared). Files are polled by mtime,
+which needs no extra dependencies and is cheap at the scale of a module.
+"""
+
+import os
+import sys
+import threading
+import time
+import tomllib
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+from transpire.internal.config import (
+    ClusterConfig,
+    LocalModuleConfig,
+    forget_loaded_modules,
+)
+
+__all__ = ["recording_reads", "Watcher"]
+
+_local = threading.local()
+_hook_installed = False
+
+
+def _audit(event: str, args: tuple) -> None:
+    if event != "open":
+        return
+    reads: set[str] | None = getattr(_local, "reads", None)
+    if reads is None:
+        return
+    path, mode = args[0], args[1]
+    if isinstance(path, (str, bytes, os.PathLike)) and not (
+        isinstance(mode, str) and any(c in mode for c in "wax+")
+    ):
+        reads.add(os.path.abspath(os.fsdecode(path)))
+
+
+@contextmanager
+def recording_reads() -> Iterator[set[str]]:
+    """collect the absolute paths of files opened for reading by this thread"""
+    global _hook_installed
+    if not _hook_installed:
+        # audit hooks can't be removed, so one is installed for the life of the
+        # process and does nothing while nothing is being recorded
+        sys.addaudithook(_audit)
+        _hook_installed = True
+
+    previous = getattr(_local, "reads", None)
+    _local.reads = reads = set()
+    try:
+        yield reads
+    finally:
+        _local.reads = previous
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class Watcher:
+    """
+    Renders a set of local modules, then re-renders each whenever its files change.
+
+    render is called with the current cluster config and a module name to render
+    (and write out) that module; anything it raises is logged, and the module is
+    rendered again on its next change.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        names: Iterable[str],
+        render: Callable[[ClusterConfig, str], None],
+        *,
+        exclude: Iterable[Path] = (),
+    ) -> None:
+        # cluster.toml may be in a parent of root, which module paths are
+        # relative to
+        self.cluster_toml = ClusterConfig.find_toml(root.resolve())
+        self.root = self.cluster_toml.parent
+        self.names = list(names)
+        self.render = render
+        self.exclude = [p.resolve() for p in exclude]
+        self.config = ClusterConfig.from_cwd(self.root)
+        # module name -> watched file -> mtime when it was last rendered
+        self.files: dict[str, dict[Path, int | None]] = {}
+        self.cluster_mtime = _mtime(self.cluster_toml)
+
+    def _is_watched(self, path: Path) -> bool:
+        return path.is_relative_to(self.root) and not any(
+            path.is_relative_to(e) for e in self.exclude
+        )
+
+    def _module_files(self, name: str) -> set[Path]:
+        module = self.config.modules[name]
+        assert isinstance(module, LocalModuleConfig)
+        path = (self.root / module.path).resolve()
+        return {path, path.parent / "versions.toml"}
+
+    def _forget_imports(self, changed: set[Path]) -> None:
+        # helpers imported by a module would otherwise be reused from
+        # sys.modules, rather than re-executed with their changes (and so would
+        # the modules that imported them)
+        if changed:
+            forget_loaded_modules()
+        for key, module in list(sys.modules.items()):
+            file = getattr(module, "__file__", None)
+            if file is not None and Path(file).resolve() in changed:
+                del sys.modules[key]
+
+    def render_module(self, name: str) -> bool:
+        """render a module and note the files it read, returning whether it worked"""
+        start = time.perf_counter()
+        with recording_reads() as reads:
+            try:
+                self.render(self.config, name)
+                ok = True
+            except Exception:
+                logger.exception(f"Failed to render {name}")
+                ok = False
+
+        files = self._module_files(name)
+        files.update(p for p in map(Path, reads) if self._is_watched(p))
+        self.files[name] = {p: _mtime(p) for p in files}
+        if ok:
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"Rendered {name} in {elapsed:.0f}ms")
+        return ok
+
+    def changed(self) -> list[str]:
+        """the modules with files that changed since they were last rendered"""
+        changed_files = set()
+        modules = []
+        for name in self.names:
+            if name not in self.config.modules:
+                continue
+            files = {
+                p for p, mtime in self.files.get(name, {}).items() if _mtime(p) != mtime
+            }
+            if files or name not in self.files:
+                modules.append(name)
+                changed_files |= files
+        self._forget_imports(changed_files)
+        return modules
+
+    def _reload_config(self) -> bool:
+        mtime = _mtime(self.cluster_toml)
+        if mtime == self.cluster_mtime:
+            return False
+        self.cluster_mtime = mtime
+        try:
+            config = ClusterConfig.model_validate(
+                tomllib.loads(self.cluster_toml.read_text())
+            )
+            # from_cwd only ever reads cluster.toml once, and modules (or their
+            # secrets providers) may look the config up through it
+            ClusterConfig._from_dir.cache_clear()
+            self.config = config
+        except Exception:
+            logger.exception("Failed to reload cluster.toml")
+            return False
+        return True
+
+    def poll(self) -> list[str]:
+        """re-render every module that changed, returning their names"""
+        if self._reload_config():
+            logger.info("cluster.toml changed, rendering every module")
+            self.files.clear()
+        names = self.changed()
+        for name in names:
+            self.render_module(name)
+        return names
+
+    def run(self, interval: float) -> None:
+        """render every module, then poll for changes until interrupted"""
+        self.poll()
+        logger.info(f"Watching {len(self.names)} modules, press Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass
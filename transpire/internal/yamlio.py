@@ -0,0 +1,84 @@
+from typing import IO, Any, Iterable, Iterator
+
+import yaml
+
+from transpire.internal.compact import CompactDict, CompactList, FrozenDict, FrozenList
+
+# Use the libyaml bindings when PyYAML was built with them; they are several times
+# faster than the pure-Python implementation on large charts.
+try:
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeDumper as _SafeDumper  # type: ignore
+    from yaml import SafeLoader as _SafeLoader  # type: ignore
+
+__all__ = ["Loader", "Dumper", "load", "load_all", "dump", "dump_all"]
+
+
+class Loader(_SafeLoader):
+    """A safe YAML loader that also understands the `=` (value) tag."""
+
+
+# save our souls
+# <https://github.com/prometheus-community/helm-charts/pull/2238>
+# <https://github.com/prometheus-operator/prometheus-operator/pull/4897>
+# <https://github.com/yaml/pyyaml/issues/89>
+# <https://github.com/allenporter/k8s-gitops/commit/304c64c57926d2747328c0803c246be7dd827fdd>
+Loader.add_constructor("tag:yaml.org,2002:value", Loader.construct_yaml_str)
+
+
+class Dumper(_SafeDumper):
+    """A safe YAML dumper."""
+
+    # Types whose instances may be shared within a document, which are written
+    # out in full wherever they appear rather than as anchors and aliases.
+    unaliased_types: tuple[type, ...] = (
+        FrozenDict,
+        FrozenList,
+        CompactDict,
+        CompactList,
+    )
+
+    def ignore_aliases(self, data: Any) -> bool:
+        return isinstance(data, self.unaliased_types) or super().ignore_aliases(data)
+
+
+def _represent_compact_dict(dumper: Dumper, data: dict) -> Any:
+    # read the children without thawing them
+    items = list(dict.items(data))
+    if dumper.sort_keys:
+        items.sort(key=lambda kv: kv[0])
+    return dumper.represent_mapping("tag:yaml.org,2002:map", items)
+
+
+def _represent_compact_list(dumper: Dumper, data: list) -> Any:
+    return dumper.represent_sequence("tag:yaml.org,2002:seq", list(list.__iter__(data)))
+
+
+# compact manifests (see transpire.internal.compact) are written out like the
+# plain dicts and lists they stand in for
+Dumper.add_representer(FrozenDict, _represent_compact_dict)
+Dumper.add_representer(CompactDict, _represent_compact_dict)
+Dumper.add_representer(FrozenList, _represent_compact_list)
+Dumper.add_representer(CompactList, _represent_compact_list)
+
+
+def load(stream: bytes | str | IO) -> Any:
+    """parse the first YAML document in a stream"""
+    return yaml.load(stream, Loader=Loader)
+
+
+def load_all(stream: bytes | str | IO) -> Iterator[Any]:
+    """parse every YAML document in a stream"""
+    return yaml.load_all(stream, Loader=Loader)
+
+
+def dump(data: Any, stream: IO | None = None) -> Any:
+    """serialize an object to YAML, returning it as a str if stream is None"""
+    return yaml.dump(data, stream, Dumper=Dumper)
+
+
+def dump_all(documents: Iterable[Any], stream: IO | None = None) -> Any:
+    """serialize a sequence of objects to YAML, returning it as a str if stream is None"""
+    return yaml.dump_all(documents, stream, Dumper=Dumper)
@@ -1,6 +1,11 @@
 from transpire.internal.kustomize import (
     build_kustomization,
     build_kustomization_from_versions,
+    iter_kustomization,
 )
 
-__all__ = ["build_kustomization_from_versions", "build_kustomization"]
+__all__ = [
+    "build_kustomization_from_versions",
+    "build_kustomization",
+    "iter_kustomization",
+]
@@ -1,6 +1,5 @@
-from typing import Iterable, Protocol
-
-from kubernetes import client
+import datetime
+from typing import Any, Iterable, Protocol
 
 
 class OpenAPIObject(Protocol):
@@ -12,15 +11,64 @@ class OpenAPIObject(Protocol):
 
 # Something that is possibly a Kubernetes manifest. No validation is performed.
 ManifestLike = dict | OpenAPIObject
-_api_client = client.ApiClient()
+
+_PRIMITIVE_TYPES = (float, bool, bytes, str, int)
+_EXACT_PRIMITIVE_TYPES = frozenset(_PRIMITIVE_TYPES)
+
+# (attribute, private attribute, JSON key) for each field of an OpenAPI model
+# class, built the first time an instance of the class is serialized.
+_field_tables: dict[type, tuple[tuple[str, str, str], ...]] = {}
+
+
+def _field_table(obj: OpenAPIObject) -> tuple[tuple[str, str, str], ...]:
+    cls = type(obj)
+    table = _field_tables.get(cls)
+    if table is None:
+        table = tuple(
+            (attr, f"_{attr}", obj.attribute_map[attr]) for attr in obj.openapi_types
+        )
+        _field_tables[cls] = table
+    return table
+
+
+def _sanitize(obj: Any) -> Any:
+    """
+    Equivalent to `ApiClient.sanitize_for_serialization`, without per-object
+    reflection over `openapi_types` and `attribute_map`.
+    """
+    if obj is None or isinstance(obj, _PRIMITIVE_TYPES):
+        return obj
+    if isinstance(obj, list):
+        return [o if type(o) in _EXACT_PRIMITIVE_TYPES else _sanitize(o) for o in obj]
+    if isinstance(obj, dict):
+        return {
+            k: v if type(v) in _EXACT_PRIMITIVE_TYPES else _sanitize(v)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, tuple):
+        return tuple(_sanitize(o) for o in obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+
+    # Generated models keep each field in a private attribute behind a property,
+    # read it directly when it's there.
+    values = vars(obj)
+    out = {}
+    for attr, private, key in _field_table(obj):
+        value = values[private] if private in values else getattr(obj, attr)
+        if value is not None:
+            out[key] = (
+                value if type(value) in _EXACT_PRIMITIVE_TYPES else _sanitize(value)
+            )
+    return out
 
 
 def manifest_to_dict(obj: ManifestLike) -> dict:
     try:
-        sanitized = _api_client.sanitize_for_serialization(obj)
+        sanitized = _sanitize(obj)
         assert isinstance(sanitized, dict)
         return sanitized
-    except AttributeError:
+    except (AttributeError, TypeError):
         pass
     raise TypeError(f"unsupported manifest type: {type(obj)}")
 
@@ -2,6 +2,7 @@ from pathlib import Path
 
 from kubernetes import client
 
+from transpire.resources import models
 from transpire.resources.base import Resource
 
 
@@ -12,10 +13,12 @@ class ConfigMap(Resource[client.V1ConfigMap]):
         *,
         data: dict[str, str],
     ):
-        self.obj = client.V1ConfigMap(
+        self.obj = models.build(
+            models.V1ConfigMap,
             api_version="v1",
             kind="ConfigMap",
-            metadata=client.V1ObjectMeta(
+            metadata=models.build(
+                models.V1ObjectMeta,
                 name=name,
             ),
             data=data,
@@ -2,6 +2,7 @@ from typing import List, Union
 
 from kubernetes import client
 
+from transpire.resources import models
 from transpire.resources.base import Resource
 from transpire.resources.podspec import PodSpec
 
@@ -17,30 +18,39 @@ class Deployment(Resource[client.V1Deployment]):
         *,
         args: List[str] | None = None,
     ):
-        self.obj = client.V1Deployment(
+        self.obj = models.build(
+            models.V1Deployment,
             api_version="apps/v1",
             kind="Deployment",
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1DeploymentSpec(
+            metadata=models.build(models.V1ObjectMeta, name=name),
+            spec=models.build(
+                models.V1DeploymentSpec,
                 replicas=1,
-                selector=client.V1LabelSelector(
-                    match_labels={self.SELECTOR_LABEL: name}
+                selector=models.build(
+                    models.V1LabelSelector, match_labels={self.SELECTOR_LABEL: name}
                 ),
-                template=client.V1PodTemplateSpec(
-                    metadata=client.V1ObjectMeta(labels={self.SELECTOR_LABEL: name}),
-                    spec=client.V1PodSpec(
+                template=models.build(
+                    models.V1PodTemplateSpec,
+                    metadata=models.build(
+                        models.V1ObjectMeta, labels={self.SELECTOR_LABEL: name}
+                    ),
+                    spec=models.build(
+                        models.V1PodSpec,
                         containers=[
-                            client.V1Container(
+                            models.build(
+                                models.V1Container,
                                 name="main",
                                 image=image,
                                 image_pull_policy="IfNotPresent",
                                 args=args,
                                 ports=[
-                                    client.V1ContainerPort(container_port=x)
+                                    models.build(
+                                        models.V1ContainerPort, container_port=x
+                                    )
                                     for x in ports
                                 ],
                             )
-                        ]
+                        ],
                     ),
                 ),
             ),
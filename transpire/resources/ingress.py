@@ -5,6 +5,7 @@ from typing import Optional, Union
 from kubernetes import client
 
 from transpire.internal.context import get_global_context
+from transpire.resources import models
 from transpire.resources.base import Resource
 
 from .service import Service
@@ -32,10 +33,12 @@ class Ingress(Resource[client.V1Ingress]):
         path_prefix: str = "/",
     ):
         ctx = get_global_context()
-        self.obj = client.V1Ingress(
+        self.obj = models.build(
+            models.V1Ingress,
             api_version="networking.k8s.io/v1",
             kind="Ingress",
-            metadata=client.V1ObjectMeta(
+            metadata=models.build(
+                models.V1ObjectMeta,
                 name=ingress_name if ingress_name else service_name,
                 annotations={
                     "cert-manager.io/cluster-issuer": ctx.defaults.certManagerIssuer,
@@ -45,31 +48,39 @@ class Ingress(Resource[client.V1Ingress]):
                     "projectcontour.io/websocket-routes": path_prefix,
                 },
             ),
-            spec=client.V1IngressSpec(
+            spec=models.build(
+                models.V1IngressSpec,
                 ingress_class_name=ctx.defaults.ingressClass,
                 rules=[
-                    client.V1IngressRule(
+                    models.build(
+                        models.V1IngressRule,
                         host=host,
-                        http=client.V1HTTPIngressRuleValue(
+                        http=models.build(
+                            models.V1HTTPIngressRuleValue,
                             paths=[
-                                client.V1HTTPIngressPath(
+                                models.build(
+                                    models.V1HTTPIngressPath,
                                     path=path_prefix,
                                     path_type="Prefix",
-                                    backend=client.V1IngressBackend(
-                                        service=client.V1IngressServiceBackend(
-                                            port=client.V1ServiceBackendPort(
+                                    backend=models.build(
+                                        models.V1IngressBackend,
+                                        service=models.build(
+                                            models.V1IngressServiceBackend,
+                                            port=models.build(
+                                                models.V1ServiceBackendPort,
                                                 number=service_port,
                                             ),
                                             name=service_name,
-                                        )
+                                        ),
                                     ),
                                 )
-                            ]
+                            ],
                         ),
                     )
                 ],
                 tls=[
-                    client.V1IngressTLS(
+                    models.build(
+                        models.V1IngressTLS,
                         hosts=[host],
                         secret_name=f"{service_name}-tls",
                     )
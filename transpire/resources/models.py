@@ -0,0 +1,32 @@
+"""
+Kubernetes client models, and a client Configuration for them to share.
+
+Every generated model builds its own `Configuration()` (loggers and all) unless
+one is passed in, and then validates each field against it. Resources are built
+from known-good arguments and are validated by the API server anyway, so the
+resources transpire builds construct models with `models.build`, which shares
+a single Configuration with client-side validation turned off.
+
+`models.V1Pod` is `kubernetes.client.V1Pod` itself, so it works with
+isinstance, subclassing and annotations.
+"""
+
+from typing import Any, TypeVar
+
+from kubernetes import client
+
+_configuration = client.Configuration()
+_configuration.client_side_validation = False
+
+_M = TypeVar("_M")
+
+
+def build(model: type[_M], **kwargs: Any) -> _M:
+    """construct a model, sharing the unvalidated Configuration"""
+    return model(local_vars_configuration=_configuration, **kwargs)  # type: ignore
+
+
+def __getattr__(name: str) -> Any:
+    if not name.startswith("V"):
+        raise AttributeError(name)
+    return getattr(client, name)
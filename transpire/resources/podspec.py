@@ -2,6 +2,8 @@ from typing import Self
 
 from kubernetes import client
 
+from transpire.resources import models
+
 
 # This isn't a resource that can be instantiated directly, it's just a thin wrapper.
 class PodSpec:
@@ -25,7 +27,8 @@ class PodSpec:
     ) -> Self:
         container = self._init_env(container_name=container_name)
         container.env.extend(
-            client.V1EnvVar(
+            models.build(
+                models.V1EnvVar,
                 name=envvar_name,
                 value=envvar_value,
             )
@@ -43,21 +46,26 @@ class PodSpec:
         container = self._init_env(container_name=container_name)
         if mapping is None:
             container.env_from.append(
-                client.V1EnvFromSource(
-                    config_map_ref=client.V1ConfigMapEnvSource(
+                models.build(
+                    models.V1EnvFromSource,
+                    config_map_ref=models.build(
+                        models.V1ConfigMapEnvSource,
                         name=name,
-                    )
+                    ),
                 )
             )
         else:
             container.env.extend(
-                client.V1EnvVar(
+                models.build(
+                    models.V1EnvVar,
                     name=envvar_name,
-                    value_from=client.V1EnvVarSource(
-                        config_map_key_ref=client.V1ConfigMapKeySelector(
+                    value_from=models.build(
+                        models.V1EnvVarSource,
+                        config_map_key_ref=models.build(
+                            models.V1ConfigMapKeySelector,
                             name=name,
                             key=cm_key,
-                        )
+                        ),
                     ),
                 )
                 for envvar_name, cm_key in mapping.items()
@@ -74,21 +82,26 @@ class PodSpec:
         container = self._init_env(container_name=container_name)
         if mapping is None:
             container.env_from.append(
-                client.V1EnvFromSource(
-                    secret_ref=client.V1SecretEnvSource(
+                models.build(
+                    models.V1EnvFromSource,
+                    secret_ref=models.build(
+                        models.V1SecretEnvSource,
                         name=name,
-                    )
+                    ),
                 )
             )
         else:
             container.env.extend(
-                client.V1EnvVar(
+                models.build(
+                    models.V1EnvVar,
                     name=envvar_name,
-                    value_from=client.V1EnvVarSource(
-                        secret_key_ref=client.V1SecretKeySelector(
+                    value_from=models.build(
+                        models.V1EnvVarSource,
+                        secret_key_ref=models.build(
+                            models.V1SecretKeySelector,
                             name=name,
                             key=secret_key,
-                        )
+                        ),
                     ),
                 )
                 for envvar_name, secret_key in mapping.items()
@@ -109,7 +122,8 @@ class PodSpec:
 
         if keys is None:
             container.volume_mounts.append(
-                client.V1VolumeMount(
+                models.build(
+                    models.V1VolumeMount,
                     name=name,
                     mount_path=mount_path,
                 )
@@ -117,7 +131,8 @@ class PodSpec:
         else:
             for key in keys:
                 container.volume_mounts.append(
-                    client.V1VolumeMount(
+                    models.build(
+                        models.V1VolumeMount,
                         name=name,
                         mount_path=f"{mount_path}/{key}",
                         sub_path=key,
@@ -125,9 +140,11 @@ class PodSpec:
                 )
 
         container.volumes.append(
-            client.V1Volume(
+            models.build(
+                models.V1Volume,
                 name=name,
-                config_map=client.V1ConfigMapVolumeSource(
+                config_map=models.build(
+                    models.V1ConfigMapVolumeSource,
                     name=name,
                 ),
             )
@@ -143,16 +160,19 @@ class PodSpec:
             container.volume_mounts = []
 
         container.volume_mounts.append(
-            client.V1VolumeMount(
+            models.build(
+                models.V1VolumeMount,
                 name=name,
                 mount_path=mount_path,
             )
         )
 
         container.volumes.append(
-            client.V1Volume(
+            models.build(
+                models.V1Volume,
                 name=name,
-                secret=client.V1SecretVolumeSource(
+                secret=models.build(
+                    models.V1SecretVolumeSource,
                     secret_name=name,
                 ),
             )
@@ -168,16 +188,19 @@ class PodSpec:
             container.volume_mounts = []
 
         container.volume_mounts.append(
-            client.V1VolumeMount(
+            models.build(
+                models.V1VolumeMount,
                 name=name,
                 mount_path=mount_path,
             )
         )
 
         container.volumes.append(
-            client.V1Volume(
+            models.build(
+                models.V1Volume,
                 name=name,
-                persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+                persistent_volume_claim=models.build(
+                    models.V1PersistentVolumeClaimVolumeSource,
                     claim_name=name,
                 ),
             )
@@ -197,7 +220,8 @@ class PodSpec:
             container.volume_mounts = []
 
         container.volume_mounts.append(
-            client.V1VolumeMount(
+            models.build(
+                models.V1VolumeMount,
                 name=volume.name,
                 mount_path=mount_path,
             )
@@ -232,7 +256,8 @@ class PodSpec:
             raise ValueError(f"Can't use name {name}, already in use.")
 
         container_list.append(
-            client.V1Container(
+            models.build(
+                models.V1Container,
                 name=name,
                 image=image,
             )
@@ -1,5 +1,6 @@
 from kubernetes import client
 
+from transpire.resources import models
 from transpire.resources.base import Resource
 
 
@@ -11,12 +12,16 @@ class PersistentVolumeClaim(Resource[client.V1PersistentVolumeClaim]):
         access_modes: list[str],
         storage_class_name: str | None = None,
     ):
-        self.obj = client.V1PersistentVolumeClaim(
+        self.obj = models.build(
+            models.V1PersistentVolumeClaim,
             api_version="v1",
             kind="PersistentVolumeClaim",
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1PersistentVolumeClaimSpec(
-                resources=client.V1ResourceRequirements(requests={"storage": storage}),
+            metadata=models.build(models.V1ObjectMeta, name=name),
+            spec=models.build(
+                models.V1PersistentVolumeClaimSpec,
+                resources=models.build(
+                    models.V1ResourceRequirements, requests={"storage": storage}
+                ),
                 access_modes=access_modes,
                 storage_class_name=storage_class_name,
             ),
@@ -3,6 +3,7 @@ from typing import Optional
 from kubernetes import client
 
 from transpire.internal.context import get_app_context, get_global_context
+from transpire.resources import models
 from transpire.resources.base import Resource
 
 
@@ -18,10 +19,12 @@ class Secret(Resource[client.V1Secret]):
         app_ctx = get_app_context()
         namespace = app_ctx.namespace
 
-        self.obj = client.V1Secret(
+        self.obj = models.build(
+            models.V1Secret,
             api_version="v1",
             kind="Secret",
-            metadata=client.V1ObjectMeta(
+            metadata=models.build(
+                models.V1ObjectMeta,
                 name=name,
                 namespace=namespace,
             ),
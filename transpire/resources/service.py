@@ -2,6 +2,7 @@ from typing import Union
 
 from kubernetes import client
 
+from transpire.resources import models
 from transpire.resources.base import Resource
 
 
@@ -13,13 +14,19 @@ class Service(Resource[client.V1Service]):
         port_on_pod: Union[int, str],
         port_on_svc: Union[int, str],
     ):
-        self.obj = client.V1Service(
+        self.obj = models.build(
+            models.V1Service,
             api_version="v1",
             kind="Service",
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1ServiceSpec(
+            metadata=models.build(models.V1ObjectMeta, name=name),
+            spec=models.build(
+                models.V1ServiceSpec,
                 selector=selector,
-                ports=[client.V1ServicePort(port=port_on_svc, target_port=port_on_pod)],
+                ports=[
+                    models.build(
+                        models.V1ServicePort, port=port_on_svc, target_port=port_on_pod
+                    )
+                ],
             ),
         )
         super().__init__()
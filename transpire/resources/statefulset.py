@@ -2,6 +2,7 @@ from typing import Any, List, Self, Union
 
 from kubernetes import client
 
+from transpire.resources import models
 from transpire.resources.base import Resource
 from transpire.resources.podspec import PodSpec
 
@@ -18,31 +19,40 @@ class StatefulSet(Resource[client.V1StatefulSet]):
         *,
         args: List[str] | None = None,
     ):
-        self.obj = client.V1StatefulSet(
+        self.obj = models.build(
+            models.V1StatefulSet,
             api_version="apps/v1",
             kind="StatefulSet",
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1StatefulSetSpec(
+            metadata=models.build(models.V1ObjectMeta, name=name),
+            spec=models.build(
+                models.V1StatefulSetSpec,
                 replicas=1,
                 service_name=service_name,
-                selector=client.V1LabelSelector(
-                    match_labels={self.SELECTOR_LABEL: name}
+                selector=models.build(
+                    models.V1LabelSelector, match_labels={self.SELECTOR_LABEL: name}
                 ),
-                template=client.V1PodTemplateSpec(
-                    metadata=client.V1ObjectMeta(labels={self.SELECTOR_LABEL: name}),
-                    spec=client.V1PodSpec(
+                template=models.build(
+                    models.V1PodTemplateSpec,
+                    metadata=models.build(
+                        models.V1ObjectMeta, labels={self.SELECTOR_LABEL: name}
+                    ),
+                    spec=models.build(
+                        models.V1PodSpec,
                         containers=[
-                            client.V1Container(
+                            models.build(
+                                models.V1Container,
                                 name="main",
                                 image=image,
                                 image_pull_policy="IfNotPresent",
                                 args=args,
                                 ports=[
-                                    client.V1ContainerPort(container_port=x)
+                                    models.build(
+                                        models.V1ContainerPort, container_port=x
+                                    )
                                     for x in ports
                                 ],
                             )
-                        ]
+                        ],
                     ),
                 ),
             ),
@@ -63,11 +73,15 @@ class StatefulSet(Resource[client.V1StatefulSet]):
         storage_class_name: str | None = None,
     ) -> Self:
         self.obj.spec.volume_claim_templates.append(
-            client.V1PersistentVolumeClaim(
-                metadata=client.V1ObjectMeta(name=name),
-                spec=client.V1PersistentVolumeClaimSpec(
+            models.build(
+                models.V1PersistentVolumeClaim,
+                metadata=models.build(models.V1ObjectMeta, name=name),
+                spec=models.build(
+                    models.V1PersistentVolumeClaimSpec,
                     access_modes=access_modes,
-                    resources=client.V1ResourceRequirements(requests={"storage": size}),
+                    resources=models.build(
+                        models.V1ResourceRequirements, requests={"storage": size}
+                    ),
                     storage_class_name=storage_class_name,
                 ),
             )
@@ -1,4 +1,4 @@
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from contextvars import Context
 from enum import Enum
 from functools import cached_property
@@ -9,7 +9,7 @@ from typing import Any, Callable, List, TypeVar
 from pydantic import BaseModel, Field
 
 from transpire.internal import context
-from transpire.manifestlike import manifests_to_dict
+from transpire.manifestlike import manifest_to_dict, manifests_to_dict
 
 _T = TypeVar("_T")
 
@@ -48,7 +48,13 @@ class Image(BaseModel):
 
 
 class Module:
-    """Transpire modules contain information about how to build and deploy applications to Kubernetes."""
+    """
+    Transpire modules contain information about how to build and deploy applications to Kubernetes.
+
+    A module's `.transpire.py` is executed once per process, and its functions
+    (objects(), images()...) may be called any number of times, so they
+    shouldn't accumulate state in module-level variables.
+    """
 
     pymodule: ModuleType
     revision: str | None
@@ -103,6 +109,31 @@ class Module:
     def images(self) -> List[Image]:
         return list(self._render_iter("images"))
 
+    def iter_objects(self) -> Iterator[dict]:
+        """
+        Render the module's objects one at a time, without holding on to them.
+
+        The module's `objects` generator is only ever advanced inside the module's
+        own context, exactly as when rendering through `objects`.
+        """
+        ctx = Context()
+        ctx.run(self._enter_context)
+        if not hasattr(self.pymodule, "objects"):
+            return
+
+        gen = ctx.run(self.pymodule.objects)
+        if not isinstance(gen, Iterable):
+            raise ValueError("function `objects` must be iterable")
+
+        it = ctx.run(iter, gen)
+        while True:
+            try:
+                obj = ctx.run(next, it)
+            except StopIteration:
+                return
+            if obj is not None:
+                yield manifest_to_dict(obj)
+
     @cached_property
     def objects(self) -> List[dict]:
         return list(manifests_to_dict(self._render_iter("objects")))